@@ -0,0 +1,216 @@
+import contextlib
+import json
+import mmap
+import os
+from pathlib import Path
+
+import numpy as np
+
+#random access to the records of large PAF files that carry aln and anchors tags (--dtw-output-cigar, --output-chains)
+#the file is scanned once for the byte offset of every record, keyed by (read name, reference name, strand),
+#and a record is only read and decoded when it is accessed.
+#the index is stored next to the PAF and reused as long as the PAF's size and mtime are unchanged
+#if the columnar cache of test/scripts/paf_cache.py (<paf>.cols/) is up to date, the offsets, names and the decoded
+#aln and anchors tuples are memory-mapped from it instead, so neither the index nor the tuples have to be parsed
+
+INDEX_SUFFIX = ".idx.npz"
+HEAD_SIZE = 1024 #bytes read to find the first 6 fields of a record
+
+ALIGNMENT_DTYPE = np.dtype([('read_pos', np.int64), ('ref_pos', np.int64), ('difference', np.float64)])
+ANCHOR_DTYPE = np.dtype([('read_pos', np.int64), ('ref_pos', np.int64)])
+
+COLUMNS_SUFFIX = ".cols"
+COLUMNS_VERSION = 1 #CACHE_VERSION of paf_cache.py
+TUPLE_DTYPES = {'aln': ALIGNMENT_DTYPE, 'anchors': ANCHOR_DTYPE}
+
+
+def decode_tuples(value:bytes, dtype):
+    #"(a,b,c)(a,b,c)..." => structured array with one row per tuple
+    if not value:
+        return np.zeros(0, dtype=dtype)
+    flat = np.array(value[1:-1].replace(b')(', b',').split(b','), dtype=np.float64)
+    return tuples_to_records(flat.reshape(-1, len(dtype.names)), dtype)
+
+
+def tuples_to_records(flat, dtype):
+    #(tuples x fields) float64 array => structured array
+    res = np.empty(len(flat), dtype=dtype)
+    for i, name in enumerate(dtype.names):
+        res[name] = flat[:, i]
+    return res
+
+
+def get_tag(line:bytes, key:bytes):
+    #value of tag key:type:value in a PAF line, None if the tag is missing
+    start = line.find(b'\t' + key + b':')
+    if start < 0:
+        return None
+    start = line.index(b':', start + len(key) + 2) + 1
+    end = line.find(b'\t', start)
+    return line[start:] if end < 0 else line[start:end]
+
+
+def map_file(f):
+    #an empty file cannot be mapped
+    if os.fstat(f.fileno()).st_size == 0:
+        return contextlib.nullcontext(b'')
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class PafRecord:
+    #a single PAF record, the alignment and the chain are decoded on first access
+    def __init__(self, line:bytes, alignment=None, chain=None):
+        #alignment and chain can be given if they are already decoded (e.g., from the columnar cache)
+        self.line = line.rstrip(b'\r\n')
+        self._alignment = alignment
+        self._chain = chain
+
+    @property
+    def fields(self):
+        return [f.decode() for f in self.line.split(b"\t", 12)[:12]]
+
+    def tag(self, key):
+        value = get_tag(self.line, key.encode())
+        return None if value is None else value.decode()
+
+    @property
+    def alignment(self):
+        #(read_pos, ref_pos, difference) of each cell of the DTW alignment
+        if self._alignment is None:
+            self._alignment = decode_tuples(get_tag(self.line, b'aln') or b'', ALIGNMENT_DTYPE)
+        return self._alignment
+
+    @property
+    def chain(self):
+        #(read_pos, ref_pos) of each anchor of the best chain
+        if self._chain is None:
+            self._chain = decode_tuples(get_tag(self.line, b'anchors') or b'', ANCHOR_DTYPE)
+        return self._chain
+
+
+class PafIndex:
+    def __init__(self, paf_path, required_tags=('aln', 'anchors'), store=True):
+        #only records that have all required_tags are indexed
+        self.paf_path = Path(paf_path)
+        self.required_tags = tuple(required_tags)
+        self.index_path = self.paf_path.with_name(self.paf_path.name + INDEX_SUFFIX)
+        stat = self.paf_path.stat()
+        self.stamp = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+        self.tuples = {}
+        if not self.load_columns() and not self.load():
+            self.build()
+            if store:
+                self.store()
+        self.positions = {key: i for i, key in enumerate(self.keys())}
+
+    def load(self):
+        try:
+            with np.load(self.index_path) as data:
+                if not np.array_equal(data['stamp'], self.stamp) or tuple(data['required_tags']) != self.required_tags:
+                    return False
+                self.offsets = data['offsets']
+                self.lengths = data['lengths']
+                self.read_names = data['read_names']
+                self.ref_names = data['ref_names']
+                self.strands = data['strands']
+        except (OSError, KeyError, ValueError):
+            return False
+        return True
+
+    def load_columns(self):
+        #the indexed records and their aln and anchors tuples from the columnar cache of paf_cache.py
+        columns_path = self.paf_path.with_name(self.paf_path.name + COLUMNS_SUFFIX)
+        try:
+            with open(columns_path / "meta.json") as f:
+                meta = json.load(f)
+            if meta['version'] != COLUMNS_VERSION or [meta['size'], meta['mtime_ns']] != self.stamp.tolist():
+                return False
+            if not all(tag in meta['tuple_tags'] for tag in self.required_tags):
+                return False
+            def column(name):
+                return np.load(columns_path / f"{name}.npy", mmap_mode='r')
+
+            selected = np.ones(meta['n'], dtype=bool)
+            for tag in self.required_tags:
+                selected &= column(f"{tag}.present")
+            rows = np.flatnonzero(selected)
+            offsets = np.asarray(column('offset'))
+            #a record ends where the next one starts, the line break is removed by PafRecord
+            ends = np.r_[offsets[1:], self.stamp[0]]
+            self.offsets = offsets[rows]
+            self.lengths = ends[rows] - self.offsets
+            name_offsets = np.asarray(column('query_name.offsets'))
+            name_data = np.memmap(columns_path / "query_name.data", dtype=np.uint8, mode='r') if name_offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+            self.read_names = np.array([name_data[name_offsets[i]:name_offsets[i + 1]].tobytes() for i in rows.tolist()], dtype=bytes)
+            self.ref_names = column('target_names')[np.asarray(column('target_name'))[rows]]
+            self.strands = np.asarray(column('strand'))[rows]
+            for tag in TUPLE_DTYPES:
+                if tag in meta['tuple_tags']:
+                    tuple_offsets = np.asarray(column(f"{tag}.offsets"))
+                    width = len(TUPLE_DTYPES[tag].names)
+                    values = np.memmap(columns_path / f"{tag}.values", dtype=np.float64, mode='r').reshape(-1, width) if tuple_offsets[-1] > 0 else np.zeros((0, width))
+                    self.tuples[tag] = (values, tuple_offsets[rows], tuple_offsets[rows + 1])
+        except (OSError, KeyError, ValueError):
+            self.tuples = {}
+            return False
+        return True
+
+    def store(self):
+        tmp_path = self.index_path.with_name(self.index_path.name + f".{os.getpid()}.tmp.npz")
+        np.savez(tmp_path, stamp=self.stamp, required_tags=np.array(self.required_tags), offsets=self.offsets, lengths=self.lengths,
+                 read_names=self.read_names, ref_names=self.ref_names, strands=self.strands)
+        os.replace(tmp_path, self.index_path)
+
+    def build(self):
+        offsets = []
+        lengths = []
+        keys = []
+        needles = [b'\t' + tag.encode() + b':' for tag in self.required_tags]
+        with open(self.paf_path, 'rb') as f, map_file(f) as mm:
+            size = len(mm)
+            pos = 0
+            while pos < size:
+                end = mm.find(b'\n', pos)
+                end = size if end < 0 else end
+                #the tags are searched in place, records are not copied
+                if end > pos and all(mm.find(needle, pos, end) >= 0 for needle in needles):
+                    fields = mm[pos:min(end, pos + HEAD_SIZE)].split(b'\t', 6)
+                    if len(fields) < 7:
+                        fields = mm[pos:end].split(b'\t', 6)
+                    if len(fields) >= 6:
+                        offsets.append(pos)
+                        lengths.append(end - pos)
+                        keys.append((fields[0], fields[5], fields[4]))
+                pos = end + 1
+
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.lengths = np.array(lengths, dtype=np.int64)
+        self.read_names = np.array([k[0] for k in keys], dtype=bytes)
+        self.ref_names = np.array([k[1] for k in keys], dtype=bytes)
+        self.strands = np.array([k[2] for k in keys], dtype=bytes)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def keys(self):
+        #(read name, reference name, strand) of each indexed record, in file order
+        return list(zip((n.decode() for n in self.read_names), (n.decode() for n in self.ref_names), (s.decode() for s in self.strands)))
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def __getitem__(self, key):
+        return self.record(self.positions[key])
+
+    def record(self, i):
+        #the i-th indexed record, read from disk
+        with open(self.paf_path, 'rb') as f:
+            f.seek(int(self.offsets[i]))
+            line = f.read(int(self.lengths[i]))
+        decoded = {tag: tuples_to_records(values[starts[i]:ends[i]], TUPLE_DTYPES[tag]) for tag, (values, starts, ends) in self.tuples.items()}
+        return PafRecord(line, decoded.get('aln'), decoded.get('anchors'))
+
+    def records_of_read(self, read_name):
+        return [self.record(i) for i in np.flatnonzero(self.read_names == read_name.encode())]
+
@@ -0,0 +1,129 @@
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'test' / 'scripts'))
+from pareto import pareto_ranks
+
+#non-dominated sorting of configuration records (e.g., every configuration of a parameter sweep) over several objectives
+#the rank of a record is the index of its Pareto front (0 is the frontier), as in the repeated removal of the
+#non-dominated records (NSGA-II), and the crowding distance tells apart the records of the same front:
+#records at the ends of the front or in sparse parts of it have large distances
+#the ranks are computed by pareto_ranks of test/scripts/pareto.py, which tune_rawalign.py uses as well
+
+#objective => True if larger is better
+OBJECTIVES = {
+    'throughput': True,                #mean BP per sec
+    'analysis_latency': False,         #mean time per read (ms)
+    'sequencing_latency_bases': False, #mean # of sequenced bases per read
+    'sequencing_latency_chunks': False, #mean # of sequenced chunks per read
+    'index_memory': False,             #GB
+    'map_memory': False,               #GB
+    'f1': True,
+}
+
+
+def collect_records(tputs, latency, accs, sequencing_latencies, memory_footprints):
+    #toolname => {objective: value} from the parse_* functions of plot_spider_tradeoffs.py, missing metrics are left out
+    records = {}
+    for toolname, (mean_tput, median_tput) in tputs.items():
+        records.setdefault(toolname, {})['throughput'] = mean_tput
+    for toolname, mean_latency in latency.items():
+        records.setdefault(toolname, {})['analysis_latency'] = mean_latency
+    for toolname, (precision, recall, f1) in accs.items():
+        records.setdefault(toolname, {})['f1'] = f1
+    for toolname, (bp_latency, chunk_latency) in sequencing_latencies.items():
+        records.setdefault(toolname, {}).update(sequencing_latency_bases=bp_latency, sequencing_latency_chunks=chunk_latency)
+    for toolname, footprints in memory_footprints.items():
+        record = records.setdefault(toolname, {})
+        if 'index' in footprints:
+            record['index_memory'] = footprints['index']
+        if 'map' in footprints:
+            record['map_memory'] = footprints['map']
+    return records
+
+
+def objective_matrix(records, objectives=tuple(OBJECTIVES)):
+    #toolnames and a (records x objectives) matrix in which larger is better for all objectives,
+    #missing and nan values are the worst possible values
+    toolnames = list(records.keys())
+    values = np.array([[records[t].get(o, np.nan) for o in objectives] for t in toolnames], dtype=np.float64).reshape(len(toolnames), len(objectives))
+    signs = np.array([1.0 if OBJECTIVES[o] else -1.0 for o in objectives])
+    values = values * signs
+    values[np.isnan(values)] = -np.inf
+    return toolnames, values
+
+
+def crowding_distances(points, ranks):
+    #NSGA-II crowding distance of each point within its front: the sum over the objectives of the normalized gap
+    #between its two neighbours, infinite for the points at the ends of a front
+    points = np.asarray(points, dtype=np.float64)
+    n, n_objectives = points.shape
+    distances = np.zeros(n, dtype=np.float64)
+    if n == 0:
+        return distances
+    for m in range(n_objectives):
+        order = np.lexsort((points[:, m], ranks))
+        values = points[order, m]
+        front = ranks[order]
+        first = np.r_[True, front[1:] != front[:-1]]
+        last = np.r_[front[1:] != front[:-1], True]
+        #value range of the front of each point
+        starts = np.flatnonzero(first)
+        ends = np.flatnonzero(last)
+        #objectives that do not vary within a front (or that are infinite) do not separate its points
+        with np.errstate(invalid='ignore'):
+            value_range = np.repeat(values[ends] - values[starts], ends - starts + 1)
+            gaps = np.zeros(n)
+            gaps[1:-1] = values[2:] - values[:-2]
+            contribution = np.where(np.isfinite(gaps) & np.isfinite(value_range) & (value_range > 0), gaps / np.where(value_range > 0, value_range, 1), 0.0)
+        contribution[first | last] = np.inf
+        distances[order] += contribution
+    return distances
+
+
+def pareto_front(records, objectives=tuple(OBJECTIVES)):
+    #toolnames, ranks and crowding distances, sorted by rank and by decreasing crowding distance
+    toolnames, values = objective_matrix(records, objectives)
+    ranks = pareto_ranks(values)
+    distances = crowding_distances(values, ranks)
+    order = np.lexsort((-distances, ranks))
+    return [toolnames[i] for i in order], ranks[order], distances[order]
+
+
+def frontier_filter(records, toolname='rawalign', objectives=tuple(OBJECTIVES), max_rank=0):
+    #filter for filter_metrics that keeps the configurations of toolname within the first max_rank+1 fronts
+    #among the configurations of that tool
+    tool_records = {name: record for name, record in records.items() if toolname in name}
+    names, ranks, _ = pareto_front(tool_records, objectives)
+    return {toolname: [name for name, rank in zip(names, ranks) if rank <= max_rank]}
+
+
+if __name__ == "__main__":
+    from results_cache import DATASET_COMPARISON_DIRECTORIES, load_results
+    from plot_spider_tradeoffs import parse_throughputs, parse_analysis_latency, parse_accuracy, parse_sequencing_latencies, parse_memory_footprints
+
+    parser = argparse.ArgumentParser(description='Rank the configurations of the comparison directories by Pareto front and crowding distance')
+    parser.add_argument('datasets', type=str, nargs='*', default=list(DATASET_COMPARISON_DIRECTORIES), help='datasets, i.e., keys of DATASET_COMPARISON_DIRECTORIES')
+    parser.add_argument('--objectives', type=str, nargs='+', default=list(OBJECTIVES), choices=list(OBJECTIVES), help='objectives of the non-dominated sorting')
+    parser.add_argument('--tool', type=str, default=None, help='only rank the configurations whose name contains this string (e.g., rawalign)')
+    parser.add_argument('--max-rank', type=int, default=0, help='print the configurations of the fronts up to this rank')
+    args = parser.parse_args()
+
+    def parse_records(results):
+        return collect_records(parse_throughputs(results), parse_analysis_latency(results), parse_accuracy(results),
+                               parse_sequencing_latencies(results), parse_memory_footprints(results))
+
+    all_records = load_results({name: DATASET_COMPARISON_DIRECTORIES[name] for name in args.datasets}, parse_records)
+    for dataset, records in all_records.items():
+        if args.tool is not None:
+            records = {name: record for name, record in records.items() if args.tool in name}
+        names, ranks, distances = pareto_front(records, args.objectives)
+        print(f"{dataset}: {len(names)} configurations, {int(np.sum(ranks == 0))} on the frontier")
+        for name, rank, distance in zip(names, ranks, distances):
+            if rank > args.max_rank:
+                break
+            values = ", ".join(f"{o}: {records[name].get(o, float('nan')):g}" for o in args.objectives)
+            print(f"  rank {rank} crowding {distance:.3f} {name} ({values})")
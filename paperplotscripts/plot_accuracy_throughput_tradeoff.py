@@ -1,12 +1,13 @@
 import argparse
-import subprocess
 import re
 import numpy as np
 from pathlib import Path
 from matplotlib import pyplot as plt
 from matplotlib import colormaps
+from results_cache import get_output_results, cached_metrics
 
 
+@cached_metrics
 def parse_throughputs(output_results):
     throughput_pattern = r"^(\S+)\s+BP per sec:\s+(\d+\.\d+)\s+(\d+\.\d+)$"
     throughput_matches = re.findall(throughput_pattern, output_results, re.MULTILINE)
@@ -21,6 +22,7 @@ def parse_throughputs(output_results):
     return res
 
 
+@cached_metrics
 def parse_accuracy(output_results):
     precision_pattern = r"^(\S+)\s+precision:\s+(\d+\.\d+)$"
     recall_pattern = r"^(\S+)\s+recall:\s+(\d+\.\d+)$"
@@ -48,6 +50,14 @@ def parse_accuracy(output_results):
     return res
 
 
+def add_frontier(accs, tputs, frontier_path):
+    #adds the configurations of a Pareto frontier written by test/scripts/tune_rawalign.py, which uses the same layout as 2_output_results.sh
+    if frontier_path is None:
+        return accs, tputs
+    frontier = Path(frontier_path).read_text()
+    return {**accs, **parse_accuracy(frontier)}, {**tputs, **parse_throughputs(frontier)}
+
+
 def parse_rawalign_config(config_string):
     config = {}
     config['preset'] = config_string.split('_')[0]
@@ -203,17 +213,18 @@ def plot(accs, tputs, plottitle="Accuracy-Performance Tradeoff Space", annotatio
     fig.savefig(figpath, dpi=300, bbox_inches='tight')
 
 
-def get_output_results(comparison_directory:Path):
-    bash_script_path = "2_output_results.sh"
-    res = subprocess.run(["bash", bash_script_path], check=True, cwd=comparison_directory, capture_output=True)
-    return res.stdout.decode("utf-8")
-
-
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Plot the accuracy-performance tradeoff space of each read mapping dataset')
+    parser.add_argument('--frontier', type=str, nargs='+', default=[], metavar='DATASET=FILE',
+                        help='also plot the RawAlign configurations of a tune_rawalign.py frontier file, DATASET is one of covid, ecoli, yeast, green_algae, human')
+    args = parser.parse_args()
+    frontiers = dict(frontier.split('=', 1) for frontier in args.frontier)
+
     #d1
     results = get_output_results(Path('test/evaluation/read_mapping/d1_sars-cov-2_r94/comparison/'))
     tputs = parse_throughputs(results)
     accs = parse_accuracy(results)
+    accs, tputs = add_frontier(accs, tputs, frontiers.get('covid'))
     plot(accs, tputs,
          plottitle='d1 SARS-CoV-2 R9.4 Accuracy-Performance Tradeoff Space',
          annotation_offsets={
@@ -227,6 +238,7 @@ if __name__ == "__main__":
     results = get_output_results(Path('test/evaluation/read_mapping/d2_ecoli_r94/comparison/'))
     tputs = parse_throughputs(results)
     accs = parse_accuracy(results)
+    accs, tputs = add_frontier(accs, tputs, frontiers.get('ecoli'))
     plot(accs, tputs,
          plottitle='d2 Ecoli R9.4 Accuracy-Performance Tradeoff Space',
          annotation_offsets={
@@ -241,6 +253,7 @@ if __name__ == "__main__":
     results = get_output_results(Path('test/evaluation/read_mapping/d3_yeast_r94/comparison/'))
     tputs = parse_throughputs(results)
     accs = parse_accuracy(results)
+    accs, tputs = add_frontier(accs, tputs, frontiers.get('yeast'))
     plot(accs, tputs,
          plottitle='d3 Yeast R9.4 Accuracy-Performance Tradeoff Space',
          annotation_offsets={
@@ -255,6 +268,7 @@ if __name__ == "__main__":
     results = get_output_results(Path('test/evaluation/read_mapping/d4_green_algae_r94/comparison/'))
     tputs = parse_throughputs(results)
     accs = parse_accuracy(results)
+    accs, tputs = add_frontier(accs, tputs, frontiers.get('green_algae'))
     plot(accs, tputs,
          plottitle='d4 Green Algae R9.4 Accuracy-Performance Tradeoff Space',
          annotation_offsets={
@@ -267,6 +281,7 @@ if __name__ == "__main__":
     results = get_output_results(Path('test/evaluation/read_mapping/d5_human_na12878_r94/comparison/'))
     tputs = parse_throughputs(results)
     accs = parse_accuracy(results)
+    accs, tputs = add_frontier(accs, tputs, frontiers.get('human'))
     plot(accs, tputs,
          plottitle='d5 Human R9.4 Accuracy-Performance Tradeoff Space',
         annotation_offsets={
@@ -1,5 +1,4 @@
 import argparse
-import subprocess
 import re
 import numpy as np
 import pathlib
@@ -14,8 +13,10 @@ from matplotlib.transforms import Affine2D
 from matplotlib.patches import Patch
 from matplotlib.lines import Line2D
 from matplotlib.patches import Rectangle
+from results_cache import get_output_results, cached_metrics
 
 
+@cached_metrics
 def parse_throughputs(output_results):
     throughput_pattern = r"^(\S+)\s+BP per sec:\s+(\d+\.\d+)\s+(\d+\.\d+)$"
     throughput_matches = re.findall(throughput_pattern, output_results, re.MULTILINE)
@@ -30,6 +31,7 @@ def parse_throughputs(output_results):
     return res
 
 
+@cached_metrics
 def parse_analysis_latency(output_results):
     latency_pattern = r"^(\S+)\s+Mean time per read :\s+(\d+\.\d+)$"
     latency_matches = re.findall(latency_pattern, output_results, re.MULTILINE)
@@ -43,6 +45,7 @@ def parse_analysis_latency(output_results):
     return res
 
 
+@cached_metrics
 def parse_accuracy(output_results):
     precision_pattern = r"^(\S+)\s+precision:\s+(\d+\.\d+)$"
     recall_pattern = r"^(\S+)\s+recall:\s+(\d+\.\d+)$"
@@ -70,6 +73,7 @@ def parse_accuracy(output_results):
     return res
 
 
+@cached_metrics
 def parse_sequencing_latencies(output_results):
     bp_latency_pattern = r"^(\S+)\s+Mean # of sequenced bases per read :\s+((?:\d+\.\d+)|inf)$"
     bp_latency_matches = re.findall(bp_latency_pattern, output_results, re.MULTILINE)
@@ -98,6 +102,7 @@ def parse_sequencing_latencies(output_results):
     return res
 
 
+@cached_metrics
 def parse_memory_footprints(output_results):
     memory_footprint_pattern = r"^(\S+)\s+Memory \(GB\):\s+(\d+\.\d+)$"
     memory_footprint_matches = re.findall(memory_footprint_pattern, output_results, re.MULTILINE)
@@ -256,12 +261,6 @@ def plot(tputs, latency, accs, sequencing_latencies, memory_footprints, plottitl
     fig.savefig(figpath, dpi=300, bbox_inches='tight')
 
 
-def get_output_results(comparison_directory:Path):
-    bash_script_path = "2_output_results.sh"
-    res = subprocess.run(["bash", bash_script_path], check=True, cwd=comparison_directory, capture_output=True)
-    return res.stdout.decode("utf-8")
-
-
 def filter_metrics(metrics, filters={}):
     #filters is a dict of shorttoolname => list of fulltoolname_with_config
     #if any shorttoolname is found in a metric, it is kept only if fulltoolname_with_config contains one of the values in the list
@@ -3,69 +3,10 @@ import pathlib
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 
-def parse_tags(line):
-    tags = {}
-    tag_pattern = r'(\S+):(\S+):(\S+)'  # Regex pattern to match tag_key:type
-
-    # Find all occurrences of tag_key:type using regex
-    matches = re.findall(tag_pattern, line)
-    for key, valuetype, value in matches:
-        if key == 'aln':
-            # Parse the tuples into arrays
-            tuples = re.findall(r'\(([^)]+)\)', value)
-            parsed_tuples = []
-            for t in tuples:
-                t_values = t.split(',')
-                x, y, z = int(t_values[0]), int(t_values[1]), float(t_values[2])
-                parsed_tuples.append((x, y, z))
-            tags[key] = parsed_tuples
-        elif key == 'anchors':
-            # Parse the tuples into arrays
-            tuples = re.findall(r'\(([^)]+)\)', value)
-            parsed_tuples = []
-            for t in tuples:
-                t_values = t.split(',')
-                x, y = int(t_values[0]), int(t_values[1])
-                parsed_tuples.append((x, y))
-            tags[key] = parsed_tuples
-        else:
-            tags[key] = value
-    return tags
-
-def parse_paf(input_file, limit=None):
-    res = {}
-    with open(input_file, 'r') as file:
-        i = 0
-        for line in file:
-            line = line.strip()
-            if line:
-                default_fields = list(line.split('\t')[:12])
-                tag_data = parse_tags(line)
-                readname = default_fields[0]
-                strand = default_fields[4]
-                refname = default_fields[5]
-                if 'aln' not in tag_data or 'anchors' not in tag_data:
-                    continue
-                res[(readname, refname, strand)] = {
-                    'alignment': tag_data['aln'],
-                    'chain': tag_data['anchors'],
-                }
-
-                i += 1
-                if i % 1000 == 0:
-                    print(f'Parsed {i} lines from PAF')
-
-                if limit is not None and i >= limit:
-                    break
-    return res
+from paf_index import PafIndex
 
 def plot_aln(ax, aln, label, color='red'):
-    xs = []
-    ys = []
-    for x, y, z in aln:
-        xs.append(x)
-        ys.append(y)
-    ax.plot(xs, ys, label=label, color=color, linewidth=2)
+    ax.plot(aln['read_pos'], aln['ref_pos'], label=label, color=color, linewidth=2)
 
 def plot_anchors(ax, anchors, label, color='red'):
     xs = []
@@ -77,11 +18,8 @@ def plot_anchors(ax, anchors, label, color='red'):
     ax.scatter(xs, ys, label=label, color=color)
 
 def plot_chain(ax, anchors, label, color='red'):
-    xs = []
-    ys = []
-    for x, y in anchors:
-        xs.append(x)
-        ys.append(y)
+    xs = anchors['read_pos']
+    ys = anchors['ref_pos']
 
     #ax.scatter(xs, ys, label=label, color=color)
     ax.plot(xs, ys, label=label, color=color, linestyle='--', marker='o', linewidth=2)
@@ -148,7 +86,7 @@ def plot(readname, refname, strand, anchors, chain, alignment, figurespath):
 
     plot_anchors(axs[0], anchors, 'Anchors')
 
-    plot_anchors(axs[1], set(anchors) - set(chain), 'Anchors', color=(0.5, 0.5, 0.5))
+    plot_anchors(axs[1], set(anchors) - set(chain.tolist()), 'Anchors', color=(0.5, 0.5, 0.5))
     plot_chain(axs[1], chain, 'Chain')
 
     plot_chain(axs[2], chain, 'Chain', color=(0.5, 0.5, 0.5))
@@ -157,10 +95,10 @@ def plot(readname, refname, strand, anchors, chain, alignment, figurespath):
     axs[1].set_title('2. Chaining',    fontweight='bold', size=14, pad=0)
     axs[2].set_title('3. Alignment',   fontweight='bold', size=14, pad=0)
 
-    min_plotted_x = min([x for x, y, z in alignment])
-    max_plotted_x = max([x for x, y, z in alignment])
-    min_plotted_y = min([y for x, y, z in alignment])
-    max_plotted_y = max([y for x, y, z in alignment])
+    min_plotted_x = alignment['read_pos'].min()
+    max_plotted_x = alignment['read_pos'].max()
+    min_plotted_y = alignment['ref_pos'].min()
+    max_plotted_y = alignment['ref_pos'].max()
     plot_width = max(max_plotted_x - min_plotted_x, max_plotted_y - min_plotted_y)
     for ax in axs:
         ax.set_xlim(min_plotted_x - plot_width*0.05, min_plotted_x + plot_width + plot_width*0.05)
@@ -199,30 +137,25 @@ if __name__ == "__main__":
     figspath.mkdir(exist_ok=True)
 
     paf_file_path = pathlib.Path('test/evaluation/read_mapping/d2_ecoli_r94/outdir/d2_ecoli_r94_rawalign_sensitive_dtwevaluatechains_loganchors_outputchains_dtwoutputcigar_dtwborderconstraint_sparse_dtwfillmethod_banded=0.10_dtwmatchbonus_0.4_dtwminscore_20.0_stopminanchor_2.paf')    
-    paf = parse_paf(paf_file_path, limit=100)
+    #only the byte offsets of the records are kept in memory, a record is decoded when it is plotted
+    paf = PafIndex(paf_file_path)
+    plotted_keys = paf.keys()[:100]
 
     anchor_log_path = pathlib.Path('test/evaluation/read_mapping/d2_ecoli_r94/outdir/d2_ecoli_r94_rawalign_sensitive_dtwevaluatechains_loganchors_outputchains_dtwoutputcigar_dtwborderconstraint_sparse_dtwfillmethod_banded=0.10_dtwmatchbonus_0.4_dtwminscore_20.0_stopminanchor_2.err')
-    anchors = parse_anchor_log(anchor_log_path, line_limit=10000, filter_list=list(paf.keys()))
+    anchors = parse_anchor_log(anchor_log_path, line_limit=10000, filter_list=set(plotted_keys))
 
-    keys_in_both = set(paf.keys()) & set(anchors.keys())
+    keys_in_both = set(plotted_keys) & set(anchors.keys())
 
-    merged = {}
     for key in keys_in_both:
-        merged[key] = {
-            'alignment': paf[key]['alignment'],
-            'chain': paf[key]['chain'],
-            'anchors': anchors[key],
-        }
-
-    for key, value in merged.items():
         readname, refname, strand = key
-        alignment = value['alignment']
-        chain = value['chain']
-        anchors = value['anchors']
+        record = paf[key]
+        alignment = record.alignment
+        chain = record.chain
+        logged_anchors = anchors[key]
 
-        if max(chain, key=lambda x: x[0]) not in anchors: #skip pairs for which the log was not parsed fully
+        if tuple(chain[chain['read_pos'].argmax()].tolist()) not in logged_anchors: #skip pairs for which the log was not parsed fully
             print(f'Skipping {readname}')
             continue
-        plot(readname, refname, strand, anchors, chain, alignment, figspath)
+        plot(readname, refname, strand, logged_anchors, chain, alignment, figspath)
 
     #plt.show()
@@ -0,0 +1,192 @@
+import ast
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+#cache of the output of 2_output_results.sh and of the metrics parsed from it, stored in the comparison directory
+#the cache is keyed by the files that the script reads and by the python scripts that produce its output
+#(with the modules they import): their sizes and mtimes are compared first and
+#only if these changed the contents are hashed, so that touching a file without changing it keeps the cache valid
+
+DATASET_COMPARISON_DIRECTORIES = {
+    'covid': Path('test/evaluation/read_mapping/d1_sars-cov-2_r94/comparison/'),
+    'ecoli': Path('test/evaluation/read_mapping/d2_ecoli_r94/comparison/'),
+    'yeast': Path('test/evaluation/read_mapping/d3_yeast_r94/comparison/'),
+    'green_algae': Path('test/evaluation/read_mapping/d4_green_algae_r94/comparison/'),
+    'human': Path('test/evaluation/read_mapping/d5_human_na12878_r94/comparison/'),
+    'contamination': Path('test/evaluation/contamination/comparison/'),
+    'relative_abundance': Path('test/evaluation/relative_abundance/comparison/'),
+}
+
+CACHE_FILENAME = ".output_results_cache.pkl"
+OUTPUT_RESULTS_SCRIPT = "2_output_results.sh"
+INPUT_PATTERNS = [
+    "*.comparison",
+    "*.abundance",
+    "../*/*.throughput",
+    "../*/*.time",
+    OUTPUT_RESULTS_SCRIPT,
+]
+#shell scripts whose python scripts (e.g., time_stats.py, relative_abundance.py) are part of the key
+RESULTS_SCRIPTS = ["1_generate_results.sh", OUTPUT_RESULTS_SCRIPT]
+PYTHON_SCRIPT_PATTERN = re.compile(r'[\w./-]+\.py\b')
+
+
+def get_local_imports(script:Path):
+    #modules next to a python script that it imports (e.g., paf_columns.py of time_stats.py)
+    try:
+        tree = ast.parse(script.read_text())
+    except (OSError, SyntaxError, ValueError):
+        return []
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names.add(node.module.split('.')[0])
+    return [script.with_name(name + '.py') for name in sorted(names) if script.with_name(name + '.py').is_file()]
+
+
+def get_script_closure(scripts):
+    #the scripts and, recursively, the local modules they import
+    closure = set()
+    pending = [Path(s) for s in scripts]
+    while pending:
+        script = pending.pop()
+        if script in closure or not script.is_file():
+            continue
+        closure.add(script)
+        pending.extend(get_local_imports(script))
+    return sorted(closure)
+
+
+def get_python_scripts(comparison_directory:Path):
+    #python scripts run by the shell scripts of the comparison directory, their paths are relative to it
+    scripts = []
+    for shell_script in RESULTS_SCRIPTS:
+        try:
+            text = (comparison_directory / shell_script).read_text()
+        except OSError:
+            continue
+        scripts.extend(Path(os.path.normpath(comparison_directory / match)) for match in PYTHON_SCRIPT_PATTERN.findall(text))
+    return scripts
+
+
+def get_input_files(comparison_directory:Path):
+    files = set()
+    for pattern in INPUT_PATTERNS:
+        files.update(comparison_directory.glob(pattern))
+    files.update(get_script_closure(get_python_scripts(comparison_directory)))
+    return sorted(files)
+
+
+def get_file_stats(files):
+    return [(str(f), f.stat().st_size, f.stat().st_mtime_ns) for f in files]
+
+
+def get_content_hash(files):
+    h = hashlib.sha256()
+    for f in files:
+        h.update(str(f).encode() + b'\0')
+        with open(f, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b''):
+                h.update(chunk)
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def get_parser_key(parser):
+    #parsed metrics are invalidated when the module of the parser or a local module it imports changes,
+    #so that changes to the helpers that the parser calls are noticed as well
+    try:
+        return parser.__name__ + ':' + get_content_hash(get_script_closure([inspect.getsourcefile(parser)]))
+    except (OSError, TypeError):
+        return parser.__name__ + ':' + hashlib.sha256(parser.__code__.co_code).hexdigest()
+
+
+class ResultsCache:
+    def __init__(self, comparison_directory:Path):
+        self.comparison_directory = Path(comparison_directory)
+        self.path = self.comparison_directory / CACHE_FILENAME
+        self.entry = self.load()
+
+    def load(self):
+        files = get_input_files(self.comparison_directory)
+        stats = get_file_stats(files)
+        try:
+            with open(self.path, 'rb') as f:
+                cached = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            cached = None
+
+        if cached is not None and cached['stats'] == stats:
+            return cached
+        content_hash = get_content_hash(files)
+        if cached is not None and cached['hash'] == content_hash:
+            cached['stats'] = stats
+            self.store(cached)
+            return cached
+        return dict(stats=stats, hash=content_hash, output=None, metrics={})
+
+    def store(self, entry=None):
+        entry = self.entry if entry is None else entry
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f)
+        os.replace(tmp_path, self.path)
+
+    def get_output_results(self):
+        if self.entry['output'] is None:
+            res = subprocess.run(["bash", OUTPUT_RESULTS_SCRIPT], check=True, cwd=self.comparison_directory, capture_output=True)
+            self.entry['output'] = res.stdout.decode("utf-8")
+            self.store()
+        return OutputResults(self.entry['output'], self)
+
+    def get_metrics(self, parser, output_results):
+        key = get_parser_key(parser)
+        if key not in self.entry['metrics']:
+            self.entry['metrics'][key] = parser(output_results)
+            self.store()
+        return self.entry['metrics'][key]
+
+
+class OutputResults(str):
+    #output of 2_output_results.sh that remembers the cache it came from, see cached_metrics
+    def __new__(cls, output, cache):
+        res = super().__new__(cls, output)
+        res.cache = cache
+        return res
+
+
+def get_output_results(comparison_directory:Path):
+    return ResultsCache(comparison_directory).get_output_results()
+
+
+def cached_metrics(parser):
+    #decorator for the parse_* functions: results parsed from a cached output are cached alongside it
+    @functools.wraps(parser)
+    def wrapper(output_results):
+        cache = getattr(output_results, 'cache', None)
+        if cache is None:
+            return parser(output_results)
+        return cache.get_metrics(parser, str(output_results))
+    return wrapper
+
+
+def load_results(comparison_directories, parse_results, max_workers=None):
+    #gets the output results of all comparison directories at the same time and parses each of them once
+    #comparison_directories is a dict of dataset name => comparison directory,
+    #returns a dict of dataset name => parse_results(output results) in the same order
+    #threads suffice, as the time is spent in the 2_output_results.sh subprocesses
+    def load(comparison_directory):
+        return parse_results(get_output_results(comparison_directory))
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(comparison_directories)) as pool:
+        futures = {name: pool.submit(load, directory) for name, directory in comparison_directories.items()}
+        return {name: future.result() for name, future in futures.items()}
@@ -1,11 +1,12 @@
 import argparse
-import subprocess
 import re
 import numpy as np
 import math
 from pathlib import Path
+from results_cache import cached_metrics, load_results, DATASET_COMPARISON_DIRECTORIES
 
 
+@cached_metrics
 def parse_throughputs(output_results):
     throughput_pattern = r"^(\S+)\s+BP per sec:\s+(\d+\.\d+)\s+(\d+\.\d+)$"
     throughput_matches = re.findall(throughput_pattern, output_results, re.MULTILINE)
@@ -20,6 +21,7 @@ def parse_throughputs(output_results):
     return res
 
 
+@cached_metrics
 def parse_analysis_latency(output_results):
     latency_pattern = r"^(\S+)\s+Mean time per read :\s+(\d+\.\d+)$"
     latency_matches = re.findall(latency_pattern, output_results, re.MULTILINE)
@@ -33,6 +35,7 @@ def parse_analysis_latency(output_results):
     return res
 
 
+@cached_metrics
 def parse_accuracy(output_results):
     precision_pattern = r"^(\S+)\s+precision:\s+(\d+\.\d+)$"
     recall_pattern = r"^(\S+)\s+recall:\s+(\d+\.\d+)$"
@@ -60,6 +63,7 @@ def parse_accuracy(output_results):
     return res
 
 
+@cached_metrics
 def parse_sequencing_latencies(output_results):
     bp_latency_pattern = r"^(\S+)\s+Mean # of sequenced bases per read :\s+((?:\d+\.\d+)|inf)$"
     bp_latency_matches = re.findall(bp_latency_pattern, output_results, re.MULTILINE)
@@ -88,6 +92,7 @@ def parse_sequencing_latencies(output_results):
     return res
 
 
+@cached_metrics
 def parse_memory_footprints(output_results):
     memory_footprint_pattern = r"^(\S+)\s+Memory \(GB\):\s+(\d+\.\d+)$"
     memory_footprint_matches = re.findall(memory_footprint_pattern, output_results, re.MULTILINE)
@@ -112,6 +117,18 @@ def parse_memory_footprints(output_results):
     return res
 
 
+@cached_metrics
+def parse_results(output_results):
+    #all metrics of a dataset in a single record
+    return dict(
+        tputs = parse_throughputs(output_results),
+        latency = parse_analysis_latency(output_results),
+        accs = parse_accuracy(output_results),
+        bp_latencies = parse_sequencing_latencies(output_results),
+        memory_footprints = parse_memory_footprints(output_results),
+    )
+
+
 def parse_rawalign_config(config_string):
     config = {}
     config['preset'] = config_string.split('_')[0]
@@ -277,12 +294,6 @@ def write_latex_table(full_results, output_path):
         f.write(r'\end{tabular}' + n)
     
 
-def get_output_results(comparison_directory:Path):
-    bash_script_path = "2_output_results.sh"
-    res = subprocess.run(["bash", bash_script_path], check=True, cwd=comparison_directory, capture_output=True)
-    return res.stdout.decode("utf-8")
-
-
 def filter_metrics(metrics, filters={}):
     #filters is a dict of shorttoolname => list of fulltoolname_with_config
     #if any shorttoolname is found in a metric, it is kept only if fulltoolname_with_config contains one of the values in the list
@@ -309,76 +320,9 @@ if __name__ == "__main__":
     ]
     main_rawalign_filter = {'rawalign': main_rawalign_configs}
 
-    total_results = {}
-
-    #d1
-    results = get_output_results(Path('test/evaluation/read_mapping/d1_sars-cov-2_r94/comparison/'))
-    total_results['covid'] = dict(
-        tputs = filter_metrics(parse_throughputs(results), main_rawalign_filter),
-        latency = filter_metrics(parse_analysis_latency(results), main_rawalign_filter),
-        accs = filter_metrics(parse_accuracy(results), main_rawalign_filter),
-        bp_latencies = filter_metrics(parse_sequencing_latencies(results), main_rawalign_filter),
-        memory_footprints = filter_metrics(parse_memory_footprints(results), main_rawalign_filter),
-    )
-
-    #d2
-    results = get_output_results(Path('test/evaluation/read_mapping/d2_ecoli_r94/comparison/'))
-    total_results['ecoli'] = dict(
-        tputs = filter_metrics(parse_throughputs(results), main_rawalign_filter),
-        latency = filter_metrics(parse_analysis_latency(results), main_rawalign_filter),
-        accs = filter_metrics(parse_accuracy(results), main_rawalign_filter),
-        bp_latencies = filter_metrics(parse_sequencing_latencies(results), main_rawalign_filter),
-        memory_footprints = filter_metrics(parse_memory_footprints(results), main_rawalign_filter),
-    )
-
-    #d3
-    results = get_output_results(Path('test/evaluation/read_mapping/d3_yeast_r94/comparison/'))
-    total_results['yeast'] = dict(
-        tputs = filter_metrics(parse_throughputs(results), main_rawalign_filter),
-        latency = filter_metrics(parse_analysis_latency(results), main_rawalign_filter),
-        accs = filter_metrics(parse_accuracy(results), main_rawalign_filter),
-        bp_latencies = filter_metrics(parse_sequencing_latencies(results), main_rawalign_filter),
-        memory_footprints = filter_metrics(parse_memory_footprints(results), main_rawalign_filter),
-    )
-
-    #d4
-    results = get_output_results(Path('test/evaluation/read_mapping/d4_green_algae_r94/comparison/'))
-    total_results['green_algae'] = dict(
-        tputs = filter_metrics(parse_throughputs(results), main_rawalign_filter),
-        latency = filter_metrics(parse_analysis_latency(results), main_rawalign_filter),
-        accs = filter_metrics(parse_accuracy(results), main_rawalign_filter),
-        bp_latencies = filter_metrics(parse_sequencing_latencies(results), main_rawalign_filter),
-        memory_footprints = filter_metrics(parse_memory_footprints(results), main_rawalign_filter),
-    )
-
-    #d5
-    results = get_output_results(Path('test/evaluation/read_mapping/d5_human_na12878_r94/comparison/'))
-    total_results['human'] = dict(
-        tputs = filter_metrics(parse_throughputs(results), main_rawalign_filter),
-        latency = filter_metrics(parse_analysis_latency(results), main_rawalign_filter),
-        accs = filter_metrics(parse_accuracy(results), main_rawalign_filter),
-        bp_latencies = filter_metrics(parse_sequencing_latencies(results), main_rawalign_filter),
-        memory_footprints = filter_metrics(parse_memory_footprints(results), main_rawalign_filter),
-    )
-
-    #contamination
-    results = get_output_results(Path('test/evaluation/contamination/comparison/'))
-    total_results['contamination'] = dict(
-        tputs = filter_metrics(parse_throughputs(results), main_rawalign_filter),
-        latency = filter_metrics(parse_analysis_latency(results), main_rawalign_filter),
-        accs = filter_metrics(parse_accuracy(results), main_rawalign_filter),
-        bp_latencies = filter_metrics(parse_sequencing_latencies(results), main_rawalign_filter),
-        memory_footprints = filter_metrics(parse_memory_footprints(results), main_rawalign_filter),
-    )
-
-    #relative abundance
-    results = get_output_results(Path('test/evaluation/relative_abundance/comparison/'))
-    total_results['relative_abundance'] = dict(
-        tputs = filter_metrics(parse_throughputs(results), main_rawalign_filter),
-        latency = filter_metrics(parse_analysis_latency(results), main_rawalign_filter),
-        accs = filter_metrics(parse_accuracy(results), main_rawalign_filter),
-        bp_latencies = filter_metrics(parse_sequencing_latencies(results), main_rawalign_filter),
-        memory_footprints = filter_metrics(parse_memory_footprints(results), main_rawalign_filter),
-    )
+    total_results = {
+        dataset_name: {metric: filter_metrics(values, main_rawalign_filter) for metric, values in results.items()}
+        for dataset_name, results in load_results(DATASET_COMPARISON_DIRECTORIES, parse_results).items()
+    }
 
     write_latex_table(total_results, Path('paperfigures/numeric_results_table.tex'))
@@ -1,14 +1,9 @@
-import subprocess
 import re
 import pathlib
+from results_cache import get_output_results, cached_metrics
 
 
-def get_output_results(comparison_directory:pathlib.Path):
-    bash_script_path = "2_output_results.sh"
-    res = subprocess.run(["bash", bash_script_path], check=True, cwd=comparison_directory, capture_output=True)
-    return res.stdout.decode("utf-8")
-
-
+@cached_metrics
 def parse_relative_abundances(output_results):
     read_ratio_pattern = r"^(\S+)\s+Ratio of reads:(.*?)$"
     bases_ratio_pattern = r"^(\S+)\s+Ratio of bases:(.*?)$"
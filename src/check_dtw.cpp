@@ -65,6 +65,21 @@ double rawalign_dtw_banded(vector<double> a, vector<double> b, uint32_t band_rad
     return f(float_a.data(), float_a.size(), float_b.data(), float_b.size(), band_radius, false);
 }
 
+//the kernels with a cutoff, without one
+double rawalign_dtw(vector<double> a, vector<double> b,
+    float f(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element, float cutoff)){
+    vector<float> float_a = convert_to_float_vector(a);
+    vector<float> float_b = convert_to_float_vector(b);
+    return f(float_a.data(), float_a.size(), float_b.data(), float_b.size(), false, DTW_NO_CUTOFF);
+}
+
+double rawalign_dtw_banded(vector<double> a, vector<double> b, uint32_t band_radius,
+    float f(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, int band_radius, bool exclude_last_element, float cutoff)){
+    vector<float> float_a = convert_to_float_vector(a);
+    vector<float> float_b = convert_to_float_vector(b);
+    return f(float_a.data(), float_a.size(), float_b.data(), float_b.size(), band_radius, false, DTW_NO_CUTOFF);
+}
+
 dtw_result rawalign_dtw_tb(vector<double> a, vector<double> b,
     dtw_result f(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element)){
     vector<float> float_a = convert_to_float_vector(a);
@@ -135,7 +150,166 @@ int get_necessary_band_radius(dtw_result aln){
     return max_diff;
 }
 
+//the SIMD kernels compute every cell with the same operations as the scalar kernels, so their results must be identical
+bool simd_unit_test(const vector<double>& a, const vector<double>& b, int band_radius){
+    vector<float> float_a = convert_to_float_vector(a);
+    vector<float> float_b = convert_to_float_vector(b);
+    const dtw_kernels& scalar = dtw_get_kernels(DTW_ISA_SCALAR);
+    bool passed = true;
+    for(int isa = DTW_ISA_SSE42; isa <= DTW_ISA_AVX512; isa++){
+        if(!dtw_isa_supported((dtw_isa)isa)){
+            continue;
+        }
+        const dtw_kernels& kernels = dtw_get_kernels((dtw_isa)isa);
+        for(bool exclude_last_element : {false, true}){
+            float expected[4] = {
+                scalar.global(float_a.data(), float_a.size(), float_b.data(), float_b.size(), exclude_last_element, DTW_NO_CUTOFF),
+                scalar.semiglobal(float_a.data(), float_a.size(), float_b.data(), float_b.size(), exclude_last_element),
+                scalar.semiglobal(float_b.data(), float_b.size(), float_a.data(), float_a.size(), exclude_last_element),
+                scalar.global_slantedbanded_antidiagonalwise(float_a.data(), float_a.size(), float_b.data(), float_b.size(), band_radius, exclude_last_element, DTW_NO_CUTOFF),
+            };
+            float actual[4] = {
+                kernels.global(float_a.data(), float_a.size(), float_b.data(), float_b.size(), exclude_last_element, DTW_NO_CUTOFF),
+                kernels.semiglobal(float_a.data(), float_a.size(), float_b.data(), float_b.size(), exclude_last_element),
+                kernels.semiglobal(float_b.data(), float_b.size(), float_a.data(), float_a.size(), exclude_last_element),
+                kernels.global_slantedbanded_antidiagonalwise(float_a.data(), float_a.size(), float_b.data(), float_b.size(), band_radius, exclude_last_element, DTW_NO_CUTOFF),
+            };
+            const char* names[4] = {"global", "semiglobal", "semiglobal (swapped)", "global_slantedbanded_antidiagonalwise"};
+            for(int k = 0; k < 4; k++){
+                if(expected[k] != actual[k]){
+                    cout << fixed << setprecision(6);
+                    cout << "***** FAILED *****" << endl;
+                    cout << kernels.name << " " << names[k] << " (exclude_last_element=" << exclude_last_element << "): "
+                         << actual[k] << " instead of " << expected[k] << endl;
+                    passed = false;
+                }
+            }
+        }
+    }
+    return passed;
+}
+
 #define APPROX_EQ(a, b) (abs(a - b) < 0.001)
+
+//a kernel with a cutoff must return the exact cost if it is at most the cutoff, and otherwise a lower bound of the cost above the cutoff
+//DTW_lower_bound must be at most the cost (up to rounding)
+bool cutoff_unit_test(const vector<double>& a, const vector<double>& b, int band_radius){
+    vector<float> float_a = convert_to_float_vector(a);
+    vector<float> float_b = convert_to_float_vector(b);
+    bool passed = true;
+    for(int isa = DTW_ISA_SCALAR; isa <= DTW_ISA_AVX512; isa++){
+        if(!dtw_isa_supported((dtw_isa)isa)){
+            continue;
+        }
+        const dtw_kernels& kernels = dtw_get_kernels((dtw_isa)isa);
+        for(bool exclude_last_element : {false, true}){
+            for(int radius : {-1, band_radius}){
+                auto kernel = [&](float cutoff){
+                    return radius < 0 ?
+                        kernels.global(float_a.data(), float_a.size(), float_b.data(), float_b.size(), exclude_last_element, cutoff) :
+                        kernels.global_slantedbanded_antidiagonalwise(float_a.data(), float_a.size(), float_b.data(), float_b.size(), radius, exclude_last_element, cutoff);
+                };
+                float exact = kernel(DTW_NO_CUTOFF);
+                for(float cutoff : {exact, exact*1.5f, exact*0.9f, exact*0.5f, 0.0f}){
+                    float res = kernel(cutoff);
+                    if(exact <= cutoff ? res != exact : !(res > cutoff && res <= exact)){
+                        cout << fixed << setprecision(6);
+                        cout << "***** FAILED *****" << endl;
+                        cout << kernels.name << " cutoff " << cutoff << " (band_radius=" << radius << ", exclude_last_element=" << exclude_last_element << "): "
+                             << res << " for the cost " << exact << endl;
+                        passed = false;
+                    }
+                }
+                float lower_bound = DTW_lower_bound(float_a.data(), float_a.size(), float_b.data(), float_b.size(), radius, exclude_last_element);
+                if(lower_bound > exact + 0.001 + 0.0001*exact){
+                    cout << fixed << setprecision(6);
+                    cout << "***** FAILED *****" << endl;
+                    cout << "DTW_lower_bound (band_radius=" << radius << ", exclude_last_element=" << exclude_last_element << "): "
+                         << lower_bound << " for the cost " << exact << endl;
+                    passed = false;
+                }
+            }
+        }
+    }
+    return passed;
+}
+
+//an alignment must be a connected, monotonic path from (0, first_j) to (a_length-1, last_j) whose differences sum up to its cost
+bool is_valid_alignment(const dtw_result& res, const vector<float>& a, const vector<float>& b, size_t first_j, size_t last_j){
+    const vector<alignment_element>& aln = res.alignment;
+    if(aln.empty() || aln.front().position.i != 0 || aln.front().position.j != first_j
+       || aln.back().position.i != a.size()-1 || aln.back().position.j != last_j){
+        return false;
+    }
+    double sum = 0;
+    for(size_t k = 0; k < aln.size(); k++){
+        size_t i = aln[k].position.i;
+        size_t j = aln[k].position.j;
+        if(k > 0){
+            size_t di = i - aln[k-1].position.i;
+            size_t dj = j - aln[k-1].position.j;
+            if(di > 1 || dj > 1 || di + dj == 0){
+                return false;
+            }
+        }
+        if(aln[k].difference != abs(a[i] - b[j])){
+            return false;
+        }
+        sum += aln[k].difference;
+    }
+    return abs(sum - res.cost) < 0.001 * max(1.0, sum);
+}
+
+//the banded tracebacks must have the cost of the banded kernel and be identical to the full tracebacks if the band covers the matrix
+bool tb_unit_test(const vector<double>& a, const vector<double>& b, int band_radius){
+    vector<float> float_a = convert_to_float_vector(a);
+    vector<float> float_b = convert_to_float_vector(b);
+    bool passed = true;
+    auto fail = [&](const string& what){
+        cout << "***** FAILED *****" << endl;
+        cout << what << " (band_radius=" << band_radius << ")" << endl;
+        passed = false;
+    };
+
+    dtw_result banded = DTW_global_slantedbanded_tb(float_a.data(), float_a.size(), float_b.data(), float_b.size(), band_radius);
+    if(banded.cost != DTW_global_slantedbanded_antidiagonalwise(float_a.data(), float_a.size(), float_b.data(), float_b.size(), band_radius)){
+        fail("DTW_global_slantedbanded_tb cost");
+    }
+    if(!is_valid_alignment(banded, float_a, float_b, 0, float_b.size()-1)){
+        fail("DTW_global_slantedbanded_tb alignment");
+    }
+    dtw_result excluded = DTW_global_slantedbanded_tb(float_a.data(), float_a.size(), float_b.data(), float_b.size(), band_radius, true);
+    if(excluded.alignment.size() != banded.alignment.size()-1
+       || excluded.cost != DTW_global_slantedbanded_antidiagonalwise(float_a.data(), float_a.size(), float_b.data(), float_b.size(), band_radius, true)){
+        fail("DTW_global_slantedbanded_tb with exclude_last_element");
+    }
+
+    dtw_result semiglobal = DTW_semiglobal_slantedbanded_tb(float_a.data(), float_a.size(), float_b.data(), float_b.size(), band_radius);
+    if(semiglobal.alignment.empty() || !is_valid_alignment(semiglobal, float_a, float_b, semiglobal.alignment.front().position.j, semiglobal.alignment.back().position.j)
+       || semiglobal.cost < DTW_semiglobal(float_a.data(), float_a.size(), float_b.data(), float_b.size())){
+        fail("DTW_semiglobal_slantedbanded_tb");
+    }
+
+    int full_band_radius = max(a.size(), b.size());
+    vector<pair<dtw_result, dtw_result>> full = {
+        {DTW_global_tb(float_a.data(), float_a.size(), float_b.data(), float_b.size()),
+         DTW_global_slantedbanded_tb(float_a.data(), float_a.size(), float_b.data(), float_b.size(), full_band_radius)},
+        {DTW_semiglobal_tb(float_a.data(), float_a.size(), float_b.data(), float_b.size()),
+         DTW_semiglobal_slantedbanded_tb(float_a.data(), float_a.size(), float_b.data(), float_b.size(), full_band_radius)},
+    };
+    for(auto& expected_actual : full){
+        const dtw_result& expected = expected_actual.first;
+        const dtw_result& actual = expected_actual.second;
+        bool same = APPROX_EQ(expected.cost, actual.cost) && expected.alignment.size() == actual.alignment.size();
+        for(size_t k = 0; same && k < expected.alignment.size(); k++){
+            same = expected.alignment[k].position.i == actual.alignment[k].position.i && expected.alignment[k].position.j == actual.alignment[k].position.j;
+        }
+        if(!same){
+            fail("banded traceback with a full band: " + to_string(actual.cost) + " instead of " + to_string(expected.cost));
+        }
+    }
+    return passed;
+}
 bool random_unit_test(uint32_t a_length, uint32_t b_length, uint32_t seed){
     vector<double> a = generate_random_vector(a_length, seed);
     vector<double> b = generate_random_vector(b_length, seed+1);
@@ -162,6 +336,19 @@ bool random_unit_test(uint32_t a_length, uint32_t b_length, uint32_t seed){
         }
     }
 
+    //also with bands that are too narrow for the optimal alignment
+    for(int radius : {band_radius, max(1, band_radius/2), max(1, (int)a_length/10)}){
+        if(!simd_unit_test(a, b, radius)){
+            passed = false;
+        }
+        if(!tb_unit_test(a, b, radius)){
+            passed = false;
+        }
+        if(!cutoff_unit_test(a, b, radius)){
+            passed = false;
+        }
+    }
+
     if(!passed){
         //set high precision for cout
         cout << fixed << setprecision(6);
@@ -180,6 +367,46 @@ bool random_unit_test(uint32_t a_length, uint32_t b_length, uint32_t seed){
     return passed;
 }
 
+//n_problems random problems with lengths up to max_length, full or banded, aligned at once by DTW_global_batch
+vector<dtw_batch_problem> random_batch(vector<vector<float>>& values, int n_problems, int max_length, unsigned int seed){
+    std::mt19937 rng(seed);
+    values.clear();
+    for(int k = 0; k < 2*n_problems; k++){
+        values.push_back(convert_to_float_vector(generate_random_vector(1 + rng()%max_length, rng())));
+    }
+    vector<dtw_batch_problem> problems;
+    for(int k = 0; k < n_problems; k++){
+        const vector<float>& a = values[2*k];
+        const vector<float>& b = values[2*k+1];
+        int band_radius = rng()%3 == 0 ? -1 : (int)(rng() % (max(a.size(), b.size())+1));
+        problems.push_back(dtw_batch_problem{a.data(), (uint32_t)a.size(), b.data(), (uint32_t)b.size(), band_radius, rng()%2 == 0});
+    }
+    return problems;
+}
+
+//every cost of a batch must be identical to the one of the single-problem kernel
+bool batch_unit_test(int n_problems, int max_length, unsigned int seed){
+    vector<vector<float>> values;
+    vector<dtw_batch_problem> problems = random_batch(values, n_problems, max_length, seed);
+    vector<float> costs(n_problems);
+    DTW_global_batch(problems.data(), problems.size(), costs.data());
+    bool passed = true;
+    for(int k = 0; k < n_problems; k++){
+        const dtw_batch_problem& p = problems[k];
+        float expected = p.band_radius < 0 ?
+            DTW_global(p.a_values, p.a_length, p.b_values, p.b_length, p.exclude_last_element) :
+            DTW_global_slantedbanded_antidiagonalwise(p.a_values, p.a_length, p.b_values, p.b_length, p.band_radius, p.exclude_last_element);
+        if(costs[k] != expected){
+            cout << fixed << setprecision(6);
+            cout << "***** FAILED *****" << endl;
+            cout << "DTW_global_batch (seed=" << seed << ", a_length=" << p.a_length << ", b_length=" << p.b_length << ", band_radius=" << p.band_radius
+                 << ", exclude_last_element=" << p.exclude_last_element << "): " << costs[k] << " instead of " << expected << endl;
+            passed = false;
+        }
+    }
+    return passed;
+}
+
 bool run_various_random_tests(int n_tests){
     int test_groups = 7;
     int tests_per_group = n_tests / test_groups;
@@ -233,6 +460,13 @@ bool run_various_random_tests(int n_tests){
         }
     }
 
+    //batches of problems of different sizes and bands
+    for(int i = 0; i < tests_per_group/10; i++){
+        if(!batch_unit_test(1 + i%40, i%2 == 0 ? 20 : 200, i)){
+            return false;
+        }
+    }
+
     return true;
 }
 
@@ -247,6 +481,16 @@ double opt_blocker;
     cout << #fcall << " time: " << chrono::duration_cast<chrono::microseconds>(end - start).count() / (double)REPETITIONS << "us" << endl; \
 }
 
+#define BENCHMARK_KERNEL(REPETITIONS, NAME, fcall) {\
+    auto start = chrono::high_resolution_clock::now(); \
+    opt_blocker = 0; \
+    for(int i = 0; i < REPETITIONS; i++){ \
+        opt_blocker += fcall; \
+    } \
+    auto end = chrono::high_resolution_clock::now(); \
+    cout << NAME << " time: " << chrono::duration_cast<chrono::microseconds>(end - start).count() / (double)REPETITIONS << "us" << endl; \
+}
+
 void performance_benchmark(int iterations, int a_length, int b_length, float band_radius_fraction){
     unsigned int seed = 42;
     vector<double> a = generate_random_vector(a_length, seed);
@@ -255,9 +499,62 @@ void performance_benchmark(int iterations, int a_length, int b_length, float ban
 
     BENCHMARK(iterations, rawalign_dtw(a, b, DTW_global));
     BENCHMARK(iterations, rawalign_dtw(a, b, DTW_global_slow));
+    BENCHMARK(iterations, rawalign_dtw(a, b, DTW_semiglobal));
     BENCHMARK(iterations, rawalign_dtw_banded(a, b, band_radius, DTW_global_diagonalbanded));
     BENCHMARK(iterations, rawalign_dtw_banded(a, b, band_radius, DTW_global_slantedbanded));
     BENCHMARK(iterations, rawalign_dtw_banded(a, b, band_radius, DTW_global_slantedbanded_antidiagonalwise));
+
+    //SIMD kernels of every instruction set the CPU supports
+    cout << "selected SIMD kernels: " << dtw_selected_kernels().name << endl;
+    for(int isa = DTW_ISA_SSE42; isa <= DTW_ISA_AVX512; isa++){
+        if(!dtw_isa_supported((dtw_isa)isa)){
+            continue;
+        }
+        const dtw_kernels& kernels = dtw_get_kernels((dtw_isa)isa);
+        BENCHMARK_KERNEL(iterations, string(kernels.name) + " global", rawalign_dtw(a, b, kernels.global));
+        BENCHMARK_KERNEL(iterations, string(kernels.name) + " semiglobal", rawalign_dtw(a, b, kernels.semiglobal));
+        BENCHMARK_KERNEL(iterations, string(kernels.name) + " global_slantedbanded_antidiagonalwise", rawalign_dtw_banded(a, b, band_radius, kernels.global_slantedbanded_antidiagonalwise));
+    }
+
+    //early abandoning with a cutoff of half of the cost, and the lower bound that would reject the problem before that
+    vector<float> float_a = convert_to_float_vector(a);
+    vector<float> float_b = convert_to_float_vector(b);
+    float global_cutoff = DTW_global_simd(float_a.data(), float_a.size(), float_b.data(), float_b.size()) / 2;
+    float banded_cutoff = DTW_global_slantedbanded_antidiagonalwise_simd(float_a.data(), float_a.size(), float_b.data(), float_b.size(), band_radius) / 2;
+    BENCHMARK(iterations, DTW_global_simd(float_a.data(), float_a.size(), float_b.data(), float_b.size(), false, global_cutoff));
+    BENCHMARK(iterations, DTW_global_slantedbanded_antidiagonalwise_simd(float_a.data(), float_a.size(), float_b.data(), float_b.size(), band_radius, false, banded_cutoff));
+    BENCHMARK(iterations, DTW_lower_bound(float_a.data(), float_a.size(), float_b.data(), float_b.size(), -1));
+    BENCHMARK(iterations, DTW_lower_bound(float_a.data(), float_a.size(), float_b.data(), float_b.size(), band_radius));
+
+    //a batch of problems of about the same size (e.g., the chains of a read), one after the other and at once
+    const int n_problems = 16;
+    vector<vector<float>> values;
+    for(int k = 0; k < 2*n_problems; k++){
+        int length = (k%2 == 0 ? a_length : b_length) * (90 + k%20) / 100;
+        values.push_back(convert_to_float_vector(generate_random_vector(max(1, length), seed+k)));
+    }
+    for(int problem_band_radius : {-1, band_radius}){
+        vector<dtw_batch_problem> problems;
+        for(int k = 0; k < n_problems; k++){
+            problems.push_back(dtw_batch_problem{values[2*k].data(), (uint32_t)values[2*k].size(), values[2*k+1].data(), (uint32_t)values[2*k+1].size(), problem_band_radius, false});
+        }
+        vector<float> costs(n_problems);
+        const char* name = problem_band_radius < 0 ? "global" : "global_slantedbanded_antidiagonalwise";
+        auto one_by_one = [&](){
+            float sum = 0;
+            for(auto& p : problems){
+                sum += problem_band_radius < 0 ? DTW_global_simd(p.a_values, p.a_length, p.b_values, p.b_length) :
+                    DTW_global_slantedbanded_antidiagonalwise_simd(p.a_values, p.a_length, p.b_values, p.b_length, p.band_radius);
+            }
+            return sum;
+        };
+        auto batched = [&](){
+            DTW_global_batch(problems.data(), problems.size(), costs.data());
+            return costs[0];
+        };
+        BENCHMARK_KERNEL(iterations, to_string(n_problems) + " problems one by one " + name, one_by_one());
+        BENCHMARK_KERNEL(iterations, to_string(n_problems) + " problems batched " + name, batched());
+    }
 }
 
 int main(int argc, char* argv[]){
@@ -25,6 +25,17 @@ using namespace std;
 
 //#define DEBUG
 
+//number of rows (or anti-diagonals) after which a kernel with a cutoff checks whether it can stop early
+#define DTW_CUTOFF_CHECK_INTERVAL 16
+
+static inline float min_value(const float* values, const int n){
+	float res = 1e10;
+	for(int k = 0; k < n; k++){
+		res = min(res, values[k]);
+	}
+	return res;
+}
+
 #define PRINTDP {							\
 	for(int i = 0; i < dp.size(); i++){		\
 			std::cout << std::fixed;		\
@@ -34,8 +45,9 @@ using namespace std;
 		std::cout << std::endl;				\
 	}
 
-float DTW_global(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element){
+float DTW_global(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element, float cutoff){
 	std::vector<float> dp(a_length, 1e10);
+	const float excluded = exclude_last_element ? DISTANCE(a_values[a_length-1], b_values[b_length-1]) : 0.0f;
     dp[0] = DISTANCE(a_values[0], b_values[0]);
 
     for(uint32_t j = 1; j < a_length; j++){
@@ -56,6 +68,13 @@ float DTW_global(const float* a_values, const uint32_t a_length, const float* b_
 			dp[j] = center;
 			old_left = left;
 		}
+		//every alignment passes through every row and the costs only increase along it, so the smallest cost of a row is a lower bound
+		if(cutoff < DTW_NO_CUTOFF && i % DTW_CUTOFF_CHECK_INTERVAL == 0){
+			float lower_bound = min_value(dp.data(), a_length) - excluded;
+			if(lower_bound > cutoff){
+				return lower_bound;
+			}
+		}
 	}
 	if(exclude_last_element){
 		return dp[a_length-1] - DISTANCE(a_values[a_length-1], b_values[b_length-1]);
@@ -270,7 +289,7 @@ float DTW_global_slantedbanded(const float* a_values, uint32_t a_length, const f
 	}
 }
 
-float DTW_global_slantedbanded_antidiagonalwise(const float* __restrict__ a_values, uint32_t a_length, const float* __restrict__ b_values, uint32_t b_length, int band_radius, bool exclude_last_element){
+float DTW_global_slantedbanded_antidiagonalwise(const float* __restrict__ a_values, uint32_t a_length, const float* __restrict__ b_values, uint32_t b_length, int band_radius, bool exclude_last_element, float cutoff){
 	assert(a_length > 0 && b_length > 0);
 	assert(a_length < std::numeric_limits<int>::max());
 	assert(b_length < std::numeric_limits<int>::max());
@@ -489,6 +508,18 @@ float DTW_global_slantedbanded_antidiagonalwise(const float* __restrict__ a_valu
 		dp1 = dp2;
 		dp2 = tmp;
 		previous_increment_center_row = increment_center_row;
+
+		//every alignment passes through one of two consecutive anti-diagonals (dp0 and dp1) and the costs only increase along it,
+		//so their smallest cost is a lower bound (the cells outside of the band hold 1e10 or costs of earlier anti-diagonals, which only lowers it)
+		if(cutoff < DTW_NO_CUTOFF && iteration % DTW_CUTOFF_CHECK_INTERVAL == 0){
+			float lower_bound = min(min_value(dp0, dpsize), min_value(dp1, dpsize));
+			if(exclude_last_element){
+				lower_bound -= DISTANCE(a_values[a_length-1], b_values[b_length-1]);
+			}
+			if(lower_bound > cutoff){
+				return lower_bound;
+			}
+		}
 	}
 
 	#ifdef DEBUG
@@ -592,29 +623,95 @@ float DTW_semiglobal_slow(const float* a_values, const uint32_t a_length, const
 	}
 }
 
-dtw_result DTW_global_tb(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element){
+/*
+ * row i of the DTW matrix of DTW_global_tb and DTW_semiglobal_tb, from row i-1
+ */
+static inline void DTW_tb_next_row(const float* prev, float* cur, const float a_value, const float* b_values, const uint32_t b_length){
+	cur[0] = prev[0] + DISTANCE(a_value, b_values[0]);
+	for(uint32_t j = 1; j < b_length; j++){
+		float best_in = min(min(prev[j], cur[j-1]), prev[j-1]);
+		cur[j] = best_in + DISTANCE(a_value, b_values[j]);
+	}
+}
+
+/*
+ * rows start+1 to end of the DTW matrix from row start (start_row): rows start+k*interval are kept in kept[k*b_length], the others
+ * only in the two rows of rolling (unused if interval is 1)
+ * returns row end
+ */
+static const float* DTW_tb_rows(const float* start_row, const uint32_t start, const uint32_t end, const uint32_t interval, float* kept, float* rolling,
+								const float* a_values, const float* b_values, const uint32_t b_length){
+	if(kept != start_row){
+		std::copy_n(start_row, b_length, kept);
+	}
+	const float* prev = kept;
+	for(uint32_t i = start+1; i <= end; i++){
+		float* cur = (i-start) % interval == 0 ? &kept[((i-start)/interval)*(size_t)b_length] : &rolling[(i%2)*(size_t)b_length];
+		DTW_tb_next_row(prev, cur, a_values[i], b_values, b_length);
+		prev = cur;
+	}
+	return prev;
+}
+
+/*
+ * traceback of DTW_global_tb (semiglobal=false) and DTW_semiglobal_tb (semiglobal=true) without the full matrix, with two levels of checkpoints:
+ * the forward pass keeps every outer_interval-th row (outer_interval = inner_interval^2, inner_interval = ceil(cbrt(a_length))),
+ * when the traceback reaches an outer block, its every inner_interval-th row is recomputed from the outer checkpoint, and when it reaches
+ * an inner block, all of its rows are recomputed from the inner checkpoint
+ * the recomputed cells are identical to the forward pass, so the cost and the alignment are those of the full matrix,
+ * with O(cbrt(a_length)*b_length) instead of O(a_length*b_length) memory and about three times the computation
+ * (a divide and conquer traceback in O(a_length+b_length) memory, as in Hirschberg's algorithm, would not choose the same path
+ * as the full matrix among equally good ones)
+ */
+static dtw_result DTW_tb_checkpointed(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool semiglobal, bool exclude_last_element){
 	assert(a_length > 0 && b_length > 0);
-    
-    vector<vector<float>> dp(a_length, vector<float>(b_length));
-    
-    dp[0][0] = DISTANCE(a_values[0], b_values[0]);
-    
-    for(uint32_t i = 1; i < a_length; i++){
-        dp[i][0] = dp[i-1][0] + DISTANCE(a_values[i], b_values[0]);
-    }
-    for(uint32_t j = 1; j < b_length; j++){
-        dp[0][j] = dp[0][j-1] + DISTANCE(a_values[0], b_values[j]);
-    }
 
-    for(uint32_t i = 1; i < a_length; i++){
-        for(uint32_t j = 1; j < b_length; j++){
-            float best_in = min(min(dp[i-1][j], dp[i][j-1]), dp[i-1][j-1]);
-            dp[i][j] = best_in + DISTANCE(a_values[i], b_values[j]);
-        }
-    }
+	uint32_t inner_interval = 1;
+	while(inner_interval*inner_interval*inner_interval < a_length){
+		inner_interval++;
+	}
+	const uint32_t outer_interval = inner_interval*inner_interval;
+	const uint32_t n_checkpoints = (a_length-1)/outer_interval + 1;
+
+	//row 0
+	vector<float> checkpoints(n_checkpoints*(size_t)b_length);
+	checkpoints[0] = DISTANCE(a_values[0], b_values[0]);
+	for(uint32_t j = 1; j < b_length; j++){
+		if(semiglobal){
+			checkpoints[j] = DISTANCE(a_values[0], b_values[j]);
+		}
+		else{
+			checkpoints[j] = checkpoints[j-1] + DISTANCE(a_values[0], b_values[j]);
+		}
+	}
+
+	//forward pass, the rows between checkpoints are discarded
+	vector<float> rows(2*(size_t)b_length);
+	const float* last_row = DTW_tb_rows(checkpoints.data(), 0, a_length-1, outer_interval, checkpoints.data(), rows.data(), a_values, b_values, b_length);
+
+	uint32_t best_j = b_length-1;
+	if(semiglobal){
+		best_j = 0;
+		for(uint32_t j = 1; j < b_length; j++){
+			if(last_row[j] < last_row[best_j]){
+				best_j = j;
+			}
+		}
+	}
+	const float cost = last_row[best_j];
+
+	//the inner checkpoints of the outer block from outer_start, and the rows block_start to block_start+inner_interval
+	//(the next inner checkpoint), recomputed from the inner checkpoint at block_start
+	vector<float> inner_checkpoints(inner_interval*(size_t)b_length);
+	vector<float> block((inner_interval+1)*(size_t)b_length);
+	uint32_t outer_start = a_length;
+	uint32_t block_start = a_length;
+	auto dp = [&](uint32_t i, uint32_t j) -> float {
+		return block[(i-block_start)*(size_t)b_length + j];
+	};
 
 	uint32_t i = a_length-1;
-	uint32_t j = b_length-1;
+	uint32_t j = best_j;
 	vector<alignment_element> reverse_alignment;
 	reverse_alignment.push_back(
 		(alignment_element){
@@ -622,7 +719,8 @@ dtw_result DTW_global_tb(const float* a_values, const uint32_t a_length, const f
 			DISTANCE(a_values[i], b_values[j])
 		}
 	);
-	while(i > 0 || j > 0){
+	//the semiglobal alignment starts anywhere in b
+	while(i > 0 || (!semiglobal && j > 0)){
 		if(i==0){
 			j--;
 		}
@@ -630,9 +728,23 @@ dtw_result DTW_global_tb(const float* a_values, const uint32_t a_length, const f
 			i--;
 		}
 		else{
-			float left = dp[i-1][j];
-			float top = dp[i][j-1];
-			float topleft = dp[i-1][j-1];
+			if(i-1 < block_start || i > block_start+inner_interval){
+				block_start = ((i-1)/inner_interval)*inner_interval;
+				if(block_start/outer_interval*outer_interval != outer_start){
+					outer_start = block_start/outer_interval*outer_interval;
+					//up to the last inner checkpoint of the outer block
+					const uint32_t outer_end = min(outer_start+outer_interval-inner_interval, a_length-1);
+					DTW_tb_rows(&checkpoints[(outer_start/outer_interval)*(size_t)b_length], outer_start, outer_end, inner_interval,
+								inner_checkpoints.data(), rows.data(), a_values, b_values, b_length);
+				}
+				const uint32_t block_end = min(block_start+inner_interval, a_length-1);
+				DTW_tb_rows(&inner_checkpoints[((block_start-outer_start)/inner_interval)*(size_t)b_length], block_start, block_end, 1,
+							block.data(), NULL, a_values, b_values, b_length);
+			}
+
+			float left = dp(i-1, j);
+			float top = dp(i, j-1);
+			float topleft = dp(i-1, j-1);
 
 			if(left < min(top, topleft)){
 				i--;
@@ -653,51 +765,123 @@ dtw_result DTW_global_tb(const float* a_values, const uint32_t a_length, const f
 		reverse_alignment.push_back(ae);
 	}
 
-	vector<alignment_element> alignment;
-    std::copy(reverse_alignment.rbegin(), reverse_alignment.rend(), std::back_inserter(alignment));
+	vector<alignment_element> alignment(reverse_alignment.rbegin(), reverse_alignment.rend());
 
 	if(exclude_last_element){
 		alignment.pop_back();
-		float score = dp[a_length-1][b_length-1] - DISTANCE(a_values[a_length-1], b_values[b_length-1]);
-		return (dtw_result){score, alignment};
+		return (dtw_result){cost - DISTANCE(a_values[a_length-1], b_values[best_j]), alignment};
 	}
 	else{
-		return (dtw_result){dp[a_length-1][b_length-1], alignment};
+		return (dtw_result){cost, alignment};
 	}
 }
 
+dtw_result DTW_global_tb(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element){
+	return DTW_tb_checkpointed(a_values, a_length, b_values, b_length, false, exclude_last_element);
+}
+
+/*
+ * a is aligned fully (globally) to the best matching substring of b (i.e., b is not aligned globally)
+ */
 dtw_result DTW_semiglobal_tb(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element){
+	return DTW_tb_checkpointed(a_values, a_length, b_values, b_length, true, exclude_last_element);
+}
+
+/*
+ * the band of DTW_global_slantedbanded_antidiagonalwise (a is the longer sequence) as one interval of cells per anti-diagonal d = i+j:
+ * the cells (i, d-i) for i = first_i[d], first_i[d]-1, ..., first_i[d]-n_cells[d]+1
+ */
+static void slantedbanded_antidiagonals(const uint32_t a_length, const uint32_t b_length, int band_radius, vector<int>& first_i, vector<int>& n_cells){
+	first_i.assign(a_length+b_length-1, 0);
+	n_cells.assign(a_length+b_length-1, 0);
+
+	int extra_band_radius_due_to_slanting =	((a_length-b_length)*band_radius + a_length - 1) / a_length;
+	band_radius += extra_band_radius_due_to_slanting;
+	const int primary_antidiagonal_length = band_radius + (band_radius % 2 == 0 ? 1 : 0);
+	const int secondary_antidiagonal_length = band_radius + (band_radius % 2 == 1 ? 1 : 0);
+
+	auto add_antidiagonal = [&](int antidiagonal_start_i, int antidiagonal_start_j, int antidiagonal_length){
+		int antidiagonal_offset_start = max(max(0, antidiagonal_start_i-(int)a_length+1), -antidiagonal_start_j);
+		int antidiagonal_offset_end = min(min(antidiagonal_length, antidiagonal_start_i+1), (int)b_length-antidiagonal_start_j);
+		int d = antidiagonal_start_i + antidiagonal_start_j;
+		first_i[d] = antidiagonal_start_i - antidiagonal_offset_start;
+		n_cells[d] = max(0, antidiagonal_offset_end - antidiagonal_offset_start);
+	};
+
+	//iteration 0 only computes the top left corner
+	n_cells[0] = 1;
+	int center_row = 0;
+	for(int iteration = 1; (uint32_t)iteration < a_length; iteration++){
+		int center_column = iteration;
+		int next_row = center_row+1;
+		int64_t next_slope = next_row*(int64_t)a_length;
+		int64_t target_slope = b_length*(int64_t)center_column;
+		if(next_slope <= target_slope){
+			center_row++;
+			add_antidiagonal(center_column + secondary_antidiagonal_length/2 - 1, center_row - secondary_antidiagonal_length/2, secondary_antidiagonal_length);
+		}
+		add_antidiagonal(center_column + primary_antidiagonal_length/2, center_row - primary_antidiagonal_length/2, primary_antidiagonal_length);
+	}
+}
+
+/*
+ * DTW_global_tb restricted to the band of DTW_global_slantedbanded_antidiagonalwise (same cost)
+ * only the cells of the band are stored, O(max(a_length, b_length)*band_radius) memory
+ */
+dtw_result DTW_global_slantedbanded_tb(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, int band_radius, bool exclude_last_element){
 	assert(a_length > 0 && b_length > 0);
-    
-    vector<vector<float>> dp(a_length, vector<float>(b_length));
-    
-    dp[0][0] = DISTANCE(a_values[0], b_values[0]);
-    
-    for(uint32_t i = 1; i < a_length; i++){
-        dp[i][0] = dp[i-1][0] + DISTANCE(a_values[i], b_values[0]);
-    }
-    for(uint32_t j = 1; j < b_length; j++){
-        dp[0][j] = DISTANCE(a_values[0], b_values[j]);
-    }
+	assert(a_length < std::numeric_limits<int>::max());
+	assert(b_length < std::numeric_limits<int>::max());
+	assert(band_radius >= 0);
 
-    for(uint32_t i = 1; i < a_length; i++){
-        for(uint32_t j = 1; j < b_length; j++){
-            float best_in = min(min(dp[i-1][j], dp[i][j-1]), dp[i-1][j-1]);
-            dp[i][j] = best_in + DISTANCE(a_values[i], b_values[j]);
-        }
-    }
+	//the band is defined with the longer sequence as x, the alignment is reported for a and b
+	const bool swapped = a_length < b_length;
+	const float* x_values = swapped ? b_values : a_values;
+	const float* y_values = swapped ? a_values : b_values;
+	const uint32_t x_length = swapped ? b_length : a_length;
+	const uint32_t y_length = swapped ? a_length : b_length;
+
+	vector<int> first_i;
+	vector<int> n_cells;
+	slantedbanded_antidiagonals(x_length, y_length, band_radius, first_i, n_cells);
+	const int n_antidiagonals = first_i.size();
+	vector<size_t> antidiagonal_offsets(n_antidiagonals+1, 0);
+	for(int d = 0; d < n_antidiagonals; d++){
+		antidiagonal_offsets[d+1] = antidiagonal_offsets[d] + n_cells[d];
+	}
+	vector<float> dp(antidiagonal_offsets[n_antidiagonals], 1e10);
 
-    float best = dp[a_length-1][0];
-	uint32_t best_j = 0;
-    for(uint32_t j = 1; j < b_length; j++){
-		if(dp[a_length-1][j] < best){
-			best = dp[a_length-1][j];
-			best_j = j;
+	//1e10 outside of the band (and the matrix)
+	auto band_cell = [&](int i, int j) -> float {
+		if(i < 0 || j < 0){
+			return 1e10;
+		}
+		int d = i+j;
+		int k = first_i[d] - i;
+		if(k < 0 || k >= n_cells[d]){
+			return 1e10;
+		}
+		return dp[antidiagonal_offsets[d] + k];
+	};
+
+	dp[0] = DISTANCE(x_values[0], y_values[0]);
+	for(int d = 1; d < n_antidiagonals; d++){
+		for(int k = 0; k < n_cells[d]; k++){
+			int i = first_i[d] - k;
+			int j = d - i;
+			float best_in = min(min(band_cell(i-1, j), band_cell(i, j-1)), band_cell(i-1, j-1));
+			dp[antidiagonal_offsets[d] + k] = best_in + DISTANCE(x_values[i], y_values[j]);
 		}
 	}
 
+	//indexed as dp[i][j] in DTW_global_tb
+	auto cell = [&](uint32_t i, uint32_t j) -> float {
+		return swapped ? band_cell(j, i) : band_cell(i, j);
+	};
+
 	uint32_t i = a_length-1;
-	uint32_t j = best_j;
+	uint32_t j = b_length-1;
+	const float cost = cell(i, j);
 	vector<alignment_element> reverse_alignment;
 	reverse_alignment.push_back(
 		(alignment_element){
@@ -705,8 +889,7 @@ dtw_result DTW_semiglobal_tb(const float* a_values, const uint32_t a_length, con
 			DISTANCE(a_values[i], b_values[j])
 		}
 	);
-	
-	while(i > 0){
+	while(i > 0 || j > 0){
 		if(i==0){
 			j--;
 		}
@@ -714,9 +897,9 @@ dtw_result DTW_semiglobal_tb(const float* a_values, const uint32_t a_length, con
 			i--;
 		}
 		else{
-			float left = dp[i-1][j];
-			float top = dp[i][j-1];
-			float topleft = dp[i-1][j-1];
+			float left = cell(i-1, j);
+			float top = cell(i, j-1);
+			float topleft = cell(i-1, j-1);
 
 			if(left < min(top, topleft)){
 				i--;
@@ -737,17 +920,331 @@ dtw_result DTW_semiglobal_tb(const float* a_values, const uint32_t a_length, con
 		reverse_alignment.push_back(ae);
 	}
 
-	
-	vector<alignment_element> alignment;
-    std::copy(reverse_alignment.rbegin(), reverse_alignment.rend(), std::back_inserter(alignment));
+	vector<alignment_element> alignment(reverse_alignment.rbegin(), reverse_alignment.rend());
 
 	if(exclude_last_element){
-		const alignment_element last = alignment.back();
-		float score = dp[a_length-1][best_j] - last.difference;
 		alignment.pop_back();
-		return (dtw_result){score, alignment};
+		return (dtw_result){cost - DISTANCE(a_values[a_length-1], b_values[b_length-1]), alignment};
 	}
 	else{
-	    return (dtw_result){dp[a_length-1][best_j], alignment};
+		return (dtw_result){cost, alignment};
+	}
+}
+
+/*
+ * the substring b[start, end] that a is aligned to by DTW_semiglobal, with O(a_length) memory
+ * the start of the best path into each cell is kept next to its cost, ties are broken as in the traceback of DTW_semiglobal_tb
+ */
+static float DTW_semiglobal_locate(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, uint32_t& start, uint32_t& end){
+	assert(a_length > 0 && b_length > 0);
+
+	vector<float> dp(a_length, 1e10);
+	vector<uint32_t> dp_start(a_length, 0);
+	float best = 1e10;
+	for(uint32_t i = 0; i < b_length; i++){
+		float old_left = dp[0];
+		uint32_t old_left_start = dp_start[0];
+		dp[0] = DISTANCE(a_values[0], b_values[i]);
+		dp_start[0] = i;
+
+		for(uint32_t j = 1; j < a_length; j++){
+			float top = dp[j-1];
+			float left = dp[j];
+			float topleft = old_left;
+			uint32_t left_start = dp_start[j];
+			if(top < min(left, topleft)){
+				dp_start[j] = dp_start[j-1];
+			}
+			else if(left < min(top, topleft)){
+				dp_start[j] = left_start;
+			}
+			else{
+				dp_start[j] = old_left_start;
+			}
+			dp[j] = min(min(top, left), topleft) + DISTANCE(a_values[j], b_values[i]);
+			old_left = left;
+			old_left_start = left_start;
+		}
+		if(i == 0 || dp[a_length-1] < best){
+			best = dp[a_length-1];
+			start = dp_start[a_length-1];
+			end = i;
+		}
+	}
+	return best;
+}
+
+/*
+ * DTW_semiglobal_tb restricted to a band: a is aligned to the substring of b found by DTW_semiglobal
+ * (with linear memory), and then globally to that substring with DTW_global_slantedbanded_tb
+ * the cost is that of DTW_semiglobal_tb if the band covers its alignment
+ */
+dtw_result DTW_semiglobal_slantedbanded_tb(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, int band_radius, bool exclude_last_element){
+	assert(a_length > 0 && b_length > 0);
+
+	uint32_t start = 0;
+	uint32_t end = 0;
+	DTW_semiglobal_locate(a_values, a_length, b_values, b_length, start, end);
+	dtw_result res = DTW_global_slantedbanded_tb(a_values, a_length, b_values + start, end - start + 1, band_radius, exclude_last_element);
+	for(size_t k = 0; k < res.alignment.size(); k++){
+		res.alignment[k].position.j += start;
+	}
+	return res;
+}
+
+#define DTW_BATCH_LANES F32SIMD_WIDTH
+//larger problems are faster with the single-problem SIMD kernels, whose working set fits into the L1 cache
+#define DTW_BATCH_MAX_CELLS 4096
+
+/*
+ * DTW_BATCH_LANES problems at once, one per lane, with the longer sequence of each problem as x
+ * the problems are padded to the largest one and computed one anti-diagonal d = i+j at a time, with the lane loop as the innermost loop,
+ * so every cell is computed for all lanes with one vector instruction and the cells of an anti-diagonal do not depend on each other
+ * cells outside of the band (or the matrix) of a lane are set to 1e10
+ */
+static void DTW_batch_lanes(const dtw_batch_problem* const* problems, const int n_lanes, float* const* costs){
+	const int L = DTW_BATCH_LANES;
+	uint32_t x_lengths[L];
+	uint32_t y_lengths[L];
+	int rows = 0;
+	int columns = 0;
+	for(int l = 0; l < n_lanes; l++){
+		x_lengths[l] = max(problems[l]->a_length, problems[l]->b_length);
+		y_lengths[l] = min(problems[l]->a_length, problems[l]->b_length);
+		rows = max(rows, (int)x_lengths[l]);
+		columns = max(columns, (int)y_lengths[l]);
+	}
+	const int n_antidiagonals = rows + columns - 1;
+
+	//x, y and the rows i of the cells of each anti-diagonal, interleaved by lane
+	//(last_i < first_i outside of the matrix and in unused lanes)
+	vector<float> x_interleaved(rows*(size_t)L, 0.0f);
+	vector<float> y_interleaved(columns*(size_t)L, 0.0f);
+	vector<int> first_i(n_antidiagonals*(size_t)L, 0);
+	vector<int> last_i(n_antidiagonals*(size_t)L, -1);
+	vector<int> band_first_i;
+	vector<int> band_n_cells;
+	for(int l = 0; l < n_lanes; l++){
+		const dtw_batch_problem& p = *problems[l];
+		const bool swapped = p.a_length < p.b_length;
+		const float* x_values = swapped ? p.b_values : p.a_values;
+		const float* y_values = swapped ? p.a_values : p.b_values;
+		for(int i = 0; i < (int)x_lengths[l]; i++){
+			x_interleaved[i*(size_t)L + l] = x_values[i];
+		}
+		for(int j = 0; j < (int)y_lengths[l]; j++){
+			y_interleaved[j*(size_t)L + l] = y_values[j];
+		}
+		if(p.band_radius >= 0){
+			slantedbanded_antidiagonals(x_lengths[l], y_lengths[l], p.band_radius, band_first_i, band_n_cells);
+		}
+		for(int d = 0; d < (int)(x_lengths[l] + y_lengths[l] - 1); d++){
+			if(p.band_radius >= 0){
+				first_i[d*(size_t)L + l] = band_first_i[d] - band_n_cells[d] + 1;
+				last_i[d*(size_t)L + l] = band_first_i[d];
+			}
+			else{
+				first_i[d*(size_t)L + l] = max(0, d - (int)y_lengths[l] + 1);
+				last_i[d*(size_t)L + l] = min((int)x_lengths[l] - 1, d);
+			}
+		}
+	}
+
+	//three anti-diagonals, the cell of row i is stored at index i+1 so that row -1 is always 1e10
+	vector<float> dp(3*(rows+1)*(size_t)L, 1e10);
+	int written_first[3] = {0, 0, 0};
+	int written_last[3] = {-1, -1, -1};
+	for(int d = 0; d < n_antidiagonals; d++){
+		float* __restrict__ cur = dp.data() + (d%3)*(rows+1)*(size_t)L;
+		const float* __restrict__ prev = dp.data() + ((d+2)%3)*(rows+1)*(size_t)L;
+		const float* __restrict__ prev2 = dp.data() + ((d+1)%3)*(rows+1)*(size_t)L;
+		const int* __restrict__ first = &first_i[d*(size_t)L];
+		const int* __restrict__ last = &last_i[d*(size_t)L];
+
+		int union_first = rows;
+		int union_last = -1;
+		for(int l = 0; l < n_lanes; l++){
+			//a lane whose matrix ended before anti-diagonal d has no cell on it
+			if(last[l] < first[l]) continue;
+			union_first = min(union_first, first[l]);
+			union_last = max(union_last, last[l]);
+		}
+
+		//anti-diagonal d-3 is overwritten
+		if(written_first[d%3] <= written_last[d%3]){
+			std::fill(cur + (written_first[d%3]+1)*(size_t)L, cur + (written_last[d%3]+2)*(size_t)L, (float)1e10);
+		}
+		if(d == 0){
+			//the top left corner has no predecessor
+			for(int l = 0; l < L; l++){
+				cur[L + l] = DISTANCE(x_interleaved[l], y_interleaved[l]);
+			}
+		}
+		else{
+			//the loop is empty if no lane has a cell on anti-diagonal d
+			for(int i = union_first; i <= union_last; i++){
+				const float* __restrict__ x = &x_interleaved[i*(size_t)L];
+				const float* __restrict__ y = &y_interleaved[(d-i)*(size_t)L];
+				#pragma GCC ivdep //the lanes are independent and the buffers do not overlap
+				for(int l = 0; l < L; l++){
+					float center = min(
+									min(prev[i*L + l], prev[(i+1)*L + l]),
+									prev2[i*L + l]
+								) + DISTANCE(x[l], y[l]);
+					cur[(i+1)*L + l] = (i >= first[l]) & (i <= last[l]) ? center : (float)1e10;
+				}
+			}
+		}
+		written_first[d%3] = union_first;
+		written_last[d%3] = union_last;
+
+		for(int l = 0; l < n_lanes; l++){
+			if(d == (int)(x_lengths[l] + y_lengths[l] - 2)){
+				const dtw_batch_problem& p = *problems[l];
+				float res = cur[x_lengths[l]*(size_t)L + l];
+				if(p.exclude_last_element){
+					res -= DISTANCE(p.a_values[p.a_length-1], p.b_values[p.b_length-1]);
+				}
+				*costs[l] = res;
+			}
+		}
+	}
+}
+
+/*
+ * the costs of independent DTW problems (e.g., the alignments of all chains of a read)
+ * the cost of a problem is identical to DTW_global (band_radius < 0) or DTW_global_slantedbanded_antidiagonalwise (band_radius >= 0)
+ * small problems (whose per-call overhead dominates) are computed DTW_BATCH_LANES at a time, with problems of similar size in the same batch
+ * to waste few cells on padding, larger problems one by one with the SIMD kernels
+ */
+void DTW_global_batch(const dtw_batch_problem* problems, const size_t n_problems, float* costs){
+	//about the number of cells of a problem
+	auto cells = [&](size_t k) -> uint64_t {
+		const dtw_batch_problem& p = problems[k];
+		if(p.band_radius < 0){
+			return p.a_length * (uint64_t)p.b_length;
+		}
+		return (p.a_length + (uint64_t)p.b_length) * (p.band_radius + 1);
+	};
+
+	vector<size_t> order;
+	for(size_t k = 0; k < n_problems; k++){
+		const dtw_batch_problem& p = problems[k];
+		assert(p.a_length > 0 && p.b_length > 0);
+		if(cells(k) <= DTW_BATCH_MAX_CELLS){
+			order.push_back(k);
+		}
+		else if(p.band_radius < 0){
+			costs[k] = DTW_global_simd(p.a_values, p.a_length, p.b_values, p.b_length, p.exclude_last_element);
+		}
+		else{
+			costs[k] = DTW_global_slantedbanded_antidiagonalwise_simd(p.a_values, p.a_length, p.b_values, p.b_length, p.band_radius, p.exclude_last_element);
+		}
+	}
+	std::sort(order.begin(), order.end(), [&](size_t k1, size_t k2){return cells(k1) > cells(k2);});
+
+	const dtw_batch_problem* batch[DTW_BATCH_LANES];
+	float* batch_costs[DTW_BATCH_LANES];
+	for(size_t first = 0; first < order.size(); first += DTW_BATCH_LANES){
+		int n_lanes = (int)min((size_t)DTW_BATCH_LANES, order.size() - first);
+		for(int l = 0; l < n_lanes; l++){
+			batch[l] = &problems[order[first+l]];
+			batch_costs[l] = &costs[order[first+l]];
+		}
+		DTW_batch_lanes(batch, n_lanes, batch_costs);
+	}
+}
+
+/*
+ * the band of DTW_global_slantedbanded_antidiagonalwise (a is the longer sequence) as one interval of columns per row i:
+ * the cells (i, j) for j = row_start[i], ..., row_end[i]
+ * the band moves down and right (first_i and first_i-n_cells+1 are non-decreasing in d), so the anti-diagonals that cross row i are consecutive
+ */
+static void slantedbanded_rows(const uint32_t a_length, const uint32_t b_length, int band_radius, int* row_start, int* row_end){
+	vector<int> first_i;
+	vector<int> n_cells;
+	slantedbanded_antidiagonals(a_length, b_length, band_radius, first_i, n_cells);
+	const int n_antidiagonals = first_i.size();
+	int d_start = 0;
+	int d_end = 0;
+	for(int i = 0; i < (int)a_length; i++){
+		while(first_i[d_start] < i){
+			d_start++;
+		}
+		while(d_end+1 < n_antidiagonals && first_i[d_end+1]-n_cells[d_end+1]+1 <= i){
+			d_end++;
+		}
+		row_start[i] = d_start - i;
+		row_end[i] = d_end - i;
+	}
+}
+
+/*
+ * LB_Kim and LB_Keogh: the first and the last cell are always aligned, and every other row i of the longer sequence x
+ * is aligned to at least one value of the shorter sequence y in the columns of row i (all columns, or those of the band),
+ * so it costs at least the distance of x_i to the envelope [min, max] of these values
+ * the envelopes are sliding window minima and maxima (the columns of the band only move right), O(a_length+b_length)
+ * the sum is computed in a different order than the DTW kernels, so it can exceed the cost by a rounding error
+ */
+float DTW_lower_bound(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, int band_radius, bool exclude_last_element){
+	assert(a_length > 0 && b_length > 0);
+
+	const bool swapped = a_length < b_length;
+	const float* x_values = swapped ? b_values : a_values;
+	const float* y_values = swapped ? a_values : b_values;
+	const uint32_t x_length = swapped ? b_length : a_length;
+	const uint32_t y_length = swapped ? a_length : b_length;
+
+	//only row 0, where the first and the last cell can be the same
+	if(x_length == 1){
+		return exclude_last_element ? 0.0f : DISTANCE(x_values[0], y_values[0]);
+	}
+
+	float res = DISTANCE(x_values[0], y_values[0]);
+	if(!exclude_last_element){
+		res += DISTANCE(x_values[x_length-1], y_values[y_length-1]);
+	}
+	if(x_length == 2){
+		return res;
+	}
+
+	if(band_radius < 0){
+		const float y_min = *min_element(y_values, y_values + y_length);
+		const float y_max = *max_element(y_values, y_values + y_length);
+		for(uint32_t i = 1; i+1 < x_length; i++){
+			res += max(max(y_min - x_values[i], x_values[i] - y_max), 0.0f);
+		}
+		return res;
+	}
+
+	vector<int> row_start(x_length);
+	vector<int> row_end(x_length);
+	slantedbanded_rows(x_length, y_length, band_radius, row_start.data(), row_end.data());
+
+	//monotonic queues of column indices, the front is the minimum (maximum) of the current columns
+	vector<int> min_queue(y_length);
+	vector<int> max_queue(y_length);
+	int min_front = 0, min_back = 0;
+	int max_front = 0, max_back = 0;
+	int next_column = 0;
+	for(uint32_t i = 1; i+1 < x_length; i++){
+		for(; next_column <= row_end[i]; next_column++){
+			while(min_back > min_front && y_values[min_queue[min_back-1]] >= y_values[next_column]){
+				min_back--;
+			}
+			min_queue[min_back++] = next_column;
+			while(max_back > max_front && y_values[max_queue[max_back-1]] <= y_values[next_column]){
+				max_back--;
+			}
+			max_queue[max_back++] = next_column;
+		}
+		while(min_queue[min_front] < row_start[i]){
+			min_front++;
+		}
+		while(max_queue[max_front] < row_start[i]){
+			max_front++;
+		}
+		res += max(max(y_values[min_queue[min_front]] - x_values[i], x_values[i] - y_values[max_queue[max_front]]), 0.0f);
 	}
+	return res;
 }
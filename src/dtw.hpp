@@ -2,6 +2,7 @@
 
 #include <cstdint>
 #include <vector>
+#include <limits>
 
 struct position_pair{
     size_t i; //position in the reference
@@ -18,12 +19,51 @@ struct dtw_result {
     std::vector<alignment_element> alignment;
 };
 
-float DTW_global(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element = false);
+//the kernels with a cutoff may stop early once the cost is known to be larger than cutoff, and then return a lower bound of the cost that is larger than cutoff
+#define DTW_NO_CUTOFF std::numeric_limits<float>::infinity()
+
+float DTW_global(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element = false, float cutoff = DTW_NO_CUTOFF);
 float DTW_global_slow(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element = false);
 float DTW_global_diagonalbanded(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, int band_radius, bool exclude_last_element = false);
 float DTW_global_slantedbanded(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, int band_radius, bool exclude_last_element = false);
-float DTW_global_slantedbanded_antidiagonalwise(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, int band_radius, bool exclude_last_element = false);
+float DTW_global_slantedbanded_antidiagonalwise(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, int band_radius, bool exclude_last_element = false, float cutoff = DTW_NO_CUTOFF);
 float DTW_semiglobal(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element = false);
 float DTW_semiglobal_slow(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element = false);
 dtw_result DTW_global_tb(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element = false);
 dtw_result DTW_semiglobal_tb(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element = false);
+dtw_result DTW_global_slantedbanded_tb(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, int band_radius, bool exclude_last_element = false);
+dtw_result DTW_semiglobal_slantedbanded_tb(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, int band_radius, bool exclude_last_element = false);
+
+//one of several independent DTW problems that are aligned at once by DTW_global_batch
+struct dtw_batch_problem {
+    const float* a_values;
+    uint32_t a_length;
+    const float* b_values;
+    uint32_t b_length;
+    int band_radius; //band of DTW_global_slantedbanded_antidiagonalwise, or -1 for the full matrix (DTW_global)
+    bool exclude_last_element;
+};
+
+void DTW_global_batch(const dtw_batch_problem* problems, const size_t n_problems, float* costs);
+
+//lower bound of the cost of DTW_global (band_radius < 0) or DTW_global_slantedbanded_antidiagonalwise (band_radius >= 0) in O(a_length+b_length)
+float DTW_lower_bound(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, int band_radius, bool exclude_last_element = false);
+
+//SIMD versions of DTW_global, DTW_semiglobal and DTW_global_slantedbanded_antidiagonalwise (dtw_simd.cpp)
+//with identical results, for the widest instruction set that the CPU supports
+enum dtw_isa {DTW_ISA_SCALAR, DTW_ISA_SSE42, DTW_ISA_AVX2, DTW_ISA_AVX512};
+
+struct dtw_kernels {
+    const char* name;
+    float (*global)(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element, float cutoff);
+    float (*semiglobal)(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element);
+    float (*global_slantedbanded_antidiagonalwise)(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, int band_radius, bool exclude_last_element, float cutoff);
+};
+
+bool dtw_isa_supported(dtw_isa isa);
+dtw_isa dtw_best_isa();
+const dtw_kernels& dtw_get_kernels(dtw_isa isa);
+const dtw_kernels& dtw_selected_kernels();
+float DTW_global_simd(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element = false, float cutoff = DTW_NO_CUTOFF);
+float DTW_semiglobal_simd(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element = false);
+float DTW_global_slantedbanded_antidiagonalwise_simd(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, int band_radius, bool exclude_last_element = false, float cutoff = DTW_NO_CUTOFF);
@@ -0,0 +1,151 @@
+#include <vector>
+#include <algorithm>
+#include <assert.h>
+#include <cmath>
+#include <limits>
+#include "dtw.hpp"
+
+/*
+ * SIMD versions of DTW_global, DTW_semiglobal and DTW_global_slantedbanded_antidiagonalwise
+ * the kernels of dtw_simd_kernels.hpp are compiled once per instruction set (SSE4.2, AVX2, AVX-512) with target attributes,
+ * so that a binary built without -march=native still uses the widest instruction set of the CPU it runs on
+ * the instruction set is selected once at startup from cpuid, the scalar kernels of dtw.cpp are the fallback
+ */
+
+#define DISTANCE(A, B) std::abs((A)-(B))
+#define DTW_CUTOFF_CHECK_INTERVAL 16
+
+#if defined(__x86_64__) || defined(__i386__)
+#define DTW_SIMD_X86
+#include <immintrin.h>
+#endif
+
+#ifdef DTW_SIMD_X86
+namespace dtw_sse42 {
+	#define DTW_SIMD_TARGET __attribute__((target("sse4.2")))
+	struct V {
+		typedef __m128 vec;
+		static const int width = 4;
+		DTW_SIMD_TARGET static inline vec load(const float* p){ return _mm_loadu_ps(p); }
+		DTW_SIMD_TARGET static inline void store(float* p, vec v){ _mm_storeu_ps(p, v); }
+		DTW_SIMD_TARGET static inline vec min(vec a, vec b){ return _mm_min_ps(a, b); }
+		DTW_SIMD_TARGET static inline vec add(vec a, vec b){ return _mm_add_ps(a, b); }
+		DTW_SIMD_TARGET static inline vec distance(vec a, vec b){ return _mm_andnot_ps(_mm_set1_ps(-0.0f), _mm_sub_ps(a, b)); }
+		//the last n < width cells
+		DTW_SIMD_TARGET static inline void cells_tail(float* dst, const float* top, const float* left, const float* topleft, const float* x, const float* y, int n){
+			for(int k = 0; k < n; k++){
+				dst[k] = std::min(std::min(top[k], left[k]), topleft[k]) + DISTANCE(x[k], y[k]);
+			}
+		}
+	};
+	#include "dtw_simd_kernels.hpp"
+	#undef DTW_SIMD_TARGET
+}
+
+namespace dtw_avx2 {
+	#define DTW_SIMD_TARGET __attribute__((target("avx2")))
+	struct V {
+		typedef __m256 vec;
+		static const int width = 8;
+		DTW_SIMD_TARGET static inline vec load(const float* p){ return _mm256_loadu_ps(p); }
+		DTW_SIMD_TARGET static inline void store(float* p, vec v){ _mm256_storeu_ps(p, v); }
+		DTW_SIMD_TARGET static inline vec min(vec a, vec b){ return _mm256_min_ps(a, b); }
+		DTW_SIMD_TARGET static inline vec add(vec a, vec b){ return _mm256_add_ps(a, b); }
+		DTW_SIMD_TARGET static inline vec distance(vec a, vec b){ return _mm256_andnot_ps(_mm256_set1_ps(-0.0f), _mm256_sub_ps(a, b)); }
+		//the last n < width cells with masked loads and stores
+		DTW_SIMD_TARGET static inline void cells_tail(float* dst, const float* top, const float* left, const float* topleft, const float* x, const float* y, int n){
+			__m256i mask = _mm256_cmpgt_epi32(_mm256_set1_epi32(n), _mm256_setr_epi32(0, 1, 2, 3, 4, 5, 6, 7));
+			vec best = min(min(_mm256_maskload_ps(top, mask), _mm256_maskload_ps(left, mask)), _mm256_maskload_ps(topleft, mask));
+			_mm256_maskstore_ps(dst, mask, add(best, distance(_mm256_maskload_ps(x, mask), _mm256_maskload_ps(y, mask))));
+		}
+	};
+	#include "dtw_simd_kernels.hpp"
+	#undef DTW_SIMD_TARGET
+}
+
+//the AVX-512 headers of gcc 12 trigger false -Wmaybe-uninitialized warnings (_mm512_undefined_ps)
+#pragma GCC diagnostic push
+#pragma GCC diagnostic ignored "-Wmaybe-uninitialized"
+namespace dtw_avx512 {
+	#define DTW_SIMD_TARGET __attribute__((target("avx512f")))
+	struct V {
+		typedef __m512 vec;
+		static const int width = 16;
+		DTW_SIMD_TARGET static inline vec load(const float* p){ return _mm512_loadu_ps(p); }
+		DTW_SIMD_TARGET static inline void store(float* p, vec v){ _mm512_storeu_ps(p, v); }
+		DTW_SIMD_TARGET static inline vec min(vec a, vec b){ return _mm512_min_ps(a, b); }
+		DTW_SIMD_TARGET static inline vec add(vec a, vec b){ return _mm512_add_ps(a, b); }
+		DTW_SIMD_TARGET static inline vec distance(vec a, vec b){ return _mm512_abs_ps(_mm512_sub_ps(a, b)); }
+		//the last n < width cells with masked loads and stores
+		DTW_SIMD_TARGET static inline void cells_tail(float* dst, const float* top, const float* left, const float* topleft, const float* x, const float* y, int n){
+			__mmask16 mask = (__mmask16)((1u << n) - 1);
+			vec best = min(min(_mm512_maskz_loadu_ps(mask, top), _mm512_maskz_loadu_ps(mask, left)), _mm512_maskz_loadu_ps(mask, topleft));
+			_mm512_mask_storeu_ps(dst, mask, add(best, distance(_mm512_maskz_loadu_ps(mask, x), _mm512_maskz_loadu_ps(mask, y))));
+		}
+	};
+	#include "dtw_simd_kernels.hpp"
+	#undef DTW_SIMD_TARGET
+}
+#pragma GCC diagnostic pop
+#endif
+
+static const dtw_kernels kernels[] = {
+	{"scalar", DTW_global, DTW_semiglobal, DTW_global_slantedbanded_antidiagonalwise},
+#ifdef DTW_SIMD_X86
+	{"sse4.2", dtw_sse42::global, dtw_sse42::semiglobal, dtw_sse42::global_slantedbanded_antidiagonalwise},
+	{"avx2", dtw_avx2::global, dtw_avx2::semiglobal, dtw_avx2::global_slantedbanded_antidiagonalwise},
+	{"avx512", dtw_avx512::global, dtw_avx512::semiglobal, dtw_avx512::global_slantedbanded_antidiagonalwise},
+#else
+	{"sse4.2", DTW_global, DTW_semiglobal, DTW_global_slantedbanded_antidiagonalwise},
+	{"avx2", DTW_global, DTW_semiglobal, DTW_global_slantedbanded_antidiagonalwise},
+	{"avx512", DTW_global, DTW_semiglobal, DTW_global_slantedbanded_antidiagonalwise},
+#endif
+};
+
+bool dtw_isa_supported(dtw_isa isa){
+#ifdef DTW_SIMD_X86
+	//__builtin_cpu_supports reads the feature bits of cpuid (and checks that the OS saves the vector registers)
+	__builtin_cpu_init();
+	switch(isa){
+		case DTW_ISA_SCALAR: return true;
+		case DTW_ISA_SSE42: return __builtin_cpu_supports("sse4.2");
+		case DTW_ISA_AVX2: return __builtin_cpu_supports("avx2");
+		case DTW_ISA_AVX512: return __builtin_cpu_supports("avx512f");
+	}
+	return false;
+#else
+	return isa == DTW_ISA_SCALAR;
+#endif
+}
+
+dtw_isa dtw_best_isa(){
+	for(int isa = DTW_ISA_AVX512; isa > DTW_ISA_SCALAR; isa--){
+		if(dtw_isa_supported((dtw_isa)isa)){
+			return (dtw_isa)isa;
+		}
+	}
+	return DTW_ISA_SCALAR;
+}
+
+const dtw_kernels& dtw_get_kernels(dtw_isa isa){
+	return kernels[isa];
+}
+
+//selected once at startup (static initialization), before any thread aligns
+static const dtw_kernels& selected_kernels = dtw_get_kernels(dtw_best_isa());
+
+const dtw_kernels& dtw_selected_kernels(){
+	return selected_kernels;
+}
+
+float DTW_global_simd(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element, float cutoff){
+	return selected_kernels.global(a_values, a_length, b_values, b_length, exclude_last_element, cutoff);
+}
+
+float DTW_semiglobal_simd(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element){
+	return selected_kernels.semiglobal(a_values, a_length, b_values, b_length, exclude_last_element);
+}
+
+float DTW_global_slantedbanded_antidiagonalwise_simd(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, int band_radius, bool exclude_last_element, float cutoff){
+	return selected_kernels.global_slantedbanded_antidiagonalwise(a_values, a_length, b_values, b_length, band_radius, exclude_last_element, cutoff);
+}
@@ -0,0 +1,297 @@
+//DTW kernels that compute the independent cells of an anti-diagonal with SIMD vectors
+//this file is included once per instruction set by dtw_simd.cpp (no include guard), inside a namespace that defines
+//V (the vector type and its operations) and DTW_SIMD_TARGET (the target attribute of the instruction set)
+//every cell is computed with the same operations as in the scalar kernels of dtw.cpp, so the results are identical
+
+//dst[k] = min(top[k], left[k], topleft[k]) + DISTANCE(x[k], y[k])
+DTW_SIMD_TARGET static inline void compute_cells(float* __restrict__ dst, const float* top, const float* left, const float* topleft,
+												 const float* x, const float* y, int n){
+	int k = 0;
+	for(; k + V::width <= n; k += V::width){
+		typename V::vec best = V::min(V::min(V::load(top+k), V::load(left+k)), V::load(topleft+k));
+		V::store(dst+k, V::add(best, V::distance(V::load(x+k), V::load(y+k))));
+	}
+	if(k < n){
+		V::cells_tail(dst+k, top+k, left+k, topleft+k, x+k, y+k, n-k);
+	}
+}
+
+//smallest of n values
+DTW_SIMD_TARGET static inline float min_value(const float* values, int n){
+	float res = 1e10;
+	int k = 0;
+	if(n >= V::width){
+		typename V::vec best = V::load(values);
+		for(k = V::width; k + V::width <= n; k += V::width){
+			best = V::min(best, V::load(values+k));
+		}
+		float lanes[V::width];
+		V::store(lanes, best);
+		for(int l = 0; l < V::width; l++){
+			res = std::min(res, lanes[l]);
+		}
+	}
+	for(; k < n; k++){
+		res = std::min(res, values[k]);
+	}
+	return res;
+}
+
+/*
+ * full matrix, one anti-diagonal (cells (i, d-i)) at a time
+ * cell i of an anti-diagonal is stored at index i+1 of its buffer, index 0 and the cells outside the matrix stay at 1e10
+ * b is read in reverse order, so that the cells of an anti-diagonal read both sequences forwards
+ */
+DTW_SIMD_TARGET static float global_antidiagonals(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length,
+												  bool semiglobal, bool exclude_last_element, float cutoff){
+	assert(a_length > 0 && b_length > 0);
+	const int n = a_length;
+	const int m = b_length;
+	std::vector<float> storage(3*(n+1) + m, 1e10);
+	float* dp0 = storage.data();
+	float* dp1 = dp0 + (n+1);
+	float* dp2 = dp1 + (n+1);
+	float* b_reversed = dp2 + (n+1);
+	std::reverse_copy(b_values, b_values + m, b_reversed);
+
+	dp1[1] = DISTANCE(a_values[0], b_values[0]);
+	float best = n == 1 ? dp1[1] : 1e10;
+	for(int d = 1; d < n+m-1; d++){
+		const int lo = std::max(0, d-m+1);
+		const int hi = std::min(n-1, d);
+		compute_cells(dp2+1+lo, dp1+lo, dp1+1+lo, dp0+lo, a_values+lo, b_reversed+(m-1-d+lo), hi-lo+1);
+		if(semiglobal){
+			//a can start anywhere in b
+			if(lo == 0){
+				dp2[1] = DISTANCE(a_values[0], b_values[d]);
+			}
+			if(hi == n-1){
+				best = std::min(best, dp2[n]);
+			}
+		}
+		float *tmp = dp0;
+		dp0 = dp1;
+		dp1 = dp2;
+		dp2 = tmp;
+
+		//as in DTW_global_slantedbanded_antidiagonalwise, the smallest cost of two consecutive anti-diagonals is a lower bound
+		//(not for semiglobal, where an alignment can start in a later anti-diagonal)
+		if(!semiglobal && cutoff < DTW_NO_CUTOFF && d % DTW_CUTOFF_CHECK_INTERVAL == 0){
+			float lower_bound = std::min(min_value(dp0, n+1), min_value(dp1, n+1));
+			if(exclude_last_element){
+				lower_bound -= DISTANCE(a_values[a_length-1], b_values[b_length-1]);
+			}
+			if(lower_bound > cutoff){
+				return lower_bound;
+			}
+		}
+	}
+
+	if(semiglobal){
+		return best;
+	}
+	if(exclude_last_element){
+		return dp1[n] - DISTANCE(a_values[a_length-1], b_values[b_length-1]);
+	}
+	return dp1[n];
+}
+
+DTW_SIMD_TARGET float global(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element, float cutoff){
+	return global_antidiagonals(a_values, a_length, b_values, b_length, false, exclude_last_element, cutoff);
+}
+
+/*
+ * a is aligned fully (globally) to the best matching substring of b (i.e., b is not aligned globally)
+ * as DTW_semiglobal, exclude_last_element is ignored
+ */
+DTW_SIMD_TARGET float semiglobal(const float* a_values, const uint32_t a_length, const float* b_values, const uint32_t b_length, bool exclude_last_element){
+	return global_antidiagonals(a_values, a_length, b_values, b_length, true, exclude_last_element, DTW_NO_CUTOFF);
+}
+
+/*
+ * same band and anti-diagonal layout as DTW_global_slantedbanded_antidiagonalwise
+ * the first and last cells of an anti-diagonal that lack some predecessors are computed as in the scalar kernel,
+ * the cells in between with compute_cells
+ */
+DTW_SIMD_TARGET float global_slantedbanded_antidiagonalwise(const float* a_values, uint32_t a_length, const float* b_values, uint32_t b_length,
+															int band_radius, bool exclude_last_element, float cutoff){
+	assert(a_length > 0 && b_length > 0);
+	assert(a_length < std::numeric_limits<int>::max());
+	assert(b_length < std::numeric_limits<int>::max());
+	assert(band_radius >= 0);
+
+	//make sure a is the longer sequence
+	if(a_length < b_length){
+		std::swap(a_values, b_values);
+		std::swap(a_length, b_length);
+	}
+
+	int extra_band_radius_due_to_slanting =	((a_length-b_length)*band_radius + a_length - 1) / a_length;
+	band_radius += extra_band_radius_due_to_slanting;
+	const int primary_antidiagonal_length = band_radius + (band_radius % 2 == 0 ? 1 : 0);
+	const int secondary_antidiagonal_length = band_radius + (band_radius % 2 == 1 ? 1 : 0);
+	const bool primary_larger = primary_antidiagonal_length > secondary_antidiagonal_length;
+
+	const int dpsize = std::max(primary_antidiagonal_length, secondary_antidiagonal_length);
+	std::vector<float> storage(dpsize*3 + a_length, 1e10);
+	float* dp0 = storage.data();
+	float* dp1 = dp0 + dpsize;
+	float* dp2 = dp0 + dpsize*2;
+	//a in reverse order: a[i] with i = antidiagonal_start_i - antidiagonal_offset is a_reversed[a_length-1-antidiagonal_start_i + antidiagonal_offset]
+	float* a_reversed = dp0 + dpsize*3;
+	std::reverse_copy(a_values, a_values + a_length, a_reversed);
+
+	int center_row = 0;
+	{ //iteration 0
+		int antidiagonal_offset = primary_antidiagonal_length/2;
+		int i = primary_antidiagonal_length/2 - antidiagonal_offset;
+		int j = -primary_antidiagonal_length/2 + antidiagonal_offset;
+		if(j >= 0 && j < (int)b_length && i >= 0 && i < (int)a_length){
+			if(primary_larger)
+				dp2[antidiagonal_offset] = DISTANCE(a_values[i], b_values[j]);
+			else
+				dp2[antidiagonal_offset+1] = DISTANCE(a_values[i], b_values[j]);
+		}
+		float *tmp = dp0;
+		dp0 = dp1;
+		dp1 = dp2;
+		dp2 = tmp;
+	}
+
+	bool previous_increment_center_row = false;
+	for(int iteration = 1; (uint32_t)iteration < a_length; iteration++){
+		int center_column = iteration;
+		int next_row = center_row+1;
+		int64_t next_slope = next_row*(int64_t)a_length;
+		int64_t target_slope = b_length*(int64_t)center_column;
+		bool increment_center_row = false;
+		if(next_slope <= target_slope){
+			center_row++;
+			increment_center_row = true;
+		}
+
+		if(increment_center_row){
+			const int antidiagonal_start_i = center_column + secondary_antidiagonal_length/2 - 1;
+			const int antidiagonal_start_j = center_row - secondary_antidiagonal_length/2;
+			const int offset_start = std::max(std::max(0, antidiagonal_start_i-(int)a_length+1), -antidiagonal_start_j);
+			const int offset_end = std::min(std::min(secondary_antidiagonal_length, (int)antidiagonal_start_i+1), (int)b_length-antidiagonal_start_j);
+			const int x_start = a_length-1-antidiagonal_start_i;
+			const int y_start = antidiagonal_start_j;
+			int start = offset_start;
+			int end = offset_end;
+			if(!primary_larger){
+				//the first cell has no top (and no topleft if dp0 is a primary anti-diagonal), the last cell has no left
+				auto cell = [&](int o){
+					float top = o==0?1e10:dp1[o];
+					float topleft = o==0 && !previous_increment_center_row ? 1e10 : dp0[o];
+					float left = o==secondary_antidiagonal_length-1?1e10:dp1[o+1];
+					dp2[o] = std::min(std::min(top, left), topleft) + DISTANCE(a_reversed[x_start+o], b_values[y_start+o]);
+				};
+				if(start < end && start == 0){
+					cell(start++);
+				}
+				if(start < end && end == secondary_antidiagonal_length){
+					cell(--end);
+				}
+			}
+			if(start < end){
+				compute_cells(dp2+start, dp1+start, dp1+start+1, dp0+start, a_reversed+x_start+start, b_values+y_start+start, end-start);
+			}
+
+			float *tmp = dp0;
+			dp0 = dp1;
+			dp1 = dp2;
+			dp2 = tmp;
+		}
+
+		const int antidiagonal_start_i = center_column + primary_antidiagonal_length/2;
+		const int antidiagonal_start_j = center_row - primary_antidiagonal_length/2;
+		const int offset_start = std::max(std::max(0, antidiagonal_start_i-(int)a_length+1), -antidiagonal_start_j);
+		const int offset_end = std::min(std::min(primary_antidiagonal_length, (int)antidiagonal_start_i+1), (int)b_length-antidiagonal_start_j);
+		const int x_start = a_length-1-antidiagonal_start_i;
+		const int y_start = antidiagonal_start_j;
+		int start = offset_start;
+		int end = offset_end;
+
+		if(primary_larger){
+			if(increment_center_row){
+				//the first cell has no top, the last cell has no left
+				auto cell = [&](int o){
+					float top = o==0?1e10:dp1[o-1];
+					float topleft = dp0[o];
+					float left = o==primary_antidiagonal_length-1?1e10:dp1[o];
+					dp2[o] = std::min(std::min(top, left), topleft) + DISTANCE(a_reversed[x_start+o], b_values[y_start+o]);
+				};
+				if(start < end && start == 0){
+					cell(start++);
+				}
+				if(start < end && end == primary_antidiagonal_length){
+					cell(--end);
+				}
+				if(start < end){
+					compute_cells(dp2+start, dp1+start-1, dp1+start, dp0+start, a_reversed+x_start+start, b_values+y_start+start, end-start);
+				}
+			}
+			else{
+				//the first cell has neither a top nor a topleft
+				if(start < end && start == 0){
+					dp2[0] = std::min(std::min((float)1e10, dp1[0]), (float)1e10) + DISTANCE(a_reversed[x_start], b_values[y_start]);
+					start++;
+				}
+				if(start < end){
+					compute_cells(dp2+start, dp1+start-1, dp1+start, dp0+start-1, a_reversed+x_start+start, b_values+y_start+start, end-start);
+				}
+			}
+		}
+		else{
+			//accesses to a primary anti-diagonal start at index 1 (see DTW_global_slantedbanded_antidiagonalwise)
+			if(increment_center_row){
+				if(start < end){
+					compute_cells(dp2+1+start, dp1+start, dp1+1+start, dp0+1+start, a_reversed+x_start+start, b_values+y_start+start, end-start);
+				}
+			}
+			else{
+				//the first cell has no top (and no topleft if the previous iteration did not go down)
+				if(start < end && start == 0){
+					float topleft = previous_increment_center_row ? dp0[0] : 1e10;
+					dp2[1] = std::min(std::min((float)1e10, dp1[1]), topleft) + DISTANCE(a_reversed[x_start], b_values[y_start]);
+					start++;
+				}
+				if(start < end){
+					compute_cells(dp2+1+start, dp1+start, dp1+1+start, dp0+start, a_reversed+x_start+start, b_values+y_start+start, end-start);
+				}
+			}
+		}
+
+		float *tmp = dp0;
+		dp0 = dp1;
+		dp1 = dp2;
+		dp2 = tmp;
+		previous_increment_center_row = increment_center_row;
+
+		if(cutoff < DTW_NO_CUTOFF && iteration % DTW_CUTOFF_CHECK_INTERVAL == 0){
+			float lower_bound = std::min(min_value(dp0, dpsize), min_value(dp1, dpsize));
+			if(exclude_last_element){
+				lower_bound -= DISTANCE(a_values[a_length-1], b_values[b_length-1]);
+			}
+			if(lower_bound > cutoff){
+				return lower_bound;
+			}
+		}
+	}
+
+	float res;
+	if(primary_larger){
+		res = dp1[primary_antidiagonal_length/2];
+	}
+	else{
+		res = dp1[primary_antidiagonal_length/2+1];
+	}
+
+	if(exclude_last_element){
+		return res - DISTANCE(a_values[a_length-1], b_values[b_length-1]);
+	}
+	else{
+		return res;
+	}
+}
@@ -58,6 +58,7 @@ static ko_longopt_t long_options[] = {
 	{ (char*)"dtw-min-score", 			ko_required_argument, 	331 },
 	{ (char*)"log-anchors",				ko_no_argument,			332 },
 	{ (char*)"log-num-anchors",			ko_no_argument,			333 },
+	{ (char*)"dtw-batch-chains",		ko_no_argument,			334 },
 	{ 0, 0, 0 }
 };
 
@@ -249,6 +250,7 @@ int main(int argc, char *argv[])
 		else if (c == 331) opt.dtw_min_score = atof(o.arg); // --dtw-min-score
 		else if (c == 332) opt.flag |= RI_M_LOG_ANCHORS; // --log-anchors
 		else if (c == 333) opt.flag |= RI_M_LOG_NUM_ANCHORS; // --log-num-anchors
+		else if (c == 334) opt.flag |= RI_M_DTW_BATCH_CHAINS; // --dtw-batch-chains
 		else if (c == 'V') {puts(RI_VERSION); return 0;}
 	}
 
@@ -285,6 +287,7 @@ int main(int argc, char *argv[])
 		fprintf(fp_help, "    --dtw-border-constraint STR     DTW border constraint: 'global', 'sparse' (i.e., align only between anchors), 'local' [%s]\n", ri_maptopt_dtw_mode_to_string(opt.dtw_border_constraint));
 		fprintf(fp_help, "    --dtw-log-scores     log DTW scores [%s]\n", opt.flag & RI_M_DTW_LOG_SCORES? "yes" : "no");
 		fprintf(fp_help, "    --dtw-match-bonus FLOAT     DTW match bonus FLOAT [%g]\n", opt.dtw_match_bonus);
+		fprintf(fp_help, "    --dtw-batch-chains     compute the sparse DTW of all candidate chains in one batch (experimental, skips the early termination between chains) [%s]\n", opt.flag & RI_M_DTW_BATCH_CHAINS? "yes" : "no");
 		fprintf(fp_help, "    --output-chains	 output chain anchors [%s]\n", opt.flag & RI_M_OUTPUT_CHAINS? "yes" : "no");
 		fprintf(fp_help, "    --log-anchors	 log chain anchors [%s]\n", opt.flag & RI_M_LOG_ANCHORS? "yes" : "no");
 		fprintf(fp_help, "    --log-num-anchors	 log number of chain anchors [%s]\n", opt.flag & RI_M_LOG_NUM_ANCHORS? "yes" : "no");
@@ -178,6 +178,13 @@ bool compare(const std::pair<float, size_t> &left, const std::pair<float, size_t
 	else return false;
 }
 
+//the largest DTW cost with which num_read_events aligned read events still reach min_score
+//(with a margin for rounding, so that only chains that cannot reach min_score are rejected by the lower bounds and cutoffs)
+float max_dtw_cost(const uint32_t num_read_events, const float min_score, const ri_mapopt_t *opt){
+	float max_cost = num_read_events*opt->dtw_match_bonus - min_score;
+	return max_cost + 1e-3f*std::abs(max_cost) + 1e-3f;
+}
+
 void align_chain(ri_chain_t &chain, const ri_idx_t *ri, const float* read_events, const uint32_t n_read_events, const uint32_t chunk_start, const ri_mapopt_t *opt, bool cigar=false, float min_score=-1e10){
 	float *ref_events;
 	if(chain.strand == 1){
@@ -187,6 +194,10 @@ void align_chain(ri_chain_t &chain, const ri_idx_t *ri, const float* read_events
 		ref_events = ri->reverse_signals[chain.reference_sequence_index];
 	}
 
+	//chains below dtw_min_score are discarded after the alignment, so their DTW can be abandoned as soon as
+	//a lower bound of the cost shows that they cannot reach it (not when all scores are needed, e.g., for logging only)
+	const bool prune = (opt->flag & RI_M_DTW_EVALUATE_CHAINS) && !cigar;
+
 	float dtw_cost = 0.0f;
 	uint32_t num_aligned_read_events = 0;
 	if(opt->dtw_border_constraint == RI_M_DTW_BORDER_CONSTRAINT_GLOBAL){
@@ -207,12 +218,27 @@ void align_chain(ri_chain_t &chain, const ri_idx_t *ri, const float* read_events
 				chain.alignment_score = -1e10;
 				return;
 			}
+			int band_radius = -1;
+			if(opt->dtw_fill_method != RI_M_DTW_FILL_METHOD_FULL){
+				band_radius = std::max(1, (int)(read_region_size*opt->dtw_band_radius_frac));
+			}
+			float cutoff = DTW_NO_CUTOFF;
+			if(prune){
+				cutoff = max_dtw_cost(read_region_size, opt->dtw_min_score, opt);
+				if(DTW_lower_bound(read_region, read_region_size, ref_region, ref_region_size, band_radius) > cutoff){
+					chain.alignment_score = -1e10;
+					return;
+				}
+			}
 			if(opt->dtw_fill_method == RI_M_DTW_FILL_METHOD_FULL){
-				dtw_cost = DTW_global(read_region, read_region_size, ref_region, ref_region_size);
+				dtw_cost = DTW_global_simd(read_region, read_region_size, ref_region, ref_region_size, false, cutoff);
 			}
 			else{
-				int band_radius = std::max(1, (int)(read_region_size*opt->dtw_band_radius_frac));
-				dtw_cost = DTW_global_slantedbanded_antidiagonalwise(read_region, read_region_size, ref_region, ref_region_size, band_radius);
+				dtw_cost = DTW_global_slantedbanded_antidiagonalwise_simd(read_region, read_region_size, ref_region, ref_region_size, band_radius, false, cutoff);
+			}
+			if(dtw_cost > cutoff){
+				chain.alignment_score = -1e10;
+				return;
 			}
 		}
 		else{
@@ -221,15 +247,16 @@ void align_chain(ri_chain_t &chain, const ri_idx_t *ri, const float* read_events
 				res = DTW_global_tb(read_region, read_region_size, ref_region, ref_region_size);
 			}
 			else{
-				assert(false); //not implemented
+				int band_radius = std::max(1, (int)(read_region_size*opt->dtw_band_radius_frac));
+				res = DTW_global_slantedbanded_tb(read_region, read_region_size, ref_region, ref_region_size, band_radius);
 			}
 			dtw_cost = res.cost;
 			new(&chain.dtw_result) dtw_result; //ensure that c++ objects (currently, a vector) inside chain are properly initialized
 												//this might cause a memory leak if we overwrite the dtw_result multiple times like this
 												//not sure if there's a nice fix
 			for(size_t i=0; i<res.alignment.size(); i++){
-				res.alignment.back().position.i += start_anchor.query_position;
-				res.alignment.back().position.j += start_anchor.target_position;
+				res.alignment[i].position.i += start_anchor.query_position;
+				res.alignment[i].position.j += start_anchor.target_position;
 			}
 			chain.dtw_result = res;
 		}
@@ -244,6 +271,8 @@ void align_chain(ri_chain_t &chain, const ri_idx_t *ri, const float* read_events
 		const ri_anchor_t &chain_end_anchor = chain.anchors[0];
 		uint32_t chain_read_region_size = chain_end_anchor.query_position - chain_start_anchor.query_position + 1;
 		float current_max_attainable_score = chain_read_region_size*opt->dtw_match_bonus; //max score if the remaining part of the read were matching perfectly
+		//the DTW cost that the alignment parts can reach in total without falling below dtw_min_score
+		float max_cost = prune ? max_dtw_cost(chain_read_region_size + alignment_parts - 1, opt->dtw_min_score, opt) : DTW_NO_CUTOFF;
 
 		for(size_t alignment_part=0; alignment_part<alignment_parts; alignment_part++){
 			//TODO: some of these could be merged when they are very short, for performance
@@ -270,18 +299,29 @@ void align_chain(ri_chain_t &chain, const ri_idx_t *ri, const float* read_events
 				bool exclude_last_element = (alignment_part != alignment_parts-1);
 				float sub_dtw_cost;
 				if(opt->dtw_fill_method == RI_M_DTW_FILL_METHOD_FULL){
-					sub_dtw_cost = DTW_global(read_region, read_region_size, ref_region, ref_region_size, exclude_last_element);
+					sub_dtw_cost = DTW_global_simd(read_region, read_region_size, ref_region, ref_region_size, exclude_last_element, max_cost - dtw_cost);
 				}
 				else{
 					int band_radius = std::max(1, (int)(read_region_size*opt->dtw_band_radius_frac));
-					sub_dtw_cost = DTW_global_slantedbanded_antidiagonalwise(read_region, read_region_size, ref_region, ref_region_size, band_radius, exclude_last_element);
+					sub_dtw_cost = DTW_global_slantedbanded_antidiagonalwise_simd(read_region, read_region_size, ref_region, ref_region_size, band_radius, exclude_last_element, max_cost - dtw_cost);
 				}
 				dtw_cost += sub_dtw_cost;
 				current_max_attainable_score -= sub_dtw_cost;
+				if(dtw_cost > max_cost){
+					chain.alignment_score = -1e10;
+					return;
+				}
 			}
 			else{
 				bool exclude_last_element = (alignment_part != alignment_parts-1);
-				dtw_result sub_res = DTW_global_tb(read_region, read_region_size, ref_region, ref_region_size);
+				dtw_result sub_res;
+				if(opt->dtw_fill_method == RI_M_DTW_FILL_METHOD_FULL){
+					sub_res = DTW_global_tb(read_region, read_region_size, ref_region, ref_region_size, exclude_last_element);
+				}
+				else{
+					int band_radius = std::max(1, (int)(read_region_size*opt->dtw_band_radius_frac));
+					sub_res = DTW_global_slantedbanded_tb(read_region, read_region_size, ref_region, ref_region_size, band_radius, exclude_last_element);
+				}
 				for(size_t i=0; i<sub_res.alignment.size(); i++){
 					alignment.push_back(sub_res.alignment[i]);
 					alignment.back().position.i += start_anchor.query_position;
@@ -312,6 +352,66 @@ void align_chain(ri_chain_t &chain, const ri_idx_t *ri, const float* read_events
 	}
 }
 
+//the DTW problems of the alignment parts of a chain with the sparse border constraint, in the order of align_chain
+void add_sparse_dtw_problems(const ri_chain_t &chain, const ri_idx_t *ri, const float* read_events, const ri_mapopt_t *opt, std::vector<dtw_batch_problem> &problems){
+	float *ref_events;
+	if(chain.strand == 1){
+		ref_events = ri->forward_signals[chain.reference_sequence_index];
+	}
+	else{
+		ref_events = ri->reverse_signals[chain.reference_sequence_index];
+	}
+
+	uint32_t alignment_parts = chain.n_anchors-1;
+	for(size_t alignment_part=0; alignment_part<alignment_parts; alignment_part++){
+		const ri_anchor_t &start_anchor = chain.anchors[alignment_parts-alignment_part];
+		const ri_anchor_t &end_anchor = chain.anchors[alignment_parts-alignment_part-1];
+
+		const float *ref_region = ref_events + start_anchor.target_position;
+		uint32_t ref_region_size = end_anchor.target_position - start_anchor.target_position + 1;
+
+		const float *read_region = read_events + start_anchor.query_position;
+		uint32_t read_region_size = end_anchor.query_position - start_anchor.query_position + 1;
+
+		int band_radius = -1;
+		if(opt->dtw_fill_method != RI_M_DTW_FILL_METHOD_FULL){
+			band_radius = std::max(1, (int)(read_region_size*opt->dtw_band_radius_frac));
+		}
+		bool exclude_last_element = (alignment_part != alignment_parts-1);
+		problems.push_back(dtw_batch_problem{read_region, read_region_size, ref_region, ref_region_size, band_radius, exclude_last_element});
+	}
+}
+
+//align_chain without traceback for the sparse border constraint, given the DTW costs of the alignment parts (add_sparse_dtw_problems)
+//the early termination of align_chain is applied to the given costs, so that the alignment score is identical
+void align_chain_from_costs(ri_chain_t &chain, const dtw_batch_problem* problems, const float* costs, const ri_mapopt_t *opt, float min_score){
+	uint32_t alignment_parts = chain.n_anchors-1;
+	const ri_anchor_t &chain_start_anchor = chain.anchors[chain.n_anchors-1];
+	const ri_anchor_t &chain_end_anchor = chain.anchors[0];
+	uint32_t chain_read_region_size = chain_end_anchor.query_position - chain_start_anchor.query_position + 1;
+	float current_max_attainable_score = chain_read_region_size*opt->dtw_match_bonus;
+
+	float dtw_cost = 0.0f;
+	uint32_t num_aligned_read_events = 0;
+	for(size_t alignment_part=0; alignment_part<alignment_parts; alignment_part++){
+		if(current_max_attainable_score < min_score){
+			chain.alignment_score = -1e10;
+			return;
+		}
+		dtw_cost += costs[alignment_part];
+		current_max_attainable_score -= costs[alignment_part];
+		num_aligned_read_events += problems[alignment_part].a_length;
+	}
+
+	chain.alignment_score = num_aligned_read_events*opt->dtw_match_bonus - dtw_cost;
+
+	if(opt->flag & RI_M_DTW_LOG_SCORES){
+		char str[256];
+		sprintf(str, "chaining_score=%f alignment_score=%f\n", chain.chaining_score, chain.alignment_score);
+		fprintf(stderr, str);
+	}
+}
+
 void gen_chains(void *km, const pipeline_mt *p, const ri_idx_t *ri, const float* chunk_events, const uint32_t l_chunk_events, const uint32_t chunk_start, const size_t n_seq, ri_reg1_t* reg, const ri_mapopt_t *opt){
 
 	// Chaining parameters
@@ -511,10 +611,50 @@ void gen_chains(void *km, const pipeline_mt *p, const ri_idx_t *ri, const float*
 		//maybe a different sorting method yields better performance (e.g., according to length, number of anchors, or a combination thereof)
 		std::sort(chains.begin(), chains.end(), [](ri_chain_t &a, ri_chain_t &b){return a.chaining_score > b.chaining_score;});
 		
+		//with --dtw-batch-chains and the sparse border constraint, the many small DTW problems of the alignment parts of all chains
+		//are computed at once (amortizing the per-alignment overhead), otherwise chains are aligned one by one
+		//the batch computes every part of every chain before the early termination on best_found_alignment is applied,
+		//so it only pays off when few chains would be terminated early; it stays opt-in until end-to-end runs show a win
+		const bool batched = (opt->flag & RI_M_DTW_BATCH_CHAINS) && opt->dtw_border_constraint == RI_M_DTW_BORDER_CONSTRAINT_SPARSE;
+		std::vector<dtw_batch_problem> problems;
+		std::vector<size_t> chain_problems_start;
+		std::vector<bool> chain_pruned(chains.size(), false);
+		if(batched){
+			for(size_t ci = 0; ci < chains.size(); ci++){
+				chain_problems_start.push_back(problems.size());
+				add_sparse_dtw_problems(chains[ci], ri, p->events[reg->read_id].values, opt, problems);
+				//chains whose lower bound already falls below dtw_min_score are not aligned (as the cutoffs of align_chain)
+				if(opt->flag & RI_M_DTW_EVALUATE_CHAINS){
+					uint32_t num_read_events = 0;
+					float lower_bound = 0.0f;
+					for(size_t k = chain_problems_start[ci]; k < problems.size(); k++){
+						const dtw_batch_problem &problem = problems[k];
+						num_read_events += problem.a_length;
+						lower_bound += DTW_lower_bound(problem.a_values, problem.a_length, problem.b_values, problem.b_length, problem.band_radius, problem.exclude_last_element);
+					}
+					if(lower_bound > max_dtw_cost(num_read_events, opt->dtw_min_score, opt)){
+						problems.resize(chain_problems_start[ci]);
+						chain_pruned[ci] = true;
+					}
+				}
+			}
+		}
+		std::vector<float> costs(problems.size());
+		DTW_global_batch(problems.data(), problems.size(), costs.data());
+
 		std::vector<ri_chain_t> post_alignment_chains;
 		float best_found_alignment = 0.0f; //this could be slightly more agressive and be set to opt->dtw_min_score immediately, but starting with 0 if clearer
-		for(ri_chain_t &chain: chains){
-			align_chain(chain, ri, p->events[reg->read_id].values, chunk_start + l_chunk_events, chunk_start, opt, false, best_found_alignment);
+		for(size_t ci = 0; ci < chains.size(); ci++){
+			ri_chain_t &chain = chains[ci];
+			if(chain_pruned[ci]){
+				chain.alignment_score = -1e10;
+			}
+			else if(batched){
+				align_chain_from_costs(chain, problems.data() + chain_problems_start[ci], costs.data() + chain_problems_start[ci], opt, best_found_alignment);
+			}
+			else{
+				align_chain(chain, ri, p->events[reg->read_id].values, chunk_start + l_chunk_events, chunk_start, opt, false, best_found_alignment);
+			}
 			if(chain.alignment_score >= opt->dtw_min_score){
 				if(chain.alignment_score > best_found_alignment){
 					best_found_alignment = chain.alignment_score;
@@ -17,6 +17,7 @@
 #define RI_M_OUTPUT_CHAINS			0x20
 #define RI_M_LOG_ANCHORS			0x40
 #define RI_M_LOG_NUM_ANCHORS		0x80
+#define RI_M_DTW_BATCH_CHAINS		0x100
 
 #define RI_M_DTW_BORDER_CONSTRAINT_GLOBAL	0
 #define RI_M_DTW_BORDER_CONSTRAINT_SPARSE	1
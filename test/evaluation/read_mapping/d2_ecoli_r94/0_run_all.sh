@@ -18,6 +18,22 @@ bash run_rawalign_banded_sparse.sh $THREADS
 bash run_rawalign_banded_sparse_nominanchor.sh $THREADS
 bash run_rawalign_banded_sparse_nominanchor_anchorchainalignment.sh $THREADS
 
+#the sweeps run their configurations concurrently, each with $SWEEP_THREADS of the $THREADS cores,
+#finished configurations are recorded in outdir, so rerunning an interrupted sweep only runs the remaining ones
+SWEEP_THREADS=$THREADS
+if [ ! -z "$2" ]; then
+    SWEEP_THREADS=$2
+fi
+SWEEP="python ../../../scripts/sweep_rawalign.py \
+    --outdir ./outdir/ \
+    --prefix d2_ecoli_r94 \
+    --signals ../../../data/d2_ecoli_r94/fast5_files/ \
+    --ref ../../../data/d2_ecoli_r94/ref.fa \
+    --pore ../../../../extern/kmer_models/r9.4_180mv_450bps_6mer/template_median68pA.model \
+    --preset sensitive \
+    --cores $THREADS \
+    --threads-per-job $SWEEP_THREADS"
+
 #list of band-radius-fractions to test
 BAND_RADIUS_FRACTIONS=""
 BAND_RADIUS_FRACTIONS=$BAND_RADIUS_FRACTIONS" 0.00 0.01 0.02 0.03 0.04 0.05 0.06 0.07 0.08 0.09"
@@ -25,18 +41,11 @@ BAND_RADIUS_FRACTIONS=$BAND_RADIUS_FRACTIONS" 0.10 0.11 0.12 0.13 0.14 0.15 0.16
 BAND_RADIUS_FRACTIONS=$BAND_RADIUS_FRACTIONS" 0.20 0.30 0.40 0.50 0.60 0.70 0.80 0.90 1.00"
 
 #run rawalign with different band radius fractions
-for BAND_RADIUS_FRACTION in $BAND_RADIUS_FRACTIONS; do
-    bash run_rawalign_banded_sparse_nominanchor.sh $THREADS $BAND_RADIUS_FRACTION
-done
+$SWEEP --extra-params="--stop-min-anchor 2" --band-radius-fracs $BAND_RADIUS_FRACTIONS
 
 BAND_RADIUS_FRACTION=0.10
 MATCH_BONUSES="0.35 0.36 0.37 0.38 0.39 0.40 0.41 0.42 0.43 0.44 0.45 0.46 0.47 0.48 0.49 0.50"
 DTW_MIN_SCORES="0.0 10.0 20.0 30.0 40.0 50.0 60.0 70.0 80.0 90.0 100.0"
 
-#run rawalign with different band radius fractions
-#for BAND_RADIUS_FRACTION in $BAND_RADIUS_FRACTIONS; do
-for MATCH_BONUS in $MATCH_BONUSES; do
-    for DTW_MIN_SCORE in $DTW_MIN_SCORES; do
-        bash run_rawalign_banded_sparse_nominanchor.sh $THREADS $BAND_RADIUS_FRACTION $MATCH_BONUS $DTW_MIN_SCORE
-    done
-done
+#run rawalign with different match bonuses and dtw min scores
+$SWEEP --extra-params="--stop-min-anchor 2" --band-radius-fracs $BAND_RADIUS_FRACTION --match-bonuses $MATCH_BONUSES --min-scores $DTW_MIN_SCORES
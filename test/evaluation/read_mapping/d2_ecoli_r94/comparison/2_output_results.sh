@@ -51,62 +51,8 @@ echo "Mean time per read"
 grep "Mean time per read" *.comparison
 
 echo;
-echo '(Indexing) Timing results:'
-for i in `echo ../*/*index*.time`; do
-    FILENAME=$(basename "${i%.time}");
-	TOOLNAME="${FILENAME#${prefix}}";
-	echo -n "${TOOLNAME} ";
-	awk '{
-		if(NR == 2){
-			time = $NF
-		}else if(NR == 3){
-			time += $NF
-			printf("CPU Time: %.2f\n", time)
-		}
-	}' $i;
-done
-
-echo;
-echo '(Indexing) Memory usage results:'
-for i in `echo ../*/*index*.time`; do
-    FILENAME=$(basename "${i%.time}");
-	TOOLNAME="${FILENAME#${prefix}}";
-	echo -n "${TOOLNAME} ";
-	awk '{
-		if(NR == 10){
-			printf("Memory (GB): %.2f\n", $NF/1000000)
-		}
-	}' $i;
-done
-
-echo;
-echo '(Mapping) Timing results:'
-for i in `echo ../*/*_map*.time`; do
-    FILENAME=$(basename "${i%.time}");
-	TOOLNAME="${FILENAME#${prefix}}";
-	echo -n "${TOOLNAME} ";
-	awk '{
-		if(NR == 2){
-			time = $NF
-		}else if(NR == 3){
-			time += $NF
-			printf("CPU Time: %.2f\n", time)
-		}
-	}' $i;
-done
-
-echo;
-echo '(Mapping) Memory usage results:'
-for i in `echo ../*/*_map*.time`; do
-    FILENAME=$(basename "${i%.time}");
-	TOOLNAME="${FILENAME#${prefix}}";
-	echo -n "${TOOLNAME} ";
-	awk '{
-		if(NR == 10){
-			printf("Memory (GB): %.2f\n", $NF/1000000)
-		}
-	}' $i;
-done
+#CPU time and memory usage of the indexing and mapping steps, parsed from the .time files
+python ../../../../scripts/time_stats.py --prefix "${prefix}"
 
 echo;
 echo "Mean sequenced bases:"
@@ -1,22 +1,12 @@
 #!/bin/bash
 
-mkdir -p ../annotated
-mkdir -p ../throughput
-for i in ../outdir/*.paf; do
-    FILENAME=$(basename "${i%.paf}")
-    ANNOTATED=../annotated/${FILENAME}_ann.paf
-    THROUGHPUT=../throughput/${FILENAME}.throughput
-    
-    #only annotate if i is newer than ANNOTATED
-    if [ -f "$ANNOTATED" ] && [ "$ANNOTATED" -nt "$i" ]; then
-        echo "Skipping $i, because it was already annotated"
-        continue
-    else
-        echo "Annotating $i"
-    fi
-    
-    uncalled pafstats -r ../true_mappings.paf --annotate $i > ${ANNOTATED} 2> ${THROUGHPUT}
-done
+#number of PAF files annotated at the same time, all cores unless THREADS is set
+THREADS=${THREADS:-$(nproc)}
+
+#annotate all PAFs against the true mappings, only PAFs that are newer than their annotated PAF are annotated
+python ../../../../scripts/annotate_pafs.py -t "${THREADS}" -r ../true_mappings.paf -a ../annotated -p ../throughput ../outdir/*.paf
+#the scripts below read the annotated PAFs from their columnar cache rather than from the text (see test/data/README.md)
+python ../../../../scripts/paf_cache.py ../annotated/*.paf
 
 paf_categories=""
 #iterate over file and prepend Uncalled= if the filename contains uncalled, and add to paf_categories
@@ -37,6 +27,7 @@ for i in ../annotated/*.paf; do
     paf_categories="${paf_categories}${categorized} "
 done
 
-python ../../../../scripts/compare_pafs.py \
+#exact medians and percentiles, as in the paper, rather than the default quantile sketch
+python ../../../../scripts/compare_pafs.py --exact \
     ${paf_categories} \
     > d3_yeast_r94.comparison
@@ -18,14 +18,25 @@ bash run_rawalign_banded_global.sh $THREADS
 bash run_rawalign_full_global.sh $THREADS
 bash run_rawalign_full_sparse.sh $THREADS
 
+#the sweeps run their configurations concurrently, each with $SWEEP_THREADS of the $THREADS cores,
+#finished configurations are recorded in outdir, so rerunning an interrupted sweep only runs the remaining ones
+SWEEP_THREADS=$THREADS
+if [ ! -z "$2" ]; then
+    SWEEP_THREADS=$2
+fi
+SWEEP="python ../../../scripts/sweep_rawalign.py \
+    --outdir ./outdir/ \
+    --prefix d4_green_algae_r94 \
+    --signals ../../../data/d4_green_algae_r94/fast5_files/ \
+    --ref ../../../data/d4_green_algae_r94/ref.fa \
+    --pore ../../../../extern/kmer_models/r9.4_180mv_450bps_6mer/template_median68pA.model \
+    --preset fast \
+    --cores $THREADS \
+    --threads-per-job $SWEEP_THREADS"
+
 BAND_RADIUS_FRACTION=0.10
 MATCH_BONUSES="0.0 0.1 0.2 0.3 0.4 0.5 0.6 0.7 0.8 0.8 0.9 1.0"
 DTW_MIN_SCORES="0.0 10.0 20.0 30.0 40.0 50.0 60.0 70.0 80.0 90.0 100.0"
 
-#run rawalign with different band radius fractions
-#for BAND_RADIUS_FRACTION in $BAND_RADIUS_FRACTIONS; do
-for MATCH_BONUS in $MATCH_BONUSES; do
-    for DTW_MIN_SCORE in $DTW_MIN_SCORES; do
-        bash run_rawalign_banded_sparse.sh $THREADS $BAND_RADIUS_FRACTION $MATCH_BONUS $DTW_MIN_SCORE
-    done
-done
+#run rawalign with different match bonuses and dtw min scores
+$SWEEP --band-radius-fracs $BAND_RADIUS_FRACTION --match-bonuses $MATCH_BONUSES --min-scores $DTW_MIN_SCORES
@@ -0,0 +1,174 @@
+import os
+import sys
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from paf_columns import iter_paf_blocks, parse_paf_block, read_paf_columns, bp_per_sec, ANNOTATION_CLASSES, TP, FP, FN, TN, NA
+
+#labels each record of a PAF file against the true mappings, as uncalled pafstats --annotate does:
+#  mapped reads are tp if they overlap a true mapping of the read (same reference and strand), fp otherwise,
+#  and na if the read has no true mapping;
+#  unmapped reads are fn if the read has a true mapping and tn otherwise
+#the label is appended as rf:Z:<label> and the summary (incl. "BP per sec") is written to a .throughput file
+
+_ANNOTATION_SUFFIXES = [b'\trf:Z:' + c.encode() + b'\n' for c in ANNOTATION_CLASSES]
+
+
+class TruthIndex:
+	#true mappings, sorted by (read, start) per reference and strand
+	def __init__(self, truth_path):
+		cols = read_paf_columns(truth_path, tags=(), names=True, fields=('strand', 'target_name', 'target_start', 'target_end'))
+		mapped = cols['mapped'] if cols else np.zeros(0, dtype=bool)
+		read_names = np.array(cols['read_name'][mapped] if cols else [], dtype=bytes)
+
+		#read names are replaced by their rank among the reads with a true mapping
+		self.read_names, read_ids = np.unique(read_names, return_inverse=True)
+		self.intervals = {}
+		if not cols:
+			return
+		targets = cols['target_name'][mapped]
+		strands = cols['strand'][mapped]
+		starts = cols['target_start'][mapped]
+		ends = cols['target_end'][mapped]
+		for key in set(zip(targets.tolist(), strands.tolist())):
+			group = np.flatnonzero((targets == key[0]) & (strands == key[1]))
+			order = np.lexsort((starts[group], read_ids[group]))
+			group = group[order]
+			self.intervals[key] = (read_ids[group], starts[group], ends[group])
+
+	def read_ids(self, read_names):
+		#ids of the given reads, -1 for reads without a true mapping
+		read_names = np.array(read_names, dtype=bytes)
+		if len(self.read_names) == 0:
+			return np.full(len(read_names), -1, dtype=np.int64)
+		ids = np.searchsorted(self.read_names, read_names)
+		ids = np.minimum(ids, len(self.read_names) - 1)
+		return np.where(self.read_names[ids] == read_names, ids, -1)
+
+	def overlaps(self, target, strand, read_ids, starts, ends):
+		#whether [start, end] overlaps any true mapping of the read on target and strand
+		res = np.zeros(len(read_ids), dtype=bool)
+		if (target, strand) not in self.intervals:
+			return res
+		true_ids, true_starts, true_ends = self.intervals[(target, strand)]
+		first = np.searchsorted(true_ids, read_ids, side='left')
+		last = np.searchsorted(true_ids, read_ids, side='right')
+		#reads have very few true mappings, so the candidates are checked one offset at a time
+		for offset in range(int((last - first).max(initial=0))):
+			i = first + offset
+			valid = i < last
+			i = np.where(valid, i, 0)
+			res |= valid & (np.maximum(true_starts[i], starts) <= np.minimum(true_ends[i], ends))
+		return res
+
+	def annotate(self, cols):
+		#annotation class of each record
+		read_ids = self.read_ids(cols['read_name'])
+		has_truth = read_ids >= 0
+		mapped = cols['mapped']
+
+		labels = np.where(has_truth, FN, TN)
+		labels[mapped] = np.where(has_truth[mapped], FP, NA)
+		candidates = np.flatnonzero(mapped & has_truth)
+		targets = cols['target_name'][candidates]
+		strands = cols['strand'][candidates]
+		for key in set(zip(targets.tolist(), strands.tolist())):
+			group = candidates[(targets == key[0]) & (strands == key[1])]
+			is_tp = self.overlaps(key[0], key[1], read_ids[group], cols['target_start'][group], cols['target_end'][group])
+			labels[group[is_tp]] = TP
+		return labels
+
+
+#set in each worker process, so that the index is transferred once per worker rather than once per file
+_truth_index = None
+
+def _set_truth_index(truth_index):
+	global _truth_index
+	_truth_index = truth_index
+
+
+def annotate_paf_file(paf_path, annotated_path, throughput_path, truth_index=None):
+	truth_index = truth_index if truth_index is not None else _truth_index
+	counts = np.zeros(len(ANNOTATION_CLASSES), dtype=np.int64)
+	speeds = []
+	bp_mapped = []
+	ms_to_map = []
+	with open(annotated_path, 'wb') as out:
+		for data in iter_paf_blocks(paf_path):
+			cols = parse_paf_block(data, tags=('mt',), names=True, fields=('strand', 'target_name', 'target_start', 'target_end', 'query_end'))
+			labels = truth_index.annotate(cols)
+			lines = [line for line in data.split(b'\n') if line]
+			out.write(b''.join([line + _ANNOTATION_SUFFIXES[label] for line, label in zip(lines, labels.tolist())]))
+
+			counts += np.bincount(labels, minlength=len(ANNOTATION_CLASSES))
+			speeds.append(bp_per_sec(cols))
+			bp_mapped.append(cols['query_end'][cols['mapped']])
+			ms_to_map.append(cols['mt'][cols['mapped']])
+
+	with open(throughput_path, 'w') as out:
+		write_summary(out, counts, np.concatenate(speeds), np.concatenate(bp_mapped), np.concatenate(ms_to_map))
+	return annotated_path
+
+
+def write_summary(out, counts, bp_per_sec, bp_mapped, ms_to_map):
+	#same layout as the summary of uncalled pafstats
+	num_reads = max(int(counts.sum()), 1)
+	num_mapped = int(counts[TP] + counts[FP] + counts[NA])
+	out.write("Summary: %d reads, %d mapped (%.2f%%)\n\n" % (counts.sum(), num_mapped, 100 * num_mapped / num_reads))
+	out.write("Comparing to reference PAF\n")
+	out.write("     P     N\n")
+	out.write("T %6.2f %5.2f\n" % (100 * counts[TP] / num_reads, 100 * counts[TN] / num_reads))
+	out.write("F %6.2f %5.2f\n" % (100 * counts[FP] / num_reads, 100 * counts[FN] / num_reads))
+	out.write("NA: %.2f\n\n" % (100 * counts[NA] / num_reads))
+	if len(bp_per_sec) > 0:
+		out.write("Speed            Mean    Median\n")
+		out.write("BP per sec: %9.2f %9.2f\n" % (np.mean(bp_per_sec), np.median(bp_per_sec)))
+		out.write("BP mapped:  %9.2f %9.2f\n" % (np.mean(bp_mapped), np.median(bp_mapped)))
+		out.write("MS to map:  %9.2f %9.2f\n" % (np.mean(ms_to_map), np.median(ms_to_map)))
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Annotate PAFs with their true mappings (tp/fp/fn/tn/na)')
+	parser.add_argument('pafs', metavar='PAF', type=str, nargs='+', help='PAF files to annotate')
+	parser.add_argument('-r', '--ref-paf', type=str, required=True, help='PAF file with the true mappings (e.g., true_mappings.paf)')
+	parser.add_argument('-a', '--annotated-dir', type=str, default='../annotated', help='directory of the annotated PAFs (<name>_ann.paf)')
+	parser.add_argument('-p', '--throughput-dir', type=str, default='../throughput', help='directory of the summaries (<name>.throughput)')
+	parser.add_argument('-t', '--threads', type=int, default=os.cpu_count() or 1, help='number of PAF files that are annotated at the same time (default: number of cores)')
+	parser.add_argument('-f', '--force', action='store_true', help='annotate PAFs even if their annotated PAF is newer')
+	args = parser.parse_args()
+
+	if not Path(args.ref_paf).is_file():
+		print("PAF file " + args.ref_paf + " does not exist")
+		sys.exit(1)
+	os.makedirs(args.annotated_dir, exist_ok=True)
+	os.makedirs(args.throughput_dir, exist_ok=True)
+
+	jobs = []
+	for paf in map(Path, args.pafs):
+		if not paf.is_file():
+			print("PAF file " + str(paf) + " does not exist")
+			sys.exit(1)
+		annotated = Path(args.annotated_dir) / (paf.stem + "_ann.paf")
+		throughput = Path(args.throughput_dir) / (paf.stem + ".throughput")
+		#only annotate if the PAF is newer than its annotated PAF
+		if not args.force and annotated.is_file() and annotated.stat().st_mtime > paf.stat().st_mtime:
+			print(f"Skipping {paf}, because it was already annotated")
+			continue
+		print(f"Annotating {paf}")
+		jobs.append((paf, annotated, throughput))
+
+	if not jobs:
+		sys.exit(0)
+
+	#the true mappings are indexed once and shared by all files
+	truth_index = TruthIndex(args.ref_paf)
+	if args.threads <= 1:
+		for job in jobs:
+			annotate_paf_file(*job, truth_index)
+	else:
+		with ProcessPoolExecutor(max_workers=min(args.threads, len(jobs)), initializer=_set_truth_index, initargs=(truth_index,)) as pool:
+			for annotated in pool.map(annotate_paf_file, *zip(*jobs)):
+				print(f"Annotated {annotated}")
@@ -1,273 +1,322 @@
 import os
 import sys
+import pickle
 import argparse
-import subprocess
-import fileinput
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from paf_columns import iter_paf_columns, split_paf_file, bp_per_sec, TP, FP, FN, TN, NA, UNANNOTATED, MISSING_INT
+from paf_stats import MeanStat, DistributionStat, StreamingStat
+
+REPORTED_TAGS = ('mt', 'ci')
+PAF_TYPES = ('Uncalled', 'Sigmap', 'RawHash', 'RawAlign')
+DEFAULT_SHARD_SIZE = 256 #MB
+REPORTED_PERCENTILES = (90, 99, 99.9)
+SUMMARY_SUFFIX = '.summary'
+SUMMARY_VERSION = 6 #bump whenever PafSummary changes
+DEFAULT_DEADLINE = 1000.0 #ms, a chunk is 1 second of signal by default
+MAX_REPORTED_CHUNK = 10 #chunks from this index on are reported together
+LATENCY_HISTOGRAM_EDGES = np.concatenate(([0.0], 2.0 ** np.arange(-3, 14), [np.inf])) #ms
+DEFAULT_CONFIDENCE = 0.95
+#default bucket edges of the --stratify report, a bucket is [edge_i, edge_i+1)
+DEFAULT_STRATA_EDGES = {
+	'sl': (4000, 8000, 16000, 32000, 64000, 128000), #signal length in samples (4000 samples are 1 second at 4 kHz)
+	'ci': (2, 3, 4, 6, 8, 11), #chunks processed
+	'cm': (5, 10, 20, 50, 100, 200), #anchors of the best chain
+}
+
+
+class ChunkLatencySummary:
+	#mergeable distribution of the processing time per chunk (mt / ci, in ms) of the reads,
+	#broken down by mapped/unmapped reads and by the number of chunks processed (ci)
+	def __init__(self, exact=False):
+		self.exact = exact
+		self.groups = {'all': self.new_stat(), 'mapped': self.new_stat(), 'unmapped': self.new_stat()}
+		self.by_chunk = {}
+
+	def new_stat(self):
+		return DistributionStat() if self.exact else StreamingStat()
+
+	def add(self, latency, mapped, chunk):
+		self.groups['all'].add(latency)
+		self.groups['mapped'].add(latency[mapped])
+		self.groups['unmapped'].add(latency[~mapped])
+		chunk = np.minimum(chunk, MAX_REPORTED_CHUNK)
+		for c in np.unique(chunk).tolist():
+			self.by_chunk.setdefault(c, self.new_stat()).add(latency[chunk == c])
+
+	def merge(self, other):
+		for name, stat in other.groups.items():
+			self.groups[name].merge(stat)
+		for c, stat in other.by_chunk.items():
+			self.by_chunk.setdefault(c, self.new_stat()).merge(stat)
+		return self
+
+	def print_report(self, toolname, deadline):
+		rows = list(self.groups.items())
+		rows += [(f"ci={c}" if c < MAX_REPORTED_CHUNK else f"ci>={c}", self.by_chunk[c]) for c in sorted(self.by_chunk)]
+		for name, stat in rows:
+			percentiles = ", ".join(f"P{p}: {stat.quantile(p / 100):.3f}" for p in (50,) + REPORTED_PERCENTILES)
+			print(f"{toolname} Chunk latency [{name}] : n: {stat.n}, mean: {float(stat.mean()):.3f}, {percentiles}, "
+				f"over {deadline:g} ms: {100 * stat.fraction_above(deadline):.3f}%")
+		for name, stat in self.groups.items():
+			counts = stat.histogram(LATENCY_HISTOGRAM_EDGES)
+			buckets = ", ".join(f"{low:g}-{high:g}: {count}" if high != np.inf else f">={low:g}: {count}"
+				for low, high, count in zip(LATENCY_HISTOGRAM_EDGES[:-1], LATENCY_HISTOGRAM_EDGES[1:], counts.tolist()))
+			print(f"{toolname} Chunk latency histogram (ms) [{name}] : {buckets}")
+
+
+class StratifiedSummary:
+	#mergeable time per read, time per chunk, chunks per read and accuracy of the reads bucketed by the value of a tag
+	#(e.g., the signal length sl), the last bucket holds the records without the tag
+	def __init__(self, tag, edges, exact=False):
+		self.tag = tag
+		self.edges = np.asarray(edges, dtype=np.float64)
+		self.exact = exact
+		n_buckets = len(self.edges) + 2
+		#counted class (tp, fp, fn, tn) of the records of each bucket
+		self.class_counts = np.zeros((n_buckets, 4), dtype=np.int64)
+		self.time_per_read = [self.new_stat() for _ in range(n_buckets)]
+		self.time_per_chunk = [MeanStat() for _ in range(n_buckets)]
+		self.chunks = [MeanStat() for _ in range(n_buckets)]
+
+	def new_stat(self):
+		return DistributionStat() if self.exact else StreamingStat()
+
+	def buckets(self, values):
+		missing = (values == MISSING_INT) if np.issubdtype(values.dtype, np.integer) else np.isnan(values)
+		return np.where(missing, len(self.edges) + 1, np.searchsorted(self.edges, values, side='right'))
+
+	def add(self, cols, counted_class, full):
+		#counted_class is the class (tp, fp, fn, tn) a record counts as in the report, -1 if it is not counted
+		bucket = self.buckets(cols[self.tag])
+		counted = counted_class >= 0
+		self.class_counts += np.bincount(bucket[counted] * 4 + counted_class[counted], minlength=self.class_counts.size).reshape(self.class_counts.shape)
+		mt = cols['mt']
+		chunk = cols['ci']
+		#time per read as in the main report (see PafSummary.add_columns), so that the buckets add up to it
+		annotated_full = full & (cols['annotation'] != UNANNOTATED)
+		timed = cols['annotation'] != NA
+		chunked = full & (chunk > 0)
+		for b in np.unique(bucket).tolist():
+			in_bucket = bucket == b
+			self.time_per_read[b].add(mt[in_bucket & annotated_full] / chunk[in_bucket & annotated_full])
+			self.time_per_read[b].add(mt[in_bucket & timed])
+			self.time_per_chunk[b].add(mt[in_bucket & chunked] / chunk[in_bucket & chunked])
+			self.chunks[b].add(chunk[in_bucket & chunked])
+
+	def merge(self, other):
+		self.class_counts += other.class_counts
+		for mine, theirs in zip((self.time_per_read, self.time_per_chunk, self.chunks), (other.time_per_read, other.time_per_chunk, other.chunks)):
+			for stat, other_stat in zip(mine, theirs):
+				stat.merge(other_stat)
+		return self
+
+	def bucket_name(self, b):
+		if b == len(self.edges) + 1:
+			return f"{self.tag} missing"
+		low = f"{self.edges[b - 1]:g}" if b > 0 else "-inf"
+		high = f"{self.edges[b]:g}" if b < len(self.edges) else "inf"
+		return f"{self.tag} [{low}, {high})"
+
+	def print_report(self, toolname):
+		for b in range(len(self.class_counts)):
+			tp, fp, fn, tn = self.class_counts[b].tolist()
+			if tp + fp + fn + tn == 0 and self.time_per_read[b].n == 0:
+				continue
+			precision = tp / (tp + fp) if (tp + fp) > 0 else 0
+			recall = tp / (tp + fn) if (tp + fn) > 0 else 0
+			time_per_read = self.time_per_read[b]
+			print(f"{toolname} Stratified [{self.bucket_name(b)}] : reads: {tp + fp + fn + tn}, TP: {tp}, FP: {fp}, FN: {fn}, TN: {tn}, "
+				f"precision: {precision:.4f}, recall: {recall:.4f}, mean time per read: {float(time_per_read.mean()):.3f}, "
+				f"P90 time per read: {time_per_read.quantile(0.9):.3f}, mean time per chunk: {float(self.time_per_chunk[b].mean()):.3f}, "
+				f"mean chunks: {float(self.chunks[b].mean()):.3f}")
+
+
+class PafSummary:
+	#mergeable per-file counters behind the comparison report
+	#the time per read distribution is kept in a constant-memory quantile sketch, unless exact=True
+	#strata (tag => bucket edges) adds a StratifiedSummary per tag
+	def __init__(self, exact=False, strata=None):
+		self.tp = 0
+		self.fp = 0
+		self.fn = 0
+		self.tn = 0
+		self.time_per_read = DistributionStat() if exact else StreamingStat()
+		self.bp_per_sec = DistributionStat() if exact else StreamingStat()
+		self.maplast_pos = MeanStat()
+		self.umaplast_pos = MeanStat()
+		self.maplast_chunk = MeanStat()
+		self.umaplast_chunk = MeanStat()
+		self.chunk_latency = ChunkLatencySummary(exact)
+		self.strata = [StratifiedSummary(tag, edges, exact) for tag, edges in (strata or {}).items()]
+
+	def merge(self, other):
+		self.tp += other.tp
+		self.fp += other.fp
+		self.fn += other.fn
+		self.tn += other.tn
+		self.time_per_read.merge(other.time_per_read)
+		self.bp_per_sec.merge(other.bp_per_sec)
+		self.maplast_pos.merge(other.maplast_pos)
+		self.umaplast_pos.merge(other.umaplast_pos)
+		self.maplast_chunk.merge(other.maplast_chunk)
+		self.umaplast_chunk.merge(other.umaplast_chunk)
+		self.chunk_latency.merge(other.chunk_latency)
+		for stratified, other_stratified in zip(self.strata, other.strata):
+			stratified.merge(other_stratified)
+		return self
+
+	def add_columns(self, paf_type, cols):
+		annotation = cols['annotation']
+		mapped = cols['mapped']
+		mt = cols['mt']
+		class_counts = np.bincount(annotation, minlength=UNANNOTATED+1)
+		self.bp_per_sec.add(bp_per_sec(cols))
+
+		if 'Uncalled' in paf_type:
+			self.tp += int(class_counts[TP])
+			self.fp += int(class_counts[FP] + class_counts[NA])
+			self.fn += int(class_counts[FN])
+			self.tn += int(class_counts[TN])
+			self.time_per_read.add(mt[annotation != NA])
+			self.maplast_pos.add(cols['query_length'][mapped])
+			self.umaplast_pos.add(cols['query_length'][~mapped])
+			if self.strata:
+				counted_class = np.select([annotation == TP, (annotation == FP) | (annotation == NA), annotation == FN, annotation == TN], [0, 1, 2, 3], -1)
+				for stratified in self.strata:
+					stratified.add(cols, counted_class, np.zeros(len(annotation), dtype=bool))
+			return
+
+		if not is_known_paf_type(paf_type):
+			print("Unknown paf type " + paf_type)
+			sys.exit(1)
 
-from statistics import median
-from statistics import mean
-
-def analyze_paf_file(toolname, paf_type, paf_path):
-	if 'Uncalled' in paf_type:
-		tp, fp, fn, tn, time_per_read, maplast_pos, umaplast_pos \
-			= analyze_uncalled(paf_path)
-		maplast_chunk = []
-		umaplast_chunk = []
-	elif 'Sigmap' in paf_type:
-		tp, fp, fn, tn, time_per_mapped_read, time_per_unmapped_read, maplast_chunk, umaplast_chunk \
-			= analyze_sigmap(paf_path)
-		maplast_pos = []
-		umaplast_pos = []
-		time_per_read = time_per_mapped_read + time_per_unmapped_read
-	elif 'RawHash' in paf_type:
-		tp, fp, fn, tn, time_per_mapped_read, time_per_unmapped_read, maplast_pos, umaplast_pos, maplast_chunk, umaplast_chunk \
-			= analyze_rawhash(paf_path)
-		time_per_read = time_per_mapped_read + time_per_unmapped_read
-	elif 'RawAlign' in paf_type:
-		tp, fp, fn, tn, time_per_mapped_read, time_per_unmapped_read, maplast_pos, umaplast_pos, maplast_chunk, umaplast_chunk \
-			= analyze_rawalign(paf_path)
-		time_per_read = time_per_mapped_read + time_per_unmapped_read
-		maplast_pos = [] #temporarily disabled since the last round of experiments had an erroneous read length in the rawalign binary
-		umaplast_pos = []
-	else:
-		print("Unknown paf type " + paf_type)
-		sys.exit(1)
-
-	print(f"{toolname} TP: " + str(tp))
-	print(f"{toolname} FP: " + str(fp))
-	print(f"{toolname} FN: " + str(fn))
-	print(f"{toolname} TN: " + str(tn))
-	precision = tp / (tp + fp) if (tp + fp) > 0 else 0
-	print(f"{toolname} precision: " + str(precision))
-	recall = tp / (tp + fn) if (tp + fn) > 0 else 0
-	print(f"{toolname} recall: " + str(recall))
-	f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0
-	print(f"{toolname} F-1 score: " + str(f1))
-	#initie if no time_per_read
-	mean_time = mean(time_per_read) if len(time_per_read) > 0 else float('inf')
-	print(f"{toolname} Mean time per read : " + str(mean_time))
-	median_time = median(time_per_read) if len(time_per_read) > 0 else float('inf')
-	print(f"{toolname} Median time per read : " + str(median_time))
-	mean_maplast_pos = mean(maplast_pos) if len(maplast_pos) > 0 else float('inf')
-	print(f"{toolname} Mean (only mapped) # of sequenced bases per read : " + str(mean_maplast_pos))
-	mean_umaplast_pos = mean(umaplast_pos) if len(umaplast_pos) > 0 else float('inf')
-	print(f"{toolname} Mean (only unmapped) # of sequenced bases per read : " + str(mean_umaplast_pos))
-	mean_last_pos = mean(maplast_pos + umaplast_pos) if len(maplast_pos + umaplast_pos) > 0 else float('inf')
-	print(f"{toolname} Mean # of sequenced bases per read : " + str(mean_last_pos))
-	mean_maplast_chunk = mean(maplast_chunk) if len(maplast_chunk) > 0 else float('inf')
-	print(f"{toolname} Mean (only mapped) # of sequenced chunks per read : " + str(mean_maplast_chunk))
-	mean_umaplast_chunk = mean(umaplast_chunk) if len(umaplast_chunk) > 0 else float('inf')
-	print(f"{toolname} Mean (only unmapped) # of sequenced chunks per read : " + str(mean_umaplast_chunk))
-	mean_last_chunk = mean(maplast_chunk + umaplast_chunk) if len(maplast_chunk + umaplast_chunk) > 0 else float('inf')
-	print(f"{toolname} Mean # of sequenced chunks per read : " + str(mean_last_chunk))
-	print(f"#Done with {toolname}\n")
-
-
-def analyze_uncalled(paf_path):
-	tp = 0
-	fp = 0
-	fn = 0
-	tn = 0
-	time_per_read = []
-	maplast_pos = []
-	umaplast_pos = []
-
-	for line in paf_path.open():
-		cols = line.rstrip().split()
-		mt = float(cols[14].split(":")[2])
-		lastpos = int(cols[1])
-		is_mapped = cols[2] != '*'
-
-		if (is_mapped):
-			maplast_pos.append(lastpos)
-		else:
-			umaplast_pos.append(lastpos)
-
-		if (cols[15].split(":")[2] != 'na'):
-			time_per_read.append(mt)
-		if (cols[15].split(":")[2] == 'tp'):
-			tp += 1
-		if (cols[15].split(":")[2] == 'fp' or cols[15].split(":")[2] == 'na'):
-			fp += 1
-		if (cols[15].split(":")[2] == 'fn'):
-			fn += 1
-		if (cols[15].split(":")[2] == 'tn'):
-			tn += 1
-
-	return tp, fp, fn, tn, time_per_read, maplast_pos, umaplast_pos
-
-
-def analyze_sigmap(paf_path):
-	tp = 0
-	fp = 0
-	fn = 0
-	tn = 0
-
-	time_per_mapped_read = []
-	time_per_unmapped_read = []
-	maplast_chunk = []
-	umaplast_chunk = []
-
-	for line in paf_path.open():
-		cols = line.rstrip().split()
-		if (len(cols) == 24):
-			mt = float(cols[12].split(":")[2])
-			if (cols[23].split(":")[2] != 'na'):
-				time_per_unmapped_read.append(mt)
-			chunk = int(cols[13].split(":")[2])
-			is_mapped = cols[2] != '*'
-			if (is_mapped):
-				maplast_chunk.append(chunk)
-			else:
-				umaplast_chunk.append(chunk)
-			cm = int(cols[15].split(":")[2])
-			nc = int(cols[16].split(":")[2])
-			s1 = float(cols[17].split(":")[2])
-			s2 = float(cols[18].split(":")[2])
-			sm = float(cols[19].split(":")[2])
-			ad = float(cols[20].split(":")[2])
-			at = float(cols[21].split(":")[2])
-			aq = float(cols[22].split(":")[2])
-			if (cols[23].split(":")[2] == 'tp'):
-				tp += 1
-				time_per_mapped_read.append(mt / chunk)
-			if (cols[23].split(":")[2] == 'fp' or cols[23].split(":")[2] == 'na'):
-				fp += 1
-				time_per_mapped_read.append(mt / chunk)
-			if (cols[23].split(":")[2] == 'fn'):
-				fn += 1
-				time_per_mapped_read.append(mt / chunk)
-			if (cols[23].split(":")[2] == 'tn'):
-				tn += 1
-				time_per_mapped_read.append(mt / chunk)
-		if (len(cols) == 15):
-			mt = float(cols[12].split(":")[2])
-			if (cols[14].split(":")[2] != 'na'):
-				time_per_unmapped_read.append(mt)
-			if (cols[14].split(":")[2] == 'fn'):
-				fn += 1
-			if (cols[14].split(":")[2] == 'tn'):
-				tn += 1
-
-	return tp, fp, fn, tn, time_per_mapped_read, time_per_unmapped_read, maplast_chunk, umaplast_chunk
-
-
-def analyze_rawhash(paf_path):
-	tp = 0
-	fp = 0
-	fn = 0
-	tn = 0
-
-	time_per_mapped_read = []
-	time_per_unmapped_read = []
-	maplast_pos = []
-	umaplast_pos = []
-	maplast_chunk = []
-	umaplast_chunk = []
-
-	for line in paf_path.open():
-		cols = line.rstrip().split()
-		if (len(cols) == 23):
-			mt = float(cols[12].split(":")[2])
-			if (cols[22].split(":")[2] != 'na'):
-				time_per_unmapped_read.append(mt)
-			lastpos = int(cols[1])
-			chunk = int(cols[13].split(":")[2])
-			is_mapped = cols[2] != '*'
-			if (is_mapped):
-				maplast_pos.append(lastpos)
-				maplast_chunk.append(chunk)
-			else:
-				umaplast_pos.append(lastpos)
-				umaplast_chunk.append(chunk)
-			cm = int(cols[15].split(":")[2])
-			nc = int(cols[16].split(":")[2])
-			s1 = float(cols[17].split(":")[2])
-			s2 = float(cols[18].split(":")[2])
-			sm = float(cols[19].split(":")[2])
-			at = float(cols[20].split(":")[2])
-			aq = float(cols[21].split(":")[2])
-			if (cols[22].split(":")[2] == 'tp'):
-				tp += 1
-				time_per_mapped_read.append(mt / chunk)
-			if (cols[22].split(":")[2] == 'fp' or cols[22].split(":")[2] == 'na'):
-				fp += 1
-				time_per_mapped_read.append(mt / chunk)
-			if (cols[22].split(":")[2] == 'fn'):
-				fn += 1
-				time_per_mapped_read.append(mt / chunk)
-			if (cols[22].split(":")[2] == 'tn'):
-				tn += 1
-				time_per_mapped_read.append(mt / chunk)
-		if (len(cols) == 15):
-			mt = float(cols[12].split(":")[2])
-			if (cols[14].split(":")[2] != 'na'):
-				time_per_unmapped_read.append(mt)
-			if (cols[14].split(":")[2] == 'fn'):
-				fn += 1
-			if (cols[14].split(":")[2] == 'tn'):
-				tn += 1
-
-	return tp, fp, fn, tn, time_per_mapped_read, time_per_unmapped_read, maplast_pos, umaplast_pos, maplast_chunk, umaplast_chunk
-
-
-def analyze_rawalign(paf_path):
-	tp = 0
-	fp = 0
-	fn = 0
-	tn = 0
-
-	time_per_mapped_read = []
-	time_per_unmapped_read = []
-	maplast_pos = []
-	umaplast_pos = []
-	maplast_chunk = []
-	umaplast_chunk = []
-	for line in paf_path.open():
-		cols = line.rstrip().split()
-		if (len(cols) == 23):
-			mt = float(cols[12].split(":")[2])
-			if (cols[22].split(":")[2] != 'na'):
-				time_per_unmapped_read.append(mt)
-			lastpos = int(cols[1])
-			chunk = int(cols[13].split(":")[2])
-			is_mapped = cols[2] != '*'
-			if (is_mapped):
-				maplast_pos.append(lastpos)
-				maplast_chunk.append(chunk)
-			else:
-				umaplast_pos.append(lastpos)
-				umaplast_chunk.append(chunk)
-			cm = int(cols[15].split(":")[2])
-			nc = int(cols[16].split(":")[2])
-			s1 = float(cols[17].split(":")[2])
-			s2 = float(cols[18].split(":")[2])
-			sm = float(cols[19].split(":")[2])
-			at = float(cols[20].split(":")[2])
-			aq = float(cols[21].split(":")[2])
-			if (cols[22].split(":")[2] == 'tp'):
-				tp += 1
-				time_per_mapped_read.append(mt / chunk)
-			if (cols[22].split(":")[2] == 'fp' or cols[22].split(":")[2] == 'na'):
-				fp += 1
-				time_per_mapped_read.append(mt / chunk)
-			if (cols[22].split(":")[2] == 'fn'):
-				fn += 1
-				time_per_mapped_read.append(mt / chunk)
-			if (cols[22].split(":")[2] == 'tn'):
-				tn += 1
-				time_per_mapped_read.append(mt / chunk)
-		if (len(cols) == 15):
-			mt = float(cols[12].split(":")[2])
-			if (cols[14].split(":")[2] != 'na'):
-				time_per_unmapped_read.append(mt)
-			if (cols[14].split(":")[2] == 'fn'):
-				fn += 1
-			if (cols[14].split(":")[2] == 'tn'):
-				tn += 1
-
-	return tp, fp, fn, tn, time_per_mapped_read, time_per_unmapped_read, maplast_pos, umaplast_pos, maplast_chunk, umaplast_chunk
+		#full records carry the chunk count (ci) and chain statistics,
+		#short records (older unmapped output) only count towards fn/tn
+		chunk = cols['ci']
+		full = cols['cm'] != MISSING_INT if 'cm' in cols else chunk != MISSING_INT
+		full_counts = np.bincount(annotation[full], minlength=UNANNOTATED+1)
+		self.tp += int(full_counts[TP])
+		self.fp += int(full_counts[FP] + full_counts[NA])
+		self.fn += int(class_counts[FN])
+		self.tn += int(class_counts[TN])
+		if self.strata:
+			counted_class = np.select([full & (annotation == TP), full & ((annotation == FP) | (annotation == NA)), annotation == FN, annotation == TN], [0, 1, 2, 3], -1)
+			for stratified in self.strata:
+				stratified.add(cols, counted_class, full)
+
+		#time per read mixes mt/chunk of annotated full records with mt of all non-na records
+		annotated_full = full & (annotation != UNANNOTATED)
+		self.time_per_read.add(mt[annotated_full] / chunk[annotated_full])
+		self.time_per_read.add(mt[annotation != NA])
+
+		self.maplast_chunk.add(chunk[full & mapped])
+		self.umaplast_chunk.add(chunk[full & ~mapped])
+
+		#uncalled does not report chunks, so its latency per chunk is unknown
+		timed = full & (chunk > 0)
+		self.chunk_latency.add(mt[timed] / chunk[timed], mapped[timed], chunk[timed])
+		if 'RawHash' in paf_type:
+			self.maplast_pos.add(cols['query_length'][full & mapped])
+			self.umaplast_pos.add(cols['query_length'][full & ~mapped])
+		#RawAlign positions are temporarily disabled since the last round of experiments had an erroneous read length in the rawalign binary
+
+	def print_report(self, toolname, deadline=None):
+		tp, fp, fn, tn = self.tp, self.fp, self.fn, self.tn
+		print(f"{toolname} TP: " + str(tp))
+		print(f"{toolname} FP: " + str(fp))
+		print(f"{toolname} FN: " + str(fn))
+		print(f"{toolname} TN: " + str(tn))
+		precision = tp / (tp + fp) if (tp + fp) > 0 else 0
+		print(f"{toolname} precision: " + str(precision))
+		recall = tp / (tp + fn) if (tp + fn) > 0 else 0
+		print(f"{toolname} recall: " + str(recall))
+		f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0
+		print(f"{toolname} F-1 score: " + str(f1))
+		print(f"{toolname} Mean time per read : " + str(self.time_per_read.mean()))
+		print(f"{toolname} Median time per read : " + str(self.time_per_read.median()))
+		for percentile in REPORTED_PERCENTILES:
+			print(f"{toolname} P{percentile} time per read : " + str(self.time_per_read.quantile(percentile / 100)))
+		print(f"{toolname} Mean BP per sec : " + str(self.bp_per_sec.mean()))
+		last_pos = MeanStat().merge(self.maplast_pos).merge(self.umaplast_pos)
+		print(f"{toolname} Mean (only mapped) # of sequenced bases per read : " + str(self.maplast_pos.mean()))
+		print(f"{toolname} Mean (only unmapped) # of sequenced bases per read : " + str(self.umaplast_pos.mean()))
+		print(f"{toolname} Mean # of sequenced bases per read : " + str(last_pos.mean()))
+		last_chunk = MeanStat().merge(self.maplast_chunk).merge(self.umaplast_chunk)
+		print(f"{toolname} Mean (only mapped) # of sequenced chunks per read : " + str(self.maplast_chunk.mean()))
+		print(f"{toolname} Mean (only unmapped) # of sequenced chunks per read : " + str(self.umaplast_chunk.mean()))
+		print(f"{toolname} Mean # of sequenced chunks per read : " + str(last_chunk.mean()))
+		if deadline is not None:
+			self.chunk_latency.print_report(toolname, deadline)
+		for stratified in self.strata:
+			stratified.print_report(toolname)
+		print(f"#Done with {toolname}\n")
+
+
+def is_known_paf_type(paf_type):
+	return any(t in paf_type for t in PAF_TYPES)
+
+
+def summarize_paf_file(paf_type, paf_path, start=0, end=None, exact=False, strata=None):
+	#summary of the lines that start in the byte range [start, end) of the file
+	summary = PafSummary(exact, strata)
+	tags = REPORTED_TAGS if 'Uncalled' in paf_type else REPORTED_TAGS + ('cm',)
+	tags += tuple(tag for tag in (strata or {}) if tag not in tags)
+	for cols in iter_paf_columns(paf_path, tags=tags, start=start, end=end, fields=('query_end',)):
+		summary.add_columns(paf_type, cols)
+	return summary
+
+
+def summarize_paf_files(pafs, threads, shard_size=DEFAULT_SHARD_SIZE, exact=False, strata=None):
+	#summarizes several (paf_type, paf_path) pairs at the same time
+	#files larger than shard_size MB are split into byte-range shards at line boundaries,
+	#all shards are analyzed by a pool of worker processes and their partial summaries are merged per file
+	summaries = [PafSummary(exact, strata) for _ in pafs]
+	with ProcessPoolExecutor(max_workers=threads) as pool:
+		futures = []
+		for i, (paf_type, paf_path) in enumerate(pafs):
+			for start, end in split_paf_file(paf_path, shard_size * 1024 * 1024):
+				futures.append((i, pool.submit(summarize_paf_file, paf_type, paf_path, start, end, exact, strata)))
+		for i, future in futures:
+			summaries[i].merge(future.result())
+	return summaries
+
+
+def get_summary_path(paf_path):
+	return Path(paf_path).with_name(Path(paf_path).name + SUMMARY_SUFFIX)
+
+
+def get_summary_key(paf_type, paf_path, exact, strata=None):
+	#a stored summary is valid as long as the PAF file and the way it is summarized are unchanged
+	stat = os.stat(paf_path)
+	strata_key = tuple((tag, tuple(edges)) for tag, edges in (strata or {}).items())
+	return (SUMMARY_VERSION, paf_type, exact, strata_key, stat.st_size, stat.st_mtime_ns)
+
+
+def load_summary(paf_type, paf_path, exact=False, strata=None):
+	#summary stored next to the PAF file, None if there is none or if it is stale
+	try:
+		with open(get_summary_path(paf_path), 'rb') as f:
+			key, summary = pickle.load(f)
+	except (OSError, EOFError, ValueError, AttributeError, pickle.UnpicklingError):
+		return None
+	if key != get_summary_key(paf_type, paf_path, exact, strata):
+		return None
+	return summary
+
+
+def store_summary(paf_type, paf_path, summary, exact=False, strata=None):
+	summary_path = get_summary_path(paf_path)
+	tmp_path = summary_path.with_name(summary_path.name + f".{os.getpid()}.tmp")
+	try:
+		with open(tmp_path, 'wb') as f:
+			pickle.dump((get_summary_key(paf_type, paf_path, exact, strata), summary), f)
+		os.replace(tmp_path, summary_path)
+	except OSError as e:
+		print(f"Could not store the summary of {paf_path}: {e}", file=sys.stderr)
 
 
 def longest_common_prefix(strings):
@@ -288,8 +337,33 @@ def longest_common_prefix(strings):
 if __name__ == '__main__':
 	parser = argparse.ArgumentParser(description='Compare PAFs')
 	parser.add_argument('pafs', metavar='PAF', type=str, nargs='+', help='annotated PAF files to compare in the format NAME=PATH')
+	parser.add_argument('-t', '--threads', type=int, default=1, help='number of worker processes that analyze PAF files (and shards of large PAF files) at the same time')
+	parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help='with more than one thread, PAF files larger than this many MB are split into shards that are analyzed in parallel')
+	parser.add_argument('--recompute', action='store_true', help=f'ignore the summaries stored next to the PAF files (<PAF>{SUMMARY_SUFFIX}) and analyze all files again')
+	parser.add_argument('--latency-report', action='store_true', help='also report the distribution of the processing time per chunk (percentiles, histogram, chunks over the deadline), by mapped/unmapped reads and by chunk index')
+	parser.add_argument('--deadline', type=float, default=DEFAULT_DEADLINE, help='per-chunk deadline in ms for --latency-report')
+	parser.add_argument('--exact', action='store_true', help='keep all times per read in memory for exact medians and percentiles instead of streaming them into a sketch with 1%% relative error')
+	parser.add_argument('--bootstrap', type=int, default=0, metavar='N', help='also report bootstrap confidence intervals of precision, recall, F-1 score and mean BP per sec from N resamples of the reads, of each file and of the difference of each file to the first one')
+	parser.add_argument('--strata', type=str, default=None, metavar='TSV', help='resample the reads of --bootstrap within their strata, as written by sample_reads.py (<outdir>/strata.tsv)')
+	parser.add_argument('--confidence', type=float, default=DEFAULT_CONFIDENCE, help='confidence level of the --bootstrap intervals')
+	parser.add_argument('--seed', type=int, default=0, help='seed of the --bootstrap resamples')
+	parser.add_argument('--paired', action='store_true', help='compare two PAF files read by read instead (speedup distribution, Wilcoxon signed-rank test, reads whose annotation flipped), with --bootstrap also a confidence interval of the geometric mean speedup')
+	parser.add_argument('--stratify', type=str, nargs='+', default=[], choices=list(DEFAULT_STRATA_EDGES), help='also report time per read, time per chunk, chunks per read, precision and recall bucketed by these tags (signal length sl, chunks ci, anchors cm)')
+	parser.add_argument('--strata-edges', type=str, nargs='+', default=[], metavar='TAG=EDGES', help='comma-separated bucket edges of a --stratify tag (e.g., sl=8000,32000), instead of DEFAULT_STRATA_EDGES')
+	parser.add_argument('--flipped', type=str, default=None, metavar='TSV', help='with --paired, write the reads whose annotation flipped to this file')
 	args = parser.parse_args()
 
+	strata_edges = dict(DEFAULT_STRATA_EDGES)
+	for tag_edges in args.strata_edges:
+		tag, _, edges = tag_edges.partition('=')
+		if tag not in args.stratify:
+			parser.error(f"--strata-edges {tag} is not a --stratify tag")
+		try:
+			strata_edges[tag] = tuple(sorted(float(e) for e in edges.split(',') if e))
+		except ValueError:
+			parser.error(f"invalid --strata-edges {tag_edges}")
+	strata = {tag: strata_edges[tag] for tag in args.stratify}
+
 	#ensure that all files exist
 	pafs = []
 	for namedpaf in args.pafs:
@@ -300,13 +374,48 @@ if __name__ == '__main__':
 		if not paf.is_file():	
 			print("PAF file " + str(paf) + " does not exist")
 			sys.exit(1)
+		if not is_known_paf_type(paf_type):
+			print("Unknown paf type " + paf_type)
+			sys.exit(1)
 		pafs.append((paf_type, paf))
 
 	#find shared prefix between paf filenames
 	basenames = [paf.name for (paf_type, paf) in pafs]
 	prefix = longest_common_prefix(basenames)
 
-	for paf_type, paf in pafs:
-		toolname = paf.name.replace(prefix, "").replace("_ann.paf", "")
+	toolnames = [paf.name.replace(prefix, "").replace("_ann.paf", "") for (paf_type, paf) in pafs]
+
+	read_strata = None
+	if args.strata is not None:
+		if args.bootstrap <= 0:
+			parser.error("--strata requires --bootstrap")
+		from paired_pafs import load_strata
+		read_strata = load_strata(args.strata)
+
+	if args.paired:
+		if len(pafs) != 2:
+			parser.error("--paired compares exactly two PAF files")
+		from paired_pafs import compare_paired
+		compare_paired(toolnames[0], pafs[0][1], toolnames[1], pafs[1][1], args.bootstrap, args.confidence, args.seed, args.flipped, read_strata)
+		sys.exit(0)
+	elif args.flipped is not None:
+		parser.error("--flipped requires --paired")
+
+	#only new files and files that changed since their summary was stored are analyzed
+	summaries = [None if args.recompute else load_summary(paf_type, paf, args.exact, strata) for (paf_type, paf) in pafs]
+	stale = [i for i, summary in enumerate(summaries) if summary is None]
+	if args.threads <= 1:
+		computed = [summarize_paf_file(*pafs[i], exact=args.exact, strata=strata) for i in stale]
+	else:
+		computed = summarize_paf_files([pafs[i] for i in stale], args.threads, args.shard_size, args.exact, strata)
+	for i, summary in zip(stale, computed):
+		store_summary(*pafs[i], summary, args.exact, strata)
+		summaries[i] = summary
+
+	for (paf_type, paf), toolname, summary in zip(pafs, toolnames, summaries):
 		print(f"Analyzing {paf} (aka {toolname}) as {paf_type}")
-		analyze_paf_file(toolname, paf_type, paf)
+		summary.print_report(toolname, args.deadline if args.latency_report else None)
+
+	if args.bootstrap > 0:
+		from paired_pafs import bootstrap_pafs
+		bootstrap_pafs(toolnames, [paf for (paf_type, paf) in pafs], args.bootstrap, args.confidence, args.seed, read_strata)
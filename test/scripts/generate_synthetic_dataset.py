@@ -0,0 +1,270 @@
+import os
+import sys
+import uuid
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+#generates a dataset that needs no download: a reference (or a given one), reads sampled from it, their raw signals in
+#multi-read FAST5 files, and the true mappings of the reads, laid out as the datasets in test/data:
+#  <outdir>/ref.fa, <outdir>/reads.fasta, <outdir>/fast5_files/*.fast5, <outdir>/true_mappings.paf
+#the signal of a read follows the k-mer model that rawalign indexes the reference with (see ri_seq_to_sig and
+#PoreModel::Load): each k-mer of the read produces a dwell-time many samples around its level_mean, with gaussian noise
+#of its level_stdv, and a per-read scale and shift of the current
+#everything is drawn from a single seed, so the same arguments always generate the same files
+#requires h5py to write the FAST5 files
+
+DEFAULT_PORE_MODEL = Path(__file__).resolve().parents[2] / "extern/kmer_models/r9.4_180mv_450bps_6mer/template_median68pA.model"
+
+#sizes of the generated datasets, each can be overridden by the respective argument
+PRESETS = {
+	'ci':         dict(num_reads=200,    genome_size=200_000,    num_contigs=2,  mean_read_length=4000),
+	'small':      dict(num_reads=5000,   genome_size=2_000_000,  num_contigs=4,  mean_read_length=6000),
+	'production': dict(num_reads=50000,  genome_size=50_000_000, num_contigs=16, mean_read_length=8000),
+}
+
+#channel_id attributes of R9.4 MinION reads, signals are stored as (pA / (range / digitisation)) - offset
+DIGITISATION = 8192.0
+RANGE = 1402.882
+OFFSET = 10.0
+
+_BASES = np.frombuffer(b'ACGT', dtype=np.uint8)
+_CODES = np.full(256, 0, dtype=np.uint8) #ambiguous bases are treated as A, as in ri_seq_to_sig
+for _i, _c in enumerate(b'ACGT'):
+	_CODES[_c] = _CODES[_c + 32] = _i
+_COMPLEMENT = bytes.maketrans(b'ACGTacgtN', b'TGCAtgcaN')
+
+
+class PoreModel:
+	#level_mean and level_stdv of each k-mer, indexed by its 2-bit encoding (A=0, C=1, G=2, T=3) as in PoreModel::Load
+	def __init__(self, path):
+		kmers = []
+		means = []
+		stdvs = []
+		with open(path) as f:
+			for line in f:
+				#skip the header
+				if line.startswith('#') or line.startswith('kmer') or not line.strip():
+					continue
+				fields = line.split()
+				kmers.append(fields[0])
+				means.append(float(fields[1]))
+				stdvs.append(float(fields[2]))
+		self.k = len(kmers[0])
+		self.level_mean = np.zeros(1 << (2 * self.k), dtype=np.float64)
+		self.level_stdv = np.zeros(1 << (2 * self.k), dtype=np.float64)
+		hashes = kmer_hashes(np.frombuffer(''.join(kmers).encode(), dtype=np.uint8), self.k)[::self.k]
+		self.level_mean[hashes] = means
+		self.level_stdv[hashes] = stdvs
+
+
+def kmer_hashes(seq:np.ndarray, k):
+	#2-bit encoding of each k-mer of seq (an array of ASCII bases)
+	codes = _CODES[seq].astype(np.int64)
+	n = len(codes) - k + 1
+	if n <= 0:
+		return np.zeros(0, dtype=np.int64)
+	hashes = np.zeros(n, dtype=np.int64)
+	for j in range(k):
+		hashes = (hashes << 2) | codes[j:j + n]
+	return hashes
+
+
+def reverse_complement(seq:bytes):
+	return seq.translate(_COMPLEMENT)[::-1]
+
+
+def read_fasta(path):
+	#list of (name, sequence)
+	records = []
+	name = None
+	chunks = []
+	with open(path, 'rb') as f:
+		for line in f:
+			line = line.strip()
+			if line.startswith(b'>'):
+				if name is not None:
+					records.append((name, b''.join(chunks).upper()))
+				name = line[1:].split()[0].decode()
+				chunks = []
+			elif line:
+				chunks.append(line)
+	if name is not None:
+		records.append((name, b''.join(chunks).upper()))
+	return records
+
+
+def write_fasta(path, records, width=80):
+	with open(path, 'wb') as f:
+		for name, seq in records:
+			f.write(b'>' + name.encode() + b'\n')
+			for i in range(0, len(seq), width):
+				f.write(seq[i:i + width] + b'\n')
+
+
+def random_reference(rng, genome_size, num_contigs):
+	lengths = np.full(num_contigs, genome_size // num_contigs)
+	lengths[:genome_size % num_contigs] += 1
+	return [(f"contig{i + 1}", _BASES[rng.integers(0, 4, length)].tobytes()) for i, length in enumerate(lengths)]
+
+
+class SignalModel:
+	def __init__(self, pore_model, sample_rate=4000, bp_per_sec=450, dwell_shape=4.0, noise_scale=1.0,
+			scale_sd=0.05, shift_sd=2.0):
+		self.pore_model = pore_model
+		self.mean_dwell = sample_rate / bp_per_sec #samples per base
+		self.dwell_shape = dwell_shape #shape of the gamma distribution of the dwell times, larger is more regular
+		self.noise_scale = noise_scale #factor applied to the level_stdv of the k-mers
+		self.scale_sd = scale_sd #standard deviation of the per-read scale of the current (around 1)
+		self.shift_sd = shift_sd #standard deviation of the per-read shift of the current (pA)
+
+	def signal(self, rng, seq:bytes):
+		#raw signal (pA) of a read with sequence seq
+		hashes = kmer_hashes(np.frombuffer(seq, dtype=np.uint8), self.pore_model.k)
+		dwell = np.maximum(np.rint(rng.gamma(self.dwell_shape, self.mean_dwell / self.dwell_shape, len(hashes))), 1).astype(np.int64)
+		levels = np.repeat(self.pore_model.level_mean[hashes], dwell)
+		noise = rng.standard_normal(len(levels)) * np.repeat(self.pore_model.level_stdv[hashes], dwell) * self.noise_scale
+		scale = 1 + rng.normal(0, self.scale_sd)
+		shift = rng.normal(0, self.shift_sd)
+		return levels * scale + shift + noise
+
+
+def digitise(signal):
+	#inverse of the conversion to pA in ri_read_sig
+	return np.clip(np.rint(signal * DIGITISATION / RANGE - OFFSET), -32768, 32767).astype(np.int16)
+
+
+class Fast5Writer:
+	#multi-read FAST5 files with at most reads_per_file reads each, uncompressed so that no VBZ plugin is needed
+	def __init__(self, directory, prefix, reads_per_file, sample_rate):
+		import h5py
+		self.h5py = h5py
+		self.directory = Path(directory)
+		self.prefix = prefix
+		self.reads_per_file = reads_per_file
+		self.sample_rate = sample_rate
+		self.file = None
+		self.n_files = 0
+		self.n_reads = 0
+
+	def add(self, read_id, raw, channel, read_number, start_time):
+		if self.file is None or self.n_reads == self.reads_per_file:
+			self.close()
+			self.file = self.h5py.File(self.directory / f"{self.prefix}_{self.n_files}.fast5", 'w')
+			self.file.attrs['file_type'] = np.bytes_('multi-read')
+			self.file.attrs['file_version'] = np.bytes_('2.2')
+			self.n_files += 1
+			self.n_reads = 0
+		group = self.file.create_group(f"read_{read_id}")
+		group.attrs['run_id'] = np.bytes_(self.prefix)
+		raw_group = group.create_group("Raw")
+		raw_group.attrs['read_id'] = np.bytes_(read_id)
+		raw_group.attrs['read_number'] = np.int32(read_number)
+		raw_group.attrs['start_time'] = np.uint64(start_time)
+		raw_group.attrs['duration'] = np.uint32(len(raw))
+		raw_group.attrs['start_mux'] = np.uint8(1)
+		raw_group.create_dataset("Signal", data=raw)
+		channel_group = group.create_group("channel_id")
+		channel_group.attrs['channel_number'] = np.bytes_(str(channel))
+		channel_group.attrs['digitisation'] = np.float64(DIGITISATION)
+		channel_group.attrs['range'] = np.float64(RANGE)
+		channel_group.attrs['offset'] = np.float64(OFFSET)
+		channel_group.attrs['sampling_rate'] = np.float64(self.sample_rate)
+		self.n_reads += 1
+
+	def close(self):
+		if self.file is not None:
+			self.file.close()
+			self.file = None
+
+
+def sample_reads(rng, reference, num_reads, mean_read_length, read_length_sd, min_read_length, random_fraction):
+	#(contig index or -1 for random reads, start, end, strand) of each read, read lengths are log-normal
+	lengths = np.array([len(seq) for _, seq in reference], dtype=np.int64)
+	sigma = np.sqrt(np.log(1 + (read_length_sd / mean_read_length) ** 2))
+	mu = np.log(mean_read_length) - sigma ** 2 / 2
+	read_lengths = np.maximum(np.rint(rng.lognormal(mu, sigma, num_reads)), min_read_length).astype(np.int64)
+	contigs = rng.choice(len(reference), size=num_reads, p=lengths / lengths.sum())
+	read_lengths = np.minimum(read_lengths, lengths[contigs])
+	starts = (rng.random(num_reads) * (lengths[contigs] - read_lengths + 1)).astype(np.int64)
+	strands = np.where(rng.random(num_reads) < 0.5, '+', '-')
+	contigs[rng.random(num_reads) < random_fraction] = -1
+	return contigs, starts, starts + read_lengths, strands
+
+
+def generate(args):
+	rng = np.random.default_rng(args.seed)
+	outdir = Path(args.outdir)
+	fast5_dir = outdir / "fast5_files"
+	os.makedirs(fast5_dir, exist_ok=True)
+
+	reference = read_fasta(args.ref) if args.ref else random_reference(rng, args.genome_size, args.num_contigs)
+	write_fasta(outdir / "ref.fa", reference)
+	pore_model = PoreModel(args.pore)
+	signal_model = SignalModel(pore_model, args.sample_rate, args.bp_per_sec, args.dwell_shape, args.noise_scale)
+
+	contigs, starts, ends, strands = sample_reads(rng, reference, args.num_reads, args.mean_read_length,
+		args.read_length_sd if args.read_length_sd is not None else args.mean_read_length / 2, max(args.min_read_length, pore_model.k),
+		args.random_fraction)
+
+	writer = Fast5Writer(fast5_dir, args.prefix, args.reads_per_file, args.sample_rate)
+	channel_time = np.zeros(args.channels, dtype=np.int64) #samples sequenced per channel so far
+	n_samples = 0
+	with open(outdir / "reads.fasta", 'wb') as reads_fasta, open(outdir / "true_mappings.paf", 'w') as truth:
+		for i in range(args.num_reads):
+			read_id = str(uuid.UUID(bytes=rng.bytes(16), version=4))
+			if contigs[i] >= 0:
+				name, contig = reference[contigs[i]]
+				seq = contig[starts[i]:ends[i]]
+				if strands[i] == '-':
+					seq = reverse_complement(seq)
+				length = len(seq)
+				truth.write(f"{read_id}\t{length}\t0\t{length}\t{strands[i]}\t{name}\t{len(contig)}\t{starts[i]}\t{ends[i]}\t{length}\t{length}\t60\ttp:A:P\n")
+			else:
+				#reads of sequences that are not in the reference, these have no true mapping
+				seq = _BASES[rng.integers(0, 4, ends[i] - starts[i])].tobytes()
+			reads_fasta.write(b'>' + read_id.encode() + b'\n' + seq + b'\n')
+
+			raw = digitise(signal_model.signal(rng, seq))
+			channel = i % args.channels
+			writer.add(read_id, raw, channel + 1, i // args.channels, channel_time[channel])
+			channel_time[channel] += len(raw)
+			n_samples += len(raw)
+	writer.close()
+	print(f"Generated {args.num_reads} reads ({n_samples} samples) in {writer.n_files} FAST5 files in {fast5_dir}")
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Generate a synthetic dataset (reference, FAST5 files and true mappings) from a pore model')
+	parser.add_argument('-o', '--outdir', type=str, required=True, help='output directory, laid out as the datasets in test/data')
+	parser.add_argument('--preset', choices=sorted(PRESETS), default='ci', help='size of the dataset, see the arguments below to override single values')
+	parser.add_argument('--seed', type=int, default=0, help='seed of all random choices')
+	parser.add_argument('--ref', type=str, default=None, help='reference FASTA to sample the reads from (default: a random reference)')
+	parser.add_argument('--pore', type=str, default=str(DEFAULT_PORE_MODEL), help='k-mer model file')
+	parser.add_argument('--prefix', type=str, default='synthetic', help='prefix of the FAST5 file names')
+	parser.add_argument('-n', '--num-reads', type=int, default=None, help='number of reads')
+	parser.add_argument('--genome-size', type=int, default=None, help='length of the random reference')
+	parser.add_argument('--num-contigs', type=int, default=None, help='number of contigs of the random reference')
+	parser.add_argument('--mean-read-length', type=int, default=None, help='mean read length (bases)')
+	parser.add_argument('--read-length-sd', type=float, default=None, help='standard deviation of the read lengths (default: half the mean)')
+	parser.add_argument('--min-read-length', type=int, default=200, help='minimum read length (bases)')
+	parser.add_argument('--random-fraction', type=float, default=0.0, help='fraction of reads that do not come from the reference')
+	parser.add_argument('--reads-per-file', type=int, default=4000, help='reads per FAST5 file')
+	parser.add_argument('--channels', type=int, default=512, help='number of channels the reads are distributed over')
+	parser.add_argument('--sample-rate', type=int, default=4000, help='samples per second')
+	parser.add_argument('--bp-per-sec', type=int, default=450, help='bases per second, the mean dwell time is sample_rate / bp_per_sec samples')
+	parser.add_argument('--dwell-shape', type=float, default=4.0, help='shape of the gamma distributed dwell times, larger values are more regular')
+	parser.add_argument('--noise-scale', type=float, default=1.0, help='factor applied to the level_stdv of the pore model')
+	args = parser.parse_args()
+
+	for key, value in PRESETS[args.preset].items():
+		if getattr(args, key) is None:
+			setattr(args, key, value)
+	if not Path(args.pore).is_file():
+		print("Pore model " + args.pore + " does not exist")
+		sys.exit(1)
+	if args.ref and not Path(args.ref).is_file():
+		print("Reference " + args.ref + " does not exist")
+		sys.exit(1)
+	generate(args)
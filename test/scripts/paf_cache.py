@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from paf_columns import iter_paf_blocks, parse_paf_block, TAG_TYPES, MANDATORY_FIELDS, TEXT_FIELDS, MISSING_INT
+
+#columnar copy of a PAF file in <paf>.cols/, written once and memory-mapped by every later analysis,
+#so that the text is not parsed again (iter_paf_columns uses it transparently while it is up to date):
+#  meta.json                          size and mtime of the PAF it was built from, number of records, stored tags
+#  offset.npy                         byte offset of each record in the PAF
+#  <field>.npy                        numeric mandatory fields (int64, -1 if missing), mapped, annotation
+#  strand.npy                         fixed-width bytes
+#  <tag>.npy                          the TAG_TYPES tags that occur in the file (missing values as in paf_columns)
+#  query_name.data, .offsets.npy      string table of the read names: concatenated bytes and the offset of each name
+#  target_name.npy, target_names.npy  reference name of each record as an index into the table of reference names
+#  <tag>.values, .offsets.npy         tuple tags (aln, anchors): the concatenated tuples as float64 rows, row offsets
+#                                     of each record, and <tag>.present.npy for the records that have the tag
+
+CACHE_SUFFIX = ".cols"
+CACHE_VERSION = 1
+CACHE_BLOCK_ROWS = 1 << 18 #records per block yielded from the cache
+NUMERIC_FIELDS = tuple(f for f in MANDATORY_FIELDS if f not in TEXT_FIELDS)
+TUPLE_TAGS = {'aln': 3, 'anchors': 2} #tuple tags written by --dtw-output-cigar and --output-chains, and their tuple width
+
+
+def get_cache_path(paf_path):
+	paf_path = Path(paf_path)
+	return paf_path.with_name(paf_path.name + CACHE_SUFFIX)
+
+
+def get_stamp(paf_path):
+	stat = os.stat(paf_path)
+	return {'version': CACHE_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def line_offsets(data, base):
+	#offsets of the non-blank lines of a block, the same lines that parse_paf_block returns
+	buf = np.frombuffer(data, dtype=np.uint8)
+	ends = np.flatnonzero(buf == ord('\n'))
+	if len(ends) == 0 or ends[-1] != len(buf) - 1:
+		ends = np.append(ends, len(buf))
+	starts = np.r_[0, ends[:-1] + 1]
+	return base + starts[ends > starts]
+
+
+def tuple_tag_values(data, tag, width):
+	#per line: whether it has the tag and its tuples "(a,b)(a,b)..." as a (tuples x width) array
+	needle = b'\t' + tag.encode() + b':'
+	present = []
+	values = []
+	counts = []
+	for line in data.split(b'\n'):
+		if not line:
+			continue
+		start = line.find(needle)
+		if start < 0:
+			present.append(False)
+			counts.append(0)
+			continue
+		start = line.index(b':', start + len(needle)) + 1
+		end = line.find(b'\t', start)
+		value = line[start:] if end < 0 else line[start:end]
+		present.append(True)
+		counts.append(value.count(b'('))
+		if value:
+			values.append(value[1:-1].replace(b')(', b','))
+	flat = np.array(b','.join(values).split(b','), dtype=np.float64) if values else np.zeros(0)
+	return np.array(present, dtype=bool), np.array(counts, dtype=np.int64), flat.reshape(-1, width)
+
+
+class ColumnWriter:
+	#appends the blocks of one column to a raw file, which is converted to .npy once the length is known
+	def __init__(self, path, dtype):
+		self.path = path
+		self.dtype = np.dtype(dtype)
+		self.file = open(str(path) + ".raw", 'wb')
+		self.n = 0
+
+	def append(self, values):
+		values = np.ascontiguousarray(values, dtype=self.dtype)
+		self.file.write(values.tobytes())
+		self.n += len(values)
+
+	def close(self, shape=None):
+		self.file.close()
+		raw = np.memmap(str(self.path) + ".raw", dtype=self.dtype, mode='r', shape=shape or (self.n,)) if self.n else np.zeros(shape or (0,), dtype=self.dtype)
+		np.save(self.path, raw)
+		del raw
+		os.remove(str(self.path) + ".raw")
+
+
+def build_cache(paf_path, cache_path=None):
+	#writes the columns of the PAF file to a temporary directory that replaces the cache when it is complete
+	paf_path = Path(paf_path)
+	cache_path = Path(cache_path) if cache_path is not None else get_cache_path(paf_path)
+	stamp = get_stamp(paf_path)
+	tmp_path = cache_path.with_name(cache_path.name + f".{os.getpid()}.tmp")
+	shutil.rmtree(tmp_path, ignore_errors=True)
+	tmp_path.mkdir(parents=True)
+
+	fixed = {'offset': np.int64, 'mapped': bool, 'annotation': np.uint8, 'strand': 'S1', 'target_name': np.int32}
+	fixed.update({field: np.int64 for field in NUMERIC_FIELDS})
+	fixed.update(TAG_TYPES)
+	writers = {name: ColumnWriter(tmp_path / f"{name}.npy", dtype) for name, dtype in fixed.items()}
+	seen_tags = set()
+	target_names = {}
+	name_data = open(tmp_path / "query_name.data", 'wb')
+	name_offsets = [np.zeros(1, dtype=np.int64)]
+	name_end = 0
+	tuple_writers = {tag: (open(tmp_path / f"{tag}.values", 'wb'), ColumnWriter(tmp_path / f"{tag}.present.npy", bool)) for tag in TUPLE_TAGS}
+	tuple_offsets = {tag: [np.zeros(1, dtype=np.int64)] for tag in TUPLE_TAGS}
+	tuple_ends = {tag: 0 for tag in TUPLE_TAGS}
+
+	base = 0
+	for data in iter_paf_blocks(paf_path):
+		cols = parse_paf_block(data, tags=tuple(TAG_TYPES), names=True, fields=MANDATORY_FIELDS[1:])
+		writers['offset'].append(line_offsets(data, base))
+		base += len(data)
+		for name in ('mapped', 'annotation', 'strand') + NUMERIC_FIELDS:
+			writers[name].append(cols[name])
+		for tag, dtype in TAG_TYPES.items():
+			values = cols[tag]
+			if np.issubdtype(np.dtype(dtype), np.integer) and (values != MISSING_INT).any() or not np.issubdtype(np.dtype(dtype), np.integer) and not np.isnan(values).all():
+				seen_tags.add(tag)
+			writers[tag].append(values)
+		writers['target_name'].append([target_names.setdefault(t, len(target_names)) for t in cols['target_name'].tolist()])
+
+		names = cols['read_name'].tolist()
+		name_data.write(b''.join(names))
+		lengths = np.fromiter((len(n) for n in names), dtype=np.int64, count=len(names))
+		name_offsets.append(name_end + np.cumsum(lengths))
+		name_end += int(lengths.sum())
+
+		for tag, width in TUPLE_TAGS.items():
+			present, counts, values = tuple_tag_values(data, tag, width)
+			values_file, present_writer = tuple_writers[tag]
+			values_file.write(values.tobytes())
+			present_writer.append(present)
+			tuple_offsets[tag].append(tuple_ends[tag] + np.cumsum(counts))
+			tuple_ends[tag] += int(counts.sum())
+
+	name_data.close()
+	np.save(tmp_path / "query_name.offsets.npy", np.concatenate(name_offsets))
+	for name, writer in writers.items():
+		writer.close()
+		if name in TAG_TYPES and name not in seen_tags:
+			os.remove(tmp_path / f"{name}.npy")
+	table = list(target_names)
+	np.save(tmp_path / "target_names.npy", np.array(table, dtype=bytes) if table else np.zeros(0, dtype='S1'))
+	stored_tuple_tags = []
+	for tag, (values_file, present_writer) in tuple_writers.items():
+		values_file.close()
+		present_writer.close()
+		if tuple_ends[tag] == 0 and not np.load(tmp_path / f"{tag}.present.npy").any():
+			for suffix in (".values", ".present.npy"):
+				os.remove(tmp_path / f"{tag}{suffix}")
+			continue
+		np.save(tmp_path / f"{tag}.offsets.npy", np.concatenate(tuple_offsets[tag]))
+		stored_tuple_tags.append(tag)
+
+	meta = dict(stamp, n=writers['offset'].n, tags=sorted(seen_tags), tuple_tags=stored_tuple_tags)
+	with open(tmp_path / "meta.json", 'w') as f:
+		json.dump(meta, f)
+	shutil.rmtree(cache_path, ignore_errors=True)
+	os.replace(tmp_path, cache_path)
+	return cache_path
+
+
+class PafColumnCache:
+	#memory-mapped columns of a PAF file, see build_cache
+	def __init__(self, cache_path):
+		self.path = Path(cache_path)
+		with open(self.path / "meta.json") as f:
+			self.meta = json.load(f)
+		self.n = self.meta['n']
+		self.tags = set(self.meta['tags'])
+		self._columns = {}
+
+	def column(self, name):
+		if name not in self._columns:
+			self._columns[name] = np.load(self.path / f"{name}.npy", mmap_mode='r')
+		return self._columns[name]
+
+	def has_tags(self, tags):
+		#tags that are not stored are either missing in all records (TAG_TYPES) or unknown to the cache
+		return all(tag in TAG_TYPES for tag in tags)
+
+	def rows(self, start=0, end=None):
+		#records that start in the byte range [start, end), as iter_paf_blocks assigns them
+		offsets = self.column('offset')
+		first = int(np.searchsorted(offsets, start, side='left')) if start > 0 else 0
+		last = self.n if end is None else int(np.searchsorted(offsets, end, side='left'))
+		return first, last
+
+	def read_names(self, first, last):
+		offsets = self.column('query_name.offsets')[first:last + 1]
+		if last <= first:
+			return np.empty(0, dtype=object)
+		data = np.memmap(self.path / "query_name.data", dtype=np.uint8, mode='r')[offsets[0]:offsets[-1]].tobytes()
+		bounds = (offsets - offsets[0]).tolist()
+		return np.array([data[s:e] for s, e in zip(bounds[:-1], bounds[1:])] + [b''], dtype=object)[:-1]
+
+	def tuples(self, tag, i):
+		#(tuples x width) float64 array of the tag of record i, None if the record does not have the tag
+		if not self.column(f"{tag}.present")[i]:
+			return None
+		offsets = self.column(f"{tag}.offsets")
+		values = np.memmap(self.path / f"{tag}.values", dtype=np.float64, mode='r') if offsets[-1] > 0 else np.zeros(0)
+		return np.asarray(values.reshape(-1, TUPLE_TAGS[tag])[offsets[i]:offsets[i + 1]])
+
+	def columns(self, first, last, tags=tuple(TAG_TYPES), names=False, fields=()):
+		#the same dict of columns as parse_paf_block for the records [first, last)
+		cols = {name: np.asarray(self.column(name)[first:last]) for name in ('query_length', 'mapped', 'annotation')}
+		for tag in tags:
+			if tag in self.tags:
+				cols[tag] = np.asarray(self.column(tag)[first:last])
+			elif np.issubdtype(np.dtype(TAG_TYPES[tag]), np.integer):
+				cols[tag] = np.full(last - first, MISSING_INT, dtype=TAG_TYPES[tag])
+			else:
+				cols[tag] = np.full(last - first, np.nan, dtype=TAG_TYPES[tag])
+		if names:
+			cols['read_name'] = self.read_names(first, last)
+		for field in fields:
+			if field == 'target_name':
+				table = self.column('target_names').astype(object)
+				cols[field] = table[np.asarray(self.column('target_name')[first:last])] if len(table) else np.full(last - first, b'', dtype=object)
+			elif field == 'strand':
+				cols[field] = np.asarray(self.column('strand')[first:last]).astype(object)
+			elif field == 'query_name':
+				cols[field] = self.read_names(first, last)
+			else:
+				cols[field] = np.asarray(self.column(field)[first:last])
+		return cols
+
+	def iter_columns(self, tags=tuple(TAG_TYPES), names=False, start=0, end=None, fields=()):
+		first, last = self.rows(start, end)
+		for block_start in range(first, last, CACHE_BLOCK_ROWS):
+			yield self.columns(block_start, min(block_start + CACHE_BLOCK_ROWS, last), tags, names, fields)
+
+
+def load_cache(paf_path):
+	#the cache of the PAF file, None if there is none or if it was built from an older version of the file
+	cache_path = get_cache_path(paf_path)
+	try:
+		with open(cache_path / "meta.json") as f:
+			meta = json.load(f)
+		if any(meta.get(key) != value for key, value in get_stamp(paf_path).items()):
+			return None
+		return PafColumnCache(cache_path)
+	except (OSError, ValueError, KeyError):
+		return None
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Write the columnar cache (<PAF>.cols/) of PAF files, which is memory-mapped by the analysis scripts instead of parsing the text')
+	parser.add_argument('pafs', metavar='PAF', type=str, nargs='+', help='(annotated) PAF files')
+	parser.add_argument('-f', '--force', action='store_true', help='rebuild caches that are up to date')
+	args = parser.parse_args()
+
+	for paf in map(Path, args.pafs):
+		if not paf.is_file():
+			print("PAF file " + str(paf) + " does not exist")
+			sys.exit(1)
+	for paf in map(Path, args.pafs):
+		if not args.force and load_cache(paf) is not None:
+			continue
+		print(f"Caching {paf}")
+		build_cache(paf)
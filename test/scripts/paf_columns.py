@@ -0,0 +1,318 @@
+import os
+import numpy as np
+
+#columnar PAF reader: every block of lines is tokenized once with numpy and
+#the optional SAM-like tags (e.g., mt:f:12.5) are decoded by name into typed arrays
+
+#annotation classes appended by the truth annotator as the last tag of a line (e.g., rf:Z:tp)
+ANNOTATION_CLASSES = ('tp', 'fp', 'fn', 'tn', 'na')
+TP, FP, FN, TN, NA = range(len(ANNOTATION_CLASSES))
+UNANNOTATED = len(ANNOTATION_CLASSES)
+
+#tags emitted by rawalign/rawhash/sigmap/uncalled and the dtype they are decoded into
+TAG_TYPES = {
+	'mt': np.float64, #mapping time (ms)
+	'ci': np.int64,   #number of chunks processed
+	'sl': np.int64,   #signal length
+	'cm': np.int64,   #number of anchors in the best chain
+	'nc': np.int64,   #number of chains
+	's1': np.float64, #best chaining score
+	's2': np.float64, #second best chaining score
+	'sm': np.float64, #mean chaining score
+	'at': np.float64,
+	'aq': np.float64,
+	'ch': np.int64,   #uncalled channel
+	'st': np.int64,   #uncalled start sample
+}
+#the 12 mandatory PAF columns, text columns are decoded into bytes objects and the others into int64
+MANDATORY_FIELDS = ('query_name', 'query_length', 'query_start', 'query_end', 'strand',
+	'target_name', 'target_length', 'target_start', 'target_end', 'residue_matches', 'block_length', 'mapq')
+TEXT_FIELDS = ('query_name', 'strand', 'target_name')
+
+MISSING_INT = -1
+MISSING_FLOAT = np.nan
+
+DEFAULT_BLOCK_SIZE = 1 << 23
+
+_NEWLINE = ord('\n')
+_TAB = ord('\t')
+_COLON = ord(':')
+_STAR = ord('*')
+_DOT = ord('.')
+_MINUS = ord('-')
+_PLUS = ord('+')
+_ZERO = ord('0')
+_NUM_MANDATORY_FIELDS = 12
+_MAX_EXACT_MANTISSA = 1 << 53
+_MAX_EXACT_POW10 = 22
+_POW10 = 10.0 ** np.arange(_MAX_EXACT_POW10 + 1)
+_MAX_FAST_WIDTH = 18 #at most 18 digits, so that the int64 mantissa cannot overflow
+_PADDING = _MAX_FAST_WIDTH + 8
+
+
+def _tag_code(name):
+	name = name.encode() if isinstance(name, str) else name
+	return (name[0] << 8) | name[1]
+
+_ANNOTATION_CODES = {_tag_code(c): i for i, c in enumerate(ANNOTATION_CLASSES)}
+
+
+def iter_paf_blocks(paf_path, start=0, end=None, block_size=DEFAULT_BLOCK_SIZE):
+	#yields chunks of the file that end at line boundaries
+	#a byte range [start, end) owns exactly the lines that start inside it,
+	#so consecutive ranges partition the file without splitting or repeating lines
+	if end is None:
+		end = os.path.getsize(paf_path)
+	with open(paf_path, 'rb') as f:
+		if start > 0:
+			f.seek(start - 1)
+			f.readline() #skip the line owned by the previous range
+		pos = f.tell()
+		while pos < end:
+			data = f.read(min(block_size, end - pos))
+			if not data:
+				break
+			pos += len(data)
+			if not data.endswith(b'\n'):
+				tail = f.readline() #complete the last line, even if it extends past end
+				pos += len(tail)
+				data += tail
+			yield data
+
+
+def split_paf_file(paf_path, shard_size):
+	#byte ranges [start, end) of roughly shard_size bytes that together cover the file
+	#each range is read with iter_paf_blocks, which aligns it to line boundaries
+	size = os.path.getsize(paf_path)
+	if shard_size <= 0 or size <= shard_size:
+		return [(0, size)]
+	bounds = list(range(0, size, shard_size)) + [size]
+	return list(zip(bounds[:-1], bounds[1:]))
+
+
+def parse_decimals(buf, starts, ends):
+	#vectorized float parsing of the byte spans [start, end) in buf (buf must be padded past the last span)
+	#plain decimals with up to 15 significant digits are parsed as mantissa / 10^k,
+	#which is correctly rounded and therefore identical to float();
+	#everything else (exponents, inf, nan, long mantissas) falls back to float()
+	n = len(starts)
+	res = np.empty(n, dtype=np.float64)
+	if n == 0:
+		return res
+
+	first = buf[starts]
+	negative = first == _MINUS
+	digit_starts = starts + (negative | (first == _PLUS))
+	lengths = ends - digit_starts
+	width = min(int(lengths.max()), _MAX_FAST_WIDTH)
+
+	fast = (lengths > 0) & (lengths <= _MAX_FAST_WIDTH)
+	mantissa = np.zeros(n, dtype=np.int64)
+	frac_digits = np.zeros(n, dtype=np.int64)
+	seen_dot = np.zeros(n, dtype=bool)
+	for k in range(width):
+		c = buf[digit_starts + k]
+		inside = k < lengths
+		digit = c - np.uint8(_ZERO) #wraps around for chars below '0'
+		is_digit = (digit <= 9) & inside
+		is_dot = (c == _DOT) & inside
+		fast &= is_digit | is_dot | ~inside
+		fast &= ~(is_dot & seen_dot)
+		mantissa = np.where(is_digit, mantissa * 10 + digit, mantissa)
+		frac_digits += is_digit & seen_dot
+		seen_dot |= is_dot
+	fast &= (lengths > seen_dot) & (mantissa < _MAX_EXACT_MANTISSA) & (frac_digits <= _MAX_EXACT_POW10)
+
+	res[fast] = mantissa[fast] / _POW10[frac_digits[fast]]
+	res[negative & fast] *= -1
+
+	for i in np.flatnonzero(~fast):
+		try:
+			res[i] = float(buf[starts[i]:ends[i]].tobytes())
+		except ValueError:
+			res[i] = np.nan
+	return res
+
+
+def _empty_column(tag, n):
+	dtype = TAG_TYPES.get(tag, np.float64)
+	if np.issubdtype(dtype, np.integer):
+		return np.full(n, MISSING_INT, dtype=dtype)
+	return np.full(n, MISSING_FLOAT, dtype=dtype)
+
+
+def _parse_ints(buf, starts, ends, n_lines, has):
+	#integer column of n_lines, missing (or non-numeric, e.g., '*') values are MISSING_INT
+	values = parse_decimals(buf, starts, ends)
+	col = np.full(n_lines, MISSING_INT, dtype=np.int64)
+	col[np.flatnonzero(has)[np.isfinite(values)]] = values[np.isfinite(values)]
+	return col
+
+
+def _empty_columns(tags, names, fields):
+	cols = {
+		'query_length': np.empty(0, dtype=np.int64),
+		'mapped': np.empty(0, dtype=bool),
+		'annotation': np.empty(0, dtype=np.uint8),
+	}
+	for tag in tags:
+		cols[tag] = _empty_column(tag, 0)
+	if names:
+		cols['read_name'] = np.empty(0, dtype=object)
+	for field in fields:
+		cols[field] = np.empty(0, dtype=object if field in TEXT_FIELDS else np.int64)
+	return cols
+
+
+def _match_tag(buf, delims, line_first, n_fields, name, lines, field):
+	#checks which of the given lines hold the tag in the given field
+	#returns the field's leading tab in delims and the mask of matching lines
+	has_field = n_fields[lines] > field
+	k = line_first[lines] + np.where(has_field, field - 1, 0)
+	starts = delims[k] + 1
+	is_tag = has_field & (buf[starts] == name[0]) & (buf[starts + 1] == name[1])
+	is_tag &= (buf[starts + 2] == _COLON) & (buf[starts + 4] == _COLON)
+	return k, is_tag
+
+
+def _find_tag(buf, delims, line_first, n_fields, code):
+	#locates the optional tag XX:T:value with the given name in every line and
+	#returns the lines that have it and the index of the tag's leading tab in delims
+	#tools write their tags in a fixed order, so the field that holds the tag in the first line
+	#is checked for all lines at once and only the remaining lines are searched field by field
+	name = (code >> 8, code & 0xff)
+	fields = list(range(_NUM_MANDATORY_FIELDS, int(n_fields.max())))
+	for field in fields[:int(n_fields[0]) - _NUM_MANDATORY_FIELDS]:
+		if _match_tag(buf, delims, line_first, n_fields, name, np.arange(1), field)[1][0]:
+			fields.remove(field)
+			fields.insert(0, field)
+			break
+
+	lines = np.flatnonzero(n_fields > _NUM_MANDATORY_FIELDS)
+	found_lines = []
+	found_delims = []
+	for field in fields:
+		if len(lines) == 0:
+			break
+		k, is_tag = _match_tag(buf, delims, line_first, n_fields, name, lines, field)
+		found_lines.append(lines[is_tag])
+		found_delims.append(k[is_tag])
+		lines = lines[~is_tag]
+	if not found_lines:
+		return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+	return np.concatenate(found_lines), np.concatenate(found_delims)
+
+
+def parse_paf_block(data, tags=tuple(TAG_TYPES), names=False, fields=()):
+	#tokenizes a block of complete PAF lines once and returns a dict of column arrays:
+	#  query_length (col 2), mapped (col 3 != '*'), annotation (class code of the last field),
+	#  one array per requested tag (missing tags are -1 for ints and nan for floats),
+	#  read_name (col 1) if names=True, and any of the MANDATORY_FIELDS listed in fields
+	#only the tab and newline offsets are materialized; fields are addressed as spans between them
+	if len(data) == 0:
+		return _empty_columns(tags, names, fields)
+	#terminate the last line and pad, so that fixed offsets past a field start never go out of bounds
+	buf = np.frombuffer(data, dtype=np.uint8)
+	terminator = [] if buf[-1] == _NEWLINE else [_NEWLINE]
+	buf = np.concatenate((buf, np.array(terminator + [0]*_PADDING, dtype=np.uint8)))
+
+	#tab (9) and newline (10) are the only bytes below 11 in PAF text, so one comparison finds both
+	delims = np.flatnonzero(buf[:len(data) + len(terminator)] <= _NEWLINE)
+	is_newline = buf[delims] == _NEWLINE
+	line_last = np.flatnonzero(is_newline) #index of each line's newline in delims
+	line_first = np.empty_like(line_last) #index of each line's first delimiter in delims
+	line_first[0] = 0
+	line_first[1:] = line_last[:-1] + 1
+	line_starts = np.empty_like(line_last)
+	line_starts[0] = 0
+	line_starts[1:] = delims[line_last[:-1]] + 1
+
+	#skip blank lines
+	nonblank = delims[line_last] > line_starts
+	if not nonblank.all():
+		line_starts = line_starts[nonblank]
+		line_first = line_first[nonblank]
+		line_last = line_last[nonblank]
+	n_lines = len(line_starts)
+	if n_lines == 0:
+		return _empty_columns(tags, names, fields)
+	n_fields = line_last - line_first + 1
+
+	def field_span(field):
+		#start and end offsets of the given field (0-based) of all lines that have it
+		has = n_fields > field
+		k = line_first[has] + field
+		if field == 0:
+			return has, line_starts[has], delims[k]
+		return has, delims[k - 1] + 1, delims[k]
+
+	cols = {}
+	has, starts, ends = field_span(1)
+	cols['query_length'] = _parse_ints(buf, starts, ends, n_lines, has)
+
+	has, starts, ends = field_span(2)
+	mapped = np.zeros(n_lines, dtype=bool)
+	mapped[has] = ~((ends - starts == 1) & (buf[starts] == _STAR))
+	cols['mapped'] = mapped
+
+	#annotation is the value of the last field if it looks like XX:Z:cls
+	last_starts = np.where(n_fields > 1, delims[line_last - 1] + 1, line_starts)
+	is_annotation = (delims[line_last] - last_starts == 7) & (n_fields > 1)
+	is_annotation &= (buf[last_starts + 2] == _COLON) & (buf[last_starts + 4] == _COLON)
+	class_codes = (buf[last_starts + 5].astype(np.int64) << 8) | buf[last_starts + 6]
+	annotation = np.full(n_lines, UNANNOTATED, dtype=np.uint8)
+	for code, cls in _ANNOTATION_CODES.items():
+		annotation[is_annotation & (class_codes == code)] = cls
+	cols['annotation'] = annotation
+
+	for tag in tags:
+		lines, k = _find_tag(buf, delims, line_first, n_fields, _tag_code(tag))
+		col = _empty_column(tag, n_lines)
+		col[lines] = parse_decimals(buf, delims[k] + 6, delims[k + 1]) #skip "\tXX:T:"
+		cols[tag] = col
+
+	if names:
+		_, starts, ends = field_span(0)
+		cols['read_name'] = np.array([data[s:e] for s, e in zip(starts.tolist(), ends.tolist())], dtype=object)
+
+	for field in fields:
+		has, starts, ends = field_span(MANDATORY_FIELDS.index(field))
+		if field in TEXT_FIELDS:
+			col = np.full(n_lines, b'', dtype=object)
+			col[has] = [data[s:e] for s, e in zip(starts.tolist(), ends.tolist())]
+		else:
+			col = _parse_ints(buf, starts, ends, n_lines, has)
+		cols[field] = col
+
+	return cols
+
+
+def iter_paf_columns(paf_path, tags=tuple(TAG_TYPES), names=False, start=0, end=None, block_size=DEFAULT_BLOCK_SIZE, fields=(), use_cache=True):
+	#the columns are memory-mapped from the cache of paf_cache.py if it is up to date and stores all requested tags
+	if use_cache:
+		from paf_cache import load_cache
+		cache = load_cache(paf_path)
+		if cache is not None and cache.has_tags(tags):
+			yield from cache.iter_columns(tags, names, start, end, fields)
+			return
+	for data in iter_paf_blocks(paf_path, start, end, block_size):
+		yield parse_paf_block(data, tags, names, fields)
+
+
+def concatenate_columns(blocks):
+	blocks = list(blocks)
+	if not blocks:
+		return {}
+	return {key: np.concatenate([b[key] for b in blocks]) for key in blocks[0]}
+
+
+def read_paf_columns(paf_path, tags=tuple(TAG_TYPES), names=False, start=0, end=None, block_size=DEFAULT_BLOCK_SIZE, fields=(), use_cache=True):
+	return concatenate_columns(iter_paf_columns(paf_path, tags, names, start, end, block_size, fields, use_cache))
+
+
+def bp_per_sec(cols):
+	#"BP per sec" of uncalled pafstats: the bases of a mapped read up to the end of its mapping (query_end)
+	#per second of mapping time, for the mapped records with a time (mt > 0)
+	#the columns need the mt tag and the query_end field
+	timed = cols['mapped'] & (cols['mt'] > 0)
+	return cols['query_end'][timed] * 1000 / cols['mt'][timed]
@@ -0,0 +1,231 @@
+import numpy as np
+
+#mergeable accumulators for the per-read statistics reported by compare_pafs.py
+#sums of integers are kept exactly as Python ints and sums of floats in float64,
+#so float means can differ from statistics.mean in the last digits (relative error ~1e-15)
+
+
+def _bin_counts(values, counts, edges):
+	#number of values v with edges[i] <= v < edges[i+1], values are weighted by counts
+	bins = np.searchsorted(edges, values, side='right') - 1
+	inside = (bins >= 0) & (bins < len(edges) - 1)
+	return np.bincount(bins[inside], weights=counts[inside], minlength=len(edges) - 1).astype(np.int64)
+
+
+def _convert_mean(total, n, is_integral):
+	#as statistics.mean, integer data keeps an int mean when it is integral
+	#(int / int is correctly rounded, so integer means are identical to statistics.mean)
+	if is_integral and total % n == 0:
+		return total // n
+	return total / n
+
+
+class MeanStat:
+	#running count and sum
+	def __init__(self):
+		self.n = 0
+		self.total = 0
+		self.is_integral = True
+
+	def add(self, values):
+		if len(values) == 0:
+			return
+		self.n += len(values)
+		is_integral = bool(np.issubdtype(values.dtype, np.integer))
+		self.total += int(values.sum(dtype=np.int64)) if is_integral else float(values.sum(dtype=np.float64))
+		self.is_integral &= is_integral
+
+	def merge(self, other):
+		self.n += other.n
+		self.total += other.total
+		self.is_integral &= other.is_integral
+		return self
+
+	def mean(self):
+		if self.n == 0:
+			return float('inf')
+		return _convert_mean(self.total, self.n, self.is_integral)
+
+
+class DistributionStat(MeanStat):
+	#MeanStat that also keeps the values, for order statistics
+	def __init__(self):
+		super().__init__()
+		self.blocks = []
+
+	def add(self, values):
+		if len(values) == 0:
+			return
+		super().add(values)
+		self.blocks.append(np.asarray(values))
+
+	def merge(self, other):
+		super().merge(other)
+		self.blocks.extend(other.blocks)
+		return self
+
+	def values(self):
+		if len(self.blocks) != 1:
+			self.blocks = [np.concatenate(self.blocks)] if self.blocks else [np.empty(0)]
+		return self.blocks[0]
+
+	def median(self):
+		#same definition as statistics.median (mean of the two middle elements for even n)
+		if self.n == 0:
+			return float('inf')
+		values = self.values()
+		mid = self.n // 2
+		if self.n % 2 == 1:
+			return np.partition(values, mid)[mid].item()
+		lower, upper = np.partition(values, [mid - 1, mid])[mid - 1:mid + 1].tolist()
+		return (lower + upper) / 2
+
+	def quantile(self, q):
+		#linearly interpolated quantile, as numpy.quantile
+		if self.n == 0:
+			return float('inf')
+		return np.quantile(self.values(), q).item()
+
+	def fraction_above(self, threshold):
+		if self.n == 0:
+			return 0.0
+		return np.count_nonzero(self.values() > threshold) / self.n
+
+	def histogram(self, edges):
+		values = self.values()
+		return _bin_counts(values, np.ones(len(values), dtype=np.int64), edges)
+
+
+class _BucketCounts:
+	#counts of consecutive integer bucket indices, grown on demand
+	def __init__(self):
+		self.offset = 0
+		self.counts = np.zeros(0, dtype=np.int64)
+
+	def add(self, indices):
+		if len(indices) == 0:
+			return
+		self._add_counts(int(indices.min()), np.bincount(indices - indices.min()))
+
+	def _add_counts(self, offset, counts):
+		if len(counts) == 0:
+			return
+		if len(self.counts) == 0:
+			self.offset, self.counts = offset, counts.astype(np.int64)
+			return
+		low = min(self.offset, offset)
+		high = max(self.offset + len(self.counts), offset + len(counts))
+		merged = np.zeros(high - low, dtype=np.int64)
+		merged[self.offset - low:self.offset - low + len(self.counts)] += self.counts
+		merged[offset - low:offset - low + len(counts)] += counts
+		self.offset, self.counts = low, merged
+
+	def merge(self, other):
+		self._add_counts(other.offset, other.counts)
+
+
+class QuantileSketch:
+	#mergeable log-bucket histogram (as in DDSketch)
+	#bucket i holds the values in (gamma^(i-1), gamma^i], so every quantile is reported
+	#with a relative error of at most relative_accuracy
+	#memory depends on the range of the values (e.g., ~1400 buckets for 1e-6 to 1e6 at 1%), not on their number
+	def __init__(self, relative_accuracy=0.01):
+		self.relative_accuracy = relative_accuracy
+		self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+		self.log_gamma = np.log(self.gamma)
+		self.n = 0
+		self.zero_count = 0
+		self.positive = _BucketCounts()
+		self.negative = _BucketCounts()
+
+	def _bucket(self, values):
+		return np.ceil(np.log(values) / self.log_gamma).astype(np.int64)
+
+	def _value(self, bucket):
+		return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+	def add(self, values):
+		#non-finite values are not sketched
+		values = np.asarray(values, dtype=np.float64)
+		values = values[np.isfinite(values)]
+		if len(values) == 0:
+			return
+		self.n += len(values)
+		is_zero = np.abs(values) < np.finfo(np.float64).tiny
+		self.zero_count += int(is_zero.sum())
+		self.positive.add(self._bucket(values[(values > 0) & ~is_zero]))
+		self.negative.add(self._bucket(-values[(values < 0) & ~is_zero]))
+
+	def merge(self, other):
+		assert self.relative_accuracy == other.relative_accuracy
+		self.n += other.n
+		self.zero_count += other.zero_count
+		self.positive.merge(other.positive)
+		self.negative.merge(other.negative)
+		return self
+
+	def quantile(self, q):
+		if self.n == 0:
+			return float('inf')
+		rank = q * (self.n - 1)
+		#negative buckets from the most negative value upwards
+		negative_counts = self.negative.counts[::-1]
+		cumulative = np.cumsum(negative_counts)
+		if len(cumulative) > 0 and cumulative[-1] > rank:
+			i = int(np.searchsorted(cumulative, rank, side='right'))
+			return -self._value(self.negative.offset + len(negative_counts) - 1 - i)
+		rank -= cumulative[-1] if len(cumulative) > 0 else 0
+		if self.zero_count > rank:
+			return 0.0
+		rank -= self.zero_count
+		cumulative = np.cumsum(self.positive.counts)
+		i = min(int(np.searchsorted(cumulative, rank, side='right')), len(cumulative) - 1)
+		return self._value(self.positive.offset + i)
+
+	def _buckets(self):
+		#representative value and count of every non-empty bucket
+		negative = -self._value(self.negative.offset + np.arange(len(self.negative.counts)))
+		positive = self._value(self.positive.offset + np.arange(len(self.positive.counts)))
+		values = np.concatenate((negative, [0.0], positive))
+		counts = np.concatenate((self.negative.counts, [self.zero_count], self.positive.counts))
+		return values, counts
+
+	def fraction_above(self, threshold):
+		#within the relative accuracy of threshold, values are counted by their bucket
+		if self.n == 0:
+			return 0.0
+		values, counts = self._buckets()
+		return int(counts[values > threshold].sum()) / self.n
+
+	def histogram(self, edges):
+		return _bin_counts(*self._buckets(), edges)
+
+
+class StreamingStat(MeanStat):
+	#MeanStat with a quantile sketch instead of the values, for constant memory
+	def __init__(self, relative_accuracy=0.01):
+		super().__init__()
+		self.sketch = QuantileSketch(relative_accuracy)
+
+	def add(self, values):
+		if len(values) == 0:
+			return
+		super().add(values)
+		self.sketch.add(values)
+
+	def merge(self, other):
+		super().merge(other)
+		self.sketch.merge(other.sketch)
+		return self
+
+	def quantile(self, q):
+		return self.sketch.quantile(q)
+
+	def median(self):
+		return self.quantile(0.5)
+
+	def fraction_above(self, threshold):
+		return self.sketch.fraction_above(threshold)
+
+	def histogram(self, edges):
+		return self.sketch.histogram(edges)
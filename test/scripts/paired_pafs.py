@@ -0,0 +1,244 @@
+import math
+
+import numpy as np
+
+from paf_columns import read_paf_columns, ANNOTATION_CLASSES, TP, FP, FN, NA, UNANNOTATED, MISSING_INT
+from paf_stats import DistributionStat
+
+#read-by-read comparison of two annotated PAF files (e.g., before and after changing a DTW kernel or a preset):
+#the first record of each read is joined by read name, the speedup of a read is its processing time (mt) in the
+#first file over that in the second, and the difference of the times is tested with the Wilcoxon signed-rank test
+#the records of a file are deduplicated by read name, and the reads of the two files are joined by a 64-bit hash of
+#their names (FNV-1a, computed column by column over all names at once); the matches are verified on the names
+#themselves, so hash collisions can neither merge nor join different reads
+#the bootstrap resamples the reads within the strata of sample_reads.py (strata.tsv), as they were sampled:
+#per file for confidence intervals of precision, recall, F-1 score and mean BP per sec, and over the reads of both files
+#(the same resampled reads for both) for intervals of the difference of these metrics between two files
+
+CLASS_NAMES = ANNOTATION_CLASSES + ('none',) #annotation of a read, 'none' if it is not annotated
+FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+FNV_PRIME = np.uint64(0x100000001b3)
+REPORTED_SPEEDUP_PERCENTILES = (1, 10, 50, 90, 99)
+BOOTSTRAP_BATCH_SIZE = 1 << 24 #resampling weights held in memory at a time
+BOOTSTRAP_METRICS = ("precision", "recall", "F-1 score", "Mean BP per sec")
+
+
+def hash_names(names):
+	#FNV-1a hash of each name of a fixed-width bytes array, the padding of shorter names is skipped
+	n = len(names)
+	hashes = np.full(n, FNV_OFFSET, dtype=np.uint64)
+	if n == 0 or names.itemsize == 0:
+		return hashes
+	chars = np.ascontiguousarray(names).view(np.uint8).reshape(n, names.itemsize)
+	for j in range(names.itemsize):
+		c = chars[:, j]
+		if not c.any():
+			break
+		hashes = np.where(c != 0, (hashes ^ c.astype(np.uint64)) * FNV_PRIME, hashes)
+	return hashes
+
+
+class ReadTable:
+	#the first record of each read of a PAF file: name, hash, processing time (mt), chunks (ci), annotation and
+	#BP per sec (nan if the read is not mapped or has no time)
+	def __init__(self, paf_path):
+		cols = read_paf_columns(paf_path, tags=('mt', 'ci'), names=True, fields=('query_end',))
+		if not cols:
+			cols = {'read_name': np.empty(0, dtype=object), 'mt': np.empty(0), 'ci': np.empty(0, dtype=np.int64), 'annotation': np.empty(0, dtype=np.uint8),
+				'mapped': np.empty(0, dtype=bool), 'query_end': np.empty(0, dtype=np.int64)}
+		names = np.array(cols['read_name'].tolist(), dtype=bytes) if len(cols['read_name']) else np.empty(0, dtype='S1')
+		#np.unique returns the first occurrence of each name
+		_, first = np.unique(names, return_index=True)
+		self.n_records = len(names)
+		self.names = names[first]
+		self.hashes = hash_names(self.names)
+		self.time = cols['mt'][first]
+		self.chunks = cols['ci'][first]
+		self.annotation = cols['annotation'][first]
+		timed = cols['mapped'][first] & (self.time > 0)
+		self.bp_per_sec = np.full(len(first), np.nan)
+		self.bp_per_sec[timed] = cols['query_end'][first][timed] * 1000 / self.time[timed]
+
+	def __len__(self):
+		return len(self.names)
+
+
+def join_reads(a, b):
+	#indices (into a and into b) of the reads that are in both tables, the hashes of b are sorted and searched
+	if len(a) == 0 or len(b) == 0:
+		return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+	order = np.argsort(b.hashes, kind='stable')
+	sorted_hashes = b.hashes[order]
+	first = np.searchsorted(sorted_hashes, a.hashes, side='left')
+	last = np.searchsorted(sorted_hashes, a.hashes, side='right')
+	in_b = np.full(len(a), -1, dtype=np.int64)
+	#the names of b with the same hash are checked one offset at a time, more than one only on a collision
+	for offset in range(int((last - first).max(initial=0))):
+		i = first + offset
+		unmatched = np.flatnonzero((i < last) & (in_b < 0))
+		candidates = order[i[unmatched]]
+		same = a.names[unmatched] == b.names[candidates]
+		in_b[unmatched[same]] = candidates[same]
+	in_a = np.flatnonzero(in_b >= 0)
+	return in_a, in_b[in_a]
+
+
+def load_strata(strata_path):
+	#read name => stratum, from the strata.tsv of sample_reads.py
+	strata = {}
+	with open(strata_path) as f:
+		for line in f:
+			name, _, stratum = line.rstrip('\n').partition('\t')
+			strata[name.encode()] = stratum
+	return strata
+
+
+def stratum_ids(names, strata=None):
+	#index of the stratum of each read, reads that are not in strata form a stratum of their own
+	if not strata or len(names) == 0:
+		return np.zeros(len(names), dtype=np.int64)
+	_, ids = np.unique(np.array([strata.get(name, '') for name in names.tolist()]), return_inverse=True)
+	return ids.reshape(-1)
+
+
+def iter_bootstrap_weights(stratum, n_resamples, rng):
+	#(resamples x reads) number of times each read is drawn, every stratum is resampled with replacement to its own size,
+	#a batch of resamples at a time
+	members = [np.flatnonzero(stratum == s) for s in np.unique(stratum).tolist()]
+	batch = max(BOOTSTRAP_BATCH_SIZE // max(len(stratum), 1), 1)
+	for start in range(0, n_resamples, batch):
+		size = min(batch, n_resamples - start)
+		weights = np.zeros((size, len(stratum)))
+		for m in members:
+			weights[:, m] = rng.multinomial(len(m), np.full(len(m), 1 / len(m)), size=size)
+		yield weights
+
+
+def weighted_metrics(weights, annotation, bp_per_sec):
+	#precision, recall, F-1 score and mean BP per sec of the reads weighted by each row of weights,
+	#counted as in compare_pafs.py (na as fp, reads that are not annotated are not counted)
+	tp = weights @ (annotation == TP)
+	fp = weights @ ((annotation == FP) | (annotation == NA))
+	fn = weights @ (annotation == FN)
+	timed = np.isfinite(bp_per_sec)
+	with np.errstate(invalid='ignore', divide='ignore'):
+		precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+		recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+		f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+		mean_bp_per_sec = weights[:, timed] @ bp_per_sec[timed] / (weights @ timed)
+	return np.stack((precision, recall, f1, mean_bp_per_sec))
+
+
+def bootstrap_metrics(stratum, reads, n_resamples, rng):
+	#(metrics x resamples) BOOTSTRAP_METRICS of each (annotation, bp_per_sec) of reads over the same stratified resamples
+	samples = [[] for _ in reads]
+	for weights in iter_bootstrap_weights(stratum, n_resamples, rng):
+		for s, (annotation, bp_per_sec) in zip(samples, reads):
+			s.append(weighted_metrics(weights, annotation, bp_per_sec))
+	return [np.concatenate(s, axis=1) if s else np.empty((len(BOOTSTRAP_METRICS), 0)) for s in samples]
+
+
+def print_intervals(label, samples, confidence):
+	level = f"{100 * confidence:g}%"
+	for name, metric in zip(BOOTSTRAP_METRICS, samples):
+		low, high = np.nanquantile(metric, [(1 - confidence) / 2, (1 + confidence) / 2]).tolist() if np.isfinite(metric).any() else (np.nan, np.nan)
+		print(f"{label} {name} {level} CI : {low} {high}")
+
+
+def bootstrap_pafs(names, paf_paths, n_resamples, confidence=0.95, seed=0, strata=None):
+	#percentile bootstrap intervals of every file and of the difference of every file to the first file (on the reads of both)
+	rng = np.random.default_rng(seed)
+	tables = [ReadTable(paf_path) for paf_path in paf_paths]
+	for name, table in zip(names, tables):
+		samples, = bootstrap_metrics(stratum_ids(table.names, strata), [(table.annotation, table.bp_per_sec)], n_resamples, rng)
+		print_intervals(name, samples, confidence)
+	a = tables[0]
+	for name, b in zip(names[1:], tables[1:]):
+		in_a, in_b = join_reads(a, b)
+		label = f"{name} - {names[0]}"
+		print(f"{label} Reads in both : {len(in_a)}")
+		samples_a, samples_b = bootstrap_metrics(stratum_ids(a.names[in_a], strata),
+			[(a.annotation[in_a], a.bp_per_sec[in_a]), (b.annotation[in_b], b.bp_per_sec[in_b])], n_resamples, rng)
+		print_intervals(label, samples_b - samples_a, confidence)
+	print("#Done with the bootstrap\n")
+
+
+def wilcoxon_signed_rank(differences):
+	#W+ statistic, z score and two-sided p-value (normal approximation with tie correction) of the
+	#Wilcoxon signed-rank test, zero differences are dropped
+	d = differences[differences != 0]
+	n = len(d)
+	if n == 0:
+		return 0.0, 0.0, 1.0
+	magnitudes = np.abs(d)
+	order = np.argsort(magnitudes, kind='stable')
+	_, inverse, counts = np.unique(magnitudes[order], return_inverse=True, return_counts=True)
+	#tied magnitudes get the mean of their ranks
+	last_rank = np.cumsum(counts)
+	mean_rank = last_rank - (counts - 1) / 2
+	ranks = np.empty(n)
+	ranks[order] = mean_rank[inverse.reshape(-1)]
+	w_plus = float(ranks[d > 0].sum())
+	mean = n * (n + 1) / 4
+	variance = n * (n + 1) * (2 * n + 1) / 24 - float((counts.astype(np.float64) ** 3 - counts).sum()) / 48
+	if variance <= 0:
+		return w_plus, 0.0, 1.0
+	z = (w_plus - mean) / math.sqrt(variance)
+	return w_plus, z, math.erfc(abs(z) / math.sqrt(2))
+
+
+def class_names(annotation):
+	return np.array(CLASS_NAMES, dtype=object)[np.minimum(annotation, UNANNOTATED)]
+
+
+def compare_paired(name_a, paf_a, name_b, paf_b, n_resamples=0, confidence=0.95, seed=0, flipped_path=None, strata=None):
+	a = ReadTable(paf_a)
+	b = ReadTable(paf_b)
+	in_a, in_b = join_reads(a, b)
+	label = f"{name_a} vs {name_b}"
+	print(f"{label} Reads : {name_a}: {len(a)} ({a.n_records} records), {name_b}: {len(b)} ({b.n_records} records), "
+		f"in both: {len(in_a)}, only in {name_a}: {len(a) - len(in_a)}, only in {name_b}: {len(b) - len(in_b)}")
+
+	time_a = a.time[in_a]
+	time_b = b.time[in_b]
+	timed = (time_a > 0) & (time_b > 0)
+	speedup = time_a[timed] / time_b[timed]
+	log_speedup = DistributionStat()
+	log_speedup.add(np.log(speedup))
+	print(f"{label} Timed reads : {len(speedup)}")
+	if len(speedup) > 0:
+		percentiles = ", ".join(f"P{p}: {v:.4g}" for p, v in zip(REPORTED_SPEEDUP_PERCENTILES, np.percentile(speedup, REPORTED_SPEEDUP_PERCENTILES).tolist()))
+		print(f"{label} Speedup per read ({name_a} time / {name_b} time) : geometric mean: {math.exp(log_speedup.mean()):.4g}, {percentiles}")
+		print(f"{label} Faster reads : {name_b}: {int(np.count_nonzero(speedup > 1))}, {name_a}: {int(np.count_nonzero(speedup < 1))}, "
+			f"same time: {int(np.count_nonzero(speedup == 1))}")
+		print(f"{label} Mean time per read : {name_a}: {time_a[timed].mean()}, {name_b}: {time_b[timed].mean()}")
+		w_plus, z, p = wilcoxon_signed_rank(time_a[timed] - time_b[timed])
+		print(f"{label} Wilcoxon signed-rank test : W+: {w_plus:g}, z: {z:.4f}, p-value: {p:.4g}")
+		if n_resamples > 0:
+			#paired bootstrap: the reads are resampled (within their strata) together with both of their times
+			stratum = stratum_ids(a.names[in_a[timed]], strata)
+			means = np.exp(np.concatenate([weights @ log_speedup.values() / len(speedup)
+				for weights in iter_bootstrap_weights(stratum, n_resamples, np.random.default_rng(seed))]))
+			low, high = np.quantile(means, [(1 - confidence) / 2, (1 + confidence) / 2]).tolist()
+			print(f"{label} Geometric mean speedup {100 * confidence:g}% CI : {low:.4g} {high:.4g}")
+
+	chunks = (a.chunks[in_a] != MISSING_INT) & (b.chunks[in_b] != MISSING_INT)
+	if chunks.any():
+		difference = b.chunks[in_b][chunks] - a.chunks[in_a][chunks]
+		print(f"{label} Chunks per read ({name_b} - {name_a}) : mean: {difference.mean():.4g}, fewer: {int(np.count_nonzero(difference < 0))}, "
+			f"more: {int(np.count_nonzero(difference > 0))}")
+
+	#reads whose annotation differs between the two files, counted by (class in a, class in b)
+	class_a = np.minimum(a.annotation[in_a], UNANNOTATED).astype(np.int64)
+	class_b = np.minimum(b.annotation[in_b], UNANNOTATED).astype(np.int64)
+	flipped = np.flatnonzero(class_a != class_b)
+	transitions = np.bincount(class_a[flipped] * len(CLASS_NAMES) + class_b[flipped], minlength=len(CLASS_NAMES) ** 2)
+	pairs = ", ".join(f"{CLASS_NAMES[t // len(CLASS_NAMES)]}->{CLASS_NAMES[t % len(CLASS_NAMES)]}: {int(transitions[t])}" for t in np.flatnonzero(transitions).tolist())
+	print(f"{label} Flipped reads : {len(flipped)}" + (f" ({pairs})" if pairs else ""))
+	if flipped_path is not None:
+		with open(flipped_path, 'w') as out:
+			out.write(f"read\t{name_a}_class\t{name_b}_class\t{name_a}_time\t{name_b}_time\n")
+			rows = zip(a.names[in_a[flipped]].tolist(), class_names(class_a[flipped]).tolist(), class_names(class_b[flipped]).tolist(),
+				time_a[flipped].tolist(), time_b[flipped].tolist())
+			out.write("".join(f"{r.decode()}\t{ca}\t{cb}\t{ta}\t{tb}\n" for r, ca, cb, ta, tb in rows))
+	print(f"#Done with {label}\n")
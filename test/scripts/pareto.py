@@ -0,0 +1,58 @@
+import numpy as np
+
+#non-dominated sorting, shared by tune_rawalign.py and paperplotscripts/pareto_frontier.py
+#the rank of a point is the index of its Pareto front (0 is the frontier), as in the repeated removal of the
+#non-dominated points (NSGA-II), larger values are better for all objectives
+#points are compared in blocks against all points that precede them in lexicographic order, as only these can
+#dominate them, so that tens of thousands of points are sorted in seconds and in bounded memory
+
+BLOCK_SIZE = 512 #points compared against each other at a time, small blocks stay in the cache
+
+
+def dominates(candidates, points):
+	#dominated[i, j]: candidate j is at least as good as point i in all objectives and better in one,
+	#candidates and points are (objectives x points) arrays
+	at_least = np.ones((points.shape[1], candidates.shape[1]), dtype=bool)
+	better = np.zeros((points.shape[1], candidates.shape[1]), dtype=bool)
+	for m in range(points.shape[0]):
+		at_least &= candidates[m][None, :] >= points[m][:, None]
+		better |= candidates[m][None, :] > points[m][:, None]
+	return at_least & better
+
+
+def pareto_ranks(points, block_size=BLOCK_SIZE):
+	#front index of each point (larger is better for all objectives), the length of the longest chain of points that
+	#dominate it, which equals the number of fronts that have to be removed before the point is non-dominated
+	points = np.asarray(points, dtype=np.float64)
+	n = len(points)
+	ranks = np.zeros(n, dtype=np.int64)
+	if n == 0:
+		return ranks
+	#only the order of the values matters, so they are replaced by their dense rank per objective in a small integer type,
+	#which makes the comparisons several times faster
+	dense = np.empty(points.shape, dtype=np.int16 if n < (1 << 15) else np.int32)
+	for m in range(points.shape[1]):
+		dense[:, m] = np.unique(points[:, m], return_inverse=True)[1].reshape(-1)
+	#a point can only be dominated by points that are lexicographically larger, i.e., that precede it in this order
+	order = np.lexsort(dense.T[::-1])[::-1]
+	sorted_points = np.ascontiguousarray(dense[order].T)
+	sorted_ranks = np.zeros(n, dtype=np.int32)
+	for start in range(0, n, block_size):
+		end = min(start + block_size, n)
+		block = sorted_points[:, start:end]
+		rank = np.zeros(end - start, dtype=np.int32)
+		for chunk_start in range(0, start, block_size):
+			chunk_end = min(chunk_start + block_size, start)
+			dominated = dominates(sorted_points[:, chunk_start:chunk_end], block)
+			rank = np.maximum(rank, np.max(dominated * (sorted_ranks[None, chunk_start:chunk_end] + 1), axis=1))
+		#within the block, ranks are propagated until they are stable (at most once per point of a dominance chain)
+		inner = dominates(block, block)
+		if inner.any():
+			while True:
+				updated = np.maximum(rank, np.max(inner * (rank[None, :] + 1), axis=1))
+				if np.array_equal(updated, rank):
+					break
+				rank = updated
+		sorted_ranks[start:end] = rank
+	ranks[order] = sorted_ranks
+	return ranks
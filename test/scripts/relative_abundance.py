@@ -0,0 +1,175 @@
+import sys
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from paf_columns import iter_paf_columns, MISSING_INT
+
+#estimates the relative abundance of the organisms of a mixed sample from PAF files in a single pass:
+#  a record counts towards an organism if it is mapped with a valid query range and its reference name starts
+#  with the organism's name (as the former awk script of 1_generate_results.sh),
+#  the ratio of reads is its share of the counted records and the ratio of bases its share of their mapped query bases
+#the ratios are tracked after every record, so that the Euclidean distance to the ratios of the reads themselves
+#(get_euclidean_distance of table_relative_abundance.py) is known as a function of the reads processed,
+#i.e., how early a Sequence Until run could have stopped with the final estimate
+
+DEFAULT_ORGANISMS = ('covid', 'ecoli', 'yeast', 'green_algae', 'human')
+DEFAULT_CURVE_STEP = 1000 #reads between two points of the convergence curve
+DEFAULT_TOLERANCE = 0.01
+RATIO_NAMES = ('read_ratio', 'bases_ratio')
+
+
+def format_number(value):
+	#as awk prints numbers (%.6g)
+	return f"{value:.6g}"
+
+
+def format_line(toolname, title, organisms, values):
+	return f"{toolname} {title}: " + " ".join(f"{o}: {format_number(v)}" for o, v in zip(organisms, values))
+
+
+def fasta_stats(fasta_path):
+	#number of reads and bases of a FASTA file, as seqkit stat
+	reads = bases = 0
+	with open(fasta_path, 'rb') as f:
+		for line in f:
+			if line.startswith(b'>'):
+				reads += 1
+			else:
+				bases += len(line.rstrip(b'\r\n'))
+	return reads, bases
+
+
+def ratios(counts):
+	#shares of the organisms, all zero as long as nothing is counted (also along the rows of 2D counts)
+	counts = np.asarray(counts, dtype=np.float64)
+	total = counts.sum(axis=-1, keepdims=True)
+	return np.divide(counts, total, out=np.zeros_like(counts), where=total > 0)
+
+
+class AbundanceEstimator:
+	def __init__(self, organisms, truth=None, curve_step=DEFAULT_CURVE_STEP, tolerance=DEFAULT_TOLERANCE):
+		self.organisms = list(organisms)
+		self.prefixes = [o.encode() for o in self.organisms]
+		self.reads = np.zeros(len(self.organisms), dtype=np.int64)
+		self.bases = np.zeros(len(self.organisms), dtype=np.int64)
+		self.n_records = 0
+		#truth is the (read ratio, bases ratio) of each organism, the distances are only tracked if it is given
+		self.truth = None if truth is None else (np.asarray(truth[0], dtype=np.float64), np.asarray(truth[1], dtype=np.float64))
+		self.curve_step = curve_step
+		self.tolerance = tolerance
+		self.curve = [] #(records processed, read ratio distance, bases ratio distance)
+		#last record after which each distance was at least the tolerance
+		self.last_above = [0, 0]
+
+	def organism_of(self, target_names):
+		#index of the organism of each reference name, -1 if none matches
+		targets, inverse = np.unique(target_names, return_inverse=True)
+		target_organisms = np.full(len(targets), -1, dtype=np.int64)
+		for i, target in enumerate(targets.tolist()):
+			for j, prefix in enumerate(self.prefixes):
+				if target.startswith(prefix):
+					target_organisms[i] = j
+					break
+		return target_organisms[inverse]
+
+	def add(self, cols):
+		n = len(cols['mapped'])
+		if n == 0:
+			return
+		organism = self.organism_of(cols['target_name'])
+		start, end = cols['query_start'], cols['query_end']
+		counted = cols['mapped'] & (start != MISSING_INT) & (end != MISSING_INT) & (end >= start) & (organism >= 0)
+		one_hot = np.zeros((n, len(self.organisms)), dtype=np.int64)
+		one_hot[np.flatnonzero(counted), organism[counted]] = 1
+		if self.truth is not None:
+			#counts after each record of the block
+			reads = self.reads + np.cumsum(one_hot, axis=0)
+			bases = self.bases + np.cumsum(one_hot * (end - start)[:, None], axis=0)
+			self.track(reads, bases)
+		self.reads += one_hot.sum(axis=0)
+		self.bases += (one_hot * (end - start)[:, None]).sum(axis=0)
+		self.n_records += n
+
+	def track(self, reads, bases):
+		processed = self.n_records + 1 + np.arange(len(reads))
+		distances = [np.sqrt(((ratios(counts) - truth) ** 2).sum(axis=1)) for counts, truth in zip((reads, bases), self.truth)]
+		for i, distance in enumerate(distances):
+			above = np.flatnonzero(distance >= self.tolerance)
+			if len(above) > 0:
+				self.last_above[i] = int(processed[above[-1]])
+		points = np.flatnonzero(processed % self.curve_step == 0)
+		self.curve.extend(zip(processed[points].tolist(), distances[0][points].tolist(), distances[1][points].tolist()))
+
+	def finish_curve(self):
+		#the last point is the final estimate
+		if self.truth is not None and self.n_records > 0 and (not self.curve or self.curve[-1][0] != self.n_records):
+			self.curve.append((self.n_records, *(np.sqrt(((ratios(counts) - truth) ** 2).sum()).item()
+				for counts, truth in zip((self.reads, self.bases), self.truth))))
+
+	def mapping_lengths(self):
+		return np.divide(self.bases, self.reads, out=np.zeros(len(self.organisms)), where=self.reads > 0)
+
+	def print_report(self, toolname, out):
+		out.write(format_line(toolname, "Ratio of bases", self.organisms, ratios(self.bases)) + "\n")
+		out.write(format_line(toolname, "Mapping lengths", self.organisms, self.mapping_lengths()) + "\n")
+		out.write(format_line(toolname, "Ratio of reads", self.organisms, ratios(self.reads)) + "\n")
+		if self.truth is not None:
+			out.write(f"{toolname} Reads until the distance stays below {self.tolerance:g}: "
+				+ " ".join(f"{name}: {last}" for name, last in zip(RATIO_NAMES, self.last_above)) + f" of {self.n_records}\n")
+
+	def write_curve(self, path):
+		with open(path, 'w') as out:
+			out.write("reads\t" + "\t".join(name + "_distance" for name in RATIO_NAMES) + "\n")
+			for processed, read_distance, bases_distance in self.curve:
+				out.write(f"{processed}\t{read_distance:.6g}\t{bases_distance:.6g}\n")
+
+
+def estimate_paf_file(paf_path, organisms, truth=None, curve_step=DEFAULT_CURVE_STEP, tolerance=DEFAULT_TOLERANCE):
+	estimator = AbundanceEstimator(organisms, truth, curve_step, tolerance)
+	for cols in iter_paf_columns(paf_path, tags=(), fields=('query_start', 'query_end', 'target_name')):
+		estimator.add(cols)
+	estimator.finish_curve()
+	return estimator
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Estimate the relative abundance of organisms from PAF files in a single pass, incl. its convergence to the true abundance')
+	parser.add_argument('pafs', metavar='PAF', type=str, nargs='+', help='PAF files (e.g., true_mappings.paf and the mapping output of each tool)')
+	parser.add_argument('--organisms', type=str, nargs='+', default=list(DEFAULT_ORGANISMS), help='organisms, a reference name belongs to the first organism that it starts with')
+	parser.add_argument('--reads', type=str, nargs='+', default=[], metavar='ORGANISM=FASTA', help='reads of each organism, their ratios are the true abundance (reported as the "fastq" tool)')
+	parser.add_argument('--prefix', type=str, default='', help='shared prefix that is removed from the tool names (e.g., relative_abundance_)')
+	parser.add_argument('--curve-dir', type=str, default=None, help='directory of the convergence curves (<tool>.convergence), requires --reads')
+	parser.add_argument('--curve-step', type=int, default=DEFAULT_CURVE_STEP, help='reads between two points of the convergence curves')
+	parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='distance to the true abundance that counts as converged')
+	args = parser.parse_args()
+
+	for paf in map(Path, args.pafs):
+		if not paf.is_file():
+			print("PAF file " + str(paf) + " does not exist")
+			sys.exit(1)
+
+	truth = None
+	if args.reads:
+		reads = dict(r.split('=', 1) for r in args.reads)
+		missing = [o for o in args.organisms if o not in reads]
+		if missing:
+			parser.error("--reads misses the organisms " + ", ".join(missing))
+		stats = np.array([fasta_stats(reads[o]) for o in args.organisms], dtype=np.int64).reshape(-1, 2)
+		truth = (ratios(stats[:, 0]), ratios(stats[:, 1]))
+		mean_lengths = np.divide(stats[:, 1], stats[:, 0], out=np.zeros(len(stats)), where=stats[:, 0] > 0)
+		sys.stdout.write(format_line("fastq", "Ratio of bases", args.organisms, truth[1]) + "\n")
+		sys.stdout.write(format_line("fastq", "Mapping lengths", args.organisms, mean_lengths) + "\n")
+		sys.stdout.write(format_line("fastq", "Ratio of reads", args.organisms, truth[0]) + "\n")
+	elif args.curve_dir is not None:
+		parser.error("--curve-dir requires --reads")
+
+	for paf in map(Path, args.pafs):
+		toolname = paf.name[:-len(".paf")] if paf.name.endswith(".paf") else paf.name
+		toolname = toolname[len(args.prefix):] if args.prefix and toolname.startswith(args.prefix) else toolname
+		estimator = estimate_paf_file(paf, args.organisms, truth, args.curve_step, args.tolerance)
+		estimator.print_report(toolname, sys.stdout)
+		if args.curve_dir is not None:
+			Path(args.curve_dir).mkdir(parents=True, exist_ok=True)
+			estimator.write_curve(Path(args.curve_dir) / f"{toolname}.convergence")
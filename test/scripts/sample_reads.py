@@ -0,0 +1,156 @@
+import sys
+import shutil
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from paf_columns import read_paf_columns
+
+#selects a stratified random subset of the reads of FAST5 files for quick evaluations:
+#  the reads are grouped by their truth class (whether true_mappings.paf maps them) and by read length
+#  (length quantiles of the reads with a truth record), and the same fraction of every stratum is sampled,
+#  so that precision, recall and throughput on the subset estimate those of all reads (see compare_pafs.py --bootstrap)
+#the stratum of each sampled read is written to strata.tsv, so that the bootstrap resamples every stratum on its own
+#reads without a record in the true mappings form a stratum of their own
+#multi-read files are rewritten with only the sampled reads, single-read files are copied
+#requires h5py to read and write the FAST5 files
+
+TRUTH_CLASSES = ('mapped', 'unmapped', 'no_truth')
+DEFAULT_READS_PER_FILE = 4000
+
+
+def fast5_reads(path, h5py):
+	#(read id, group name) of every read of a FAST5 file, group name is None for single-read files
+	with h5py.File(path, 'r') as f:
+		if 'Raw' in f:
+			return [(f['Raw/Reads'][name].attrs['read_id'].decode(), None) for name in f['Raw/Reads']]
+		return [(name[len('read_'):], name) for name in f if name.startswith('read_')]
+
+
+def load_truth(truth_path):
+	#read name => (read length, has a true mapping), a read is mapped if any of its records is mapped
+	cols = read_paf_columns(truth_path, tags=(), names=True)
+	truth = {}
+	if not cols:
+		return truth
+	for name, length, mapped in zip(cols['read_name'].tolist(), cols['query_length'].tolist(), cols['mapped'].tolist()):
+		name = name.decode() if isinstance(name, bytes) else name
+		_, was_mapped = truth.get(name, (length, False))
+		truth[name] = (length, was_mapped or mapped)
+	return truth
+
+
+def assign_strata(read_ids, truth, num_length_bins):
+	#stratum of each read: truth class * num_length_bins + length bin, reads without truth are in the last stratum
+	lengths = np.array([truth[r][0] if r in truth else -1 for r in read_ids], dtype=np.int64)
+	classes = np.array([(0 if truth[r][1] else 1) if r in truth else 2 for r in read_ids], dtype=np.int64)
+	has_truth = classes < 2
+	if has_truth.any():
+		edges = np.unique(np.quantile(lengths[has_truth], np.linspace(0, 1, num_length_bins + 1)[1:-1]))
+	else:
+		edges = np.zeros(0)
+	length_bins = np.searchsorted(edges, lengths, side='right')
+	strata = np.where(has_truth, classes * num_length_bins + length_bins, 2 * num_length_bins)
+	return strata, edges
+
+
+def stratum_name(stratum, edges, num_length_bins):
+	truth_class = TRUTH_CLASSES[min(stratum // num_length_bins, 2)]
+	if truth_class == 'no_truth':
+		return truth_class
+	length_bin = stratum % num_length_bins
+	low = int(edges[length_bin - 1]) if length_bin > 0 else 0
+	high = f"{int(edges[length_bin])}" if length_bin < len(edges) else "inf"
+	return f"{truth_class} [{low}, {high})"
+
+
+def stratified_sample(strata, fraction, rng):
+	#indices of the sampled reads, the same fraction of each stratum (at least one read per non-empty stratum)
+	selected = []
+	for stratum in np.unique(strata).tolist():
+		members = np.flatnonzero(strata == stratum)
+		size = min(max(int(round(fraction * len(members))), 1), len(members))
+		selected.append(rng.choice(members, size=size, replace=False))
+	return np.sort(np.concatenate(selected)) if selected else np.zeros(0, dtype=np.int64)
+
+
+def same_attrs(a, b):
+	return a.keys() == b.keys() and all(np.array_equal(a[key], b[key]) for key in a)
+
+
+def write_subset(reads, selected, out_dir, reads_per_file, h5py):
+	#copies the selected reads into out_dir, the raw signals are copied as they are (without decompressing them)
+	#single-read files are prefixed with their index, as files with the same name can be in different subdirectories,
+	#and the reads of a multi-read file are only added to an output file with the same root attributes (e.g., file_version)
+	out_dir.mkdir(parents=True, exist_ok=True)
+	out = None
+	out_attrs = None
+	n_files = n_reads = 0
+	by_file = {}
+	for i in selected.tolist():
+		path, _, group = reads[i]
+		by_file.setdefault(path, []).append(group)
+	for file_index, (path, groups) in enumerate(by_file.items()):
+		if groups[0] is None:
+			shutil.copyfile(path, out_dir / f"{file_index:06d}_{path.name}")
+			continue
+		with h5py.File(path, 'r') as f:
+			attrs = dict(f.attrs)
+			for group in groups:
+				if out is None or n_reads == reads_per_file or not same_attrs(attrs, out_attrs):
+					if out is not None:
+						out.close()
+					out = h5py.File(out_dir / f"subset_{n_files}.fast5", 'w')
+					for key, value in attrs.items():
+						out.attrs[key] = value
+					out_attrs = attrs
+					n_files += 1
+					n_reads = 0
+				f.copy(f[group], out, name=group)
+				n_reads += 1
+	if out is not None:
+		out.close()
+
+
+def sample(args):
+	import h5py
+	signals = Path(args.signals)
+	files = [signals] if signals.is_file() else sorted(signals.rglob('*.fast5'))
+	reads = [(path, read_id, group) for path in files for read_id, group in fast5_reads(path, h5py)]
+	read_ids = [read_id for _, read_id, _ in reads]
+	truth = load_truth(args.truth)
+	strata, edges = assign_strata(read_ids, truth, args.length_bins)
+	selected = stratified_sample(strata, args.fraction, np.random.default_rng(args.seed))
+
+	out_dir = Path(args.outdir)
+	write_subset(reads, selected, out_dir / "fast5_files", args.reads_per_file, h5py)
+	with open(out_dir / "read_ids.txt", 'w') as out:
+		out.write("".join(read_ids[i] + "\n" for i in selected.tolist()))
+	with open(out_dir / "strata.tsv", 'w') as out:
+		out.write("".join(f"{read_ids[i]}\t{stratum_name(strata[i], edges, args.length_bins)}\n" for i in selected.tolist()))
+	print(f"Sampled {len(selected)} of {len(reads)} reads from {len(files)} files")
+	for stratum in np.unique(strata).tolist():
+		print(f"{stratum_name(stratum, edges, args.length_bins)}: {int(np.count_nonzero(strata[selected] == stratum))} of {int(np.count_nonzero(strata == stratum))}")
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Sample a subset of the reads of FAST5 files, stratified by read length and truth class')
+	parser.add_argument('--signals', type=str, required=True, help='directory of the FAST5 files (or a single FAST5 file)')
+	parser.add_argument('--truth', type=str, required=True, help='PAF file of the true mappings (e.g., true_mappings.paf)')
+	parser.add_argument('--outdir', type=str, required=True, help='output directory of the sampled FAST5 files (fast5_files/), their read ids (read_ids.txt) and strata (strata.tsv)')
+	parser.add_argument('-f', '--fraction', type=float, default=0.05, help='fraction of the reads of each stratum that is sampled')
+	parser.add_argument('--length-bins', type=int, default=4, help='number of read length quantiles per truth class')
+	parser.add_argument('--reads-per-file', type=int, default=DEFAULT_READS_PER_FILE, help='reads per written multi-read FAST5 file')
+	parser.add_argument('--seed', type=int, default=0, help='seed of the sampling')
+	args = parser.parse_args()
+
+	if not 0 < args.fraction <= 1:
+		parser.error("--fraction has to be in (0, 1]")
+	if not Path(args.signals).exists():
+		print("Signal path " + args.signals + " does not exist")
+		sys.exit(1)
+	if not Path(args.truth).is_file():
+		print("PAF file " + args.truth + " does not exist")
+		sys.exit(1)
+	sample(args)
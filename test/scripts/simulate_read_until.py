@@ -0,0 +1,239 @@
+import sys
+import heapq
+import argparse
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from paf_columns import iter_paf_columns
+
+#discrete-event replay of the mapping decisions in a PAF file on a Read Until device:
+#  each channel sequences reads back to back and every chunk_size samples of a read arrive as a chunk,
+#  the chunks are mapped by a pool of threads in arrival order (chunks of a read one after another),
+#  each chunk takes mt / ci ms to map, and the decision is made after the ci-th chunk of the read,
+#  reads that are decided to be ejected stop sequencing at the decision and free their channel
+#reads are taken from the PAF in file order, whenever a channel becomes free
+
+REPORTED_PERCENTILES = (50, 90, 99, 99.9)
+
+_JOB_DONE, _READ_END, _CHUNK_ARRIVAL = range(3) #order of events that happen at the same time
+
+
+class DeviceModel:
+	def __init__(self, channels=512, sample_rate=4000, chunk_size=None, threads=1, bp_per_sec=450,
+			deadline=None, eject_delay=0.0, read_gap=0.0, time_scale=1.0):
+		self.channels = channels
+		self.sample_rate = sample_rate
+		self.chunk_size = chunk_size if chunk_size is not None else sample_rate #1 second of signal by default
+		self.threads = threads
+		self.bp_per_sec = bp_per_sec
+		self.chunk_duration = self.chunk_size / sample_rate
+		#a decision is late if it is made more than deadline seconds after its last chunk arrived
+		self.deadline = deadline if deadline is not None else self.chunk_duration
+		self.eject_delay = eject_delay #s until an ejection takes effect
+		self.read_gap = read_gap #s between two reads on a channel
+		self.time_scale = time_scale #scales the mapping times, e.g., to model faster hardware
+
+
+class ReadUntilReplay:
+	#results of the simulation, per read and per chunk
+	def __init__(self, device, signal_length, chunks, mapping_time, eject):
+		self.device = device
+		self.signal_length = signal_length
+		self.chunks = chunks
+		self.chunk_time = mapping_time * device.time_scale / 1000 / chunks #s per chunk
+		self.eject = eject
+		self.chunk_offsets = np.concatenate(([0], np.cumsum(chunks)))
+		#filled by run(), times are in seconds
+		self.read_start = self.read_end = self.decision_time = self.decision_chunk_arrival = None
+		self.queueing_delay = None
+		self.busy_time = 0.0
+		self.end_time = 0.0
+
+	def run(self):
+		#the event loop works on python lists, indexing numpy arrays one element at a time is much slower
+		device = self.device
+		sample_rate = device.sample_rate
+		chunk_size = device.chunk_size
+		eject_delay = device.eject_delay
+		n_reads = len(self.signal_length)
+		signal_length = self.signal_length.tolist()
+		chunks = self.chunks.tolist()
+		chunk_time = self.chunk_time.tolist()
+		eject = self.eject.tolist()
+		chunk_offsets = self.chunk_offsets.tolist()
+		read_start = [None] * n_reads
+		read_end = [None] * n_reads
+		decision_time = [None] * n_reads
+		decision_chunk_arrival = [None] * n_reads
+		queueing_delay = [None] * chunk_offsets[-1]
+		arrived = [0] * n_reads #number of arrived chunks per read
+		in_flight = [False] * n_reads #a chunk of the read is queued or being mapped
+		ended = [False] * n_reads
+
+		events = []
+		seq = 0 #tie breaker, keeps events in insertion order
+		queue = deque() #chunks waiting for a thread: (ready time, read, chunk)
+		free_threads = device.threads
+		busy_time = 0.0
+		next_read = 0
+		push = heapq.heappush
+		pop = heapq.heappop
+
+		def chunk_arrival(read, k):
+			#the k-th chunk (1-based) arrives when its last sample is sequenced
+			return read_start[read] + min(k * chunk_size, signal_length[read]) / sample_rate
+
+		def start_read(now):
+			nonlocal next_read, seq
+			if next_read >= n_reads:
+				return
+			read = next_read
+			next_read += 1
+			read_start[read] = now
+			push(events, (chunk_arrival(read, 1), _CHUNK_ARRIVAL, seq, read, 1))
+			push(events, (now + signal_length[read] / sample_rate, _READ_END, seq + 1, read, 0))
+			seq += 2
+
+		for _ in range(min(device.channels, n_reads)):
+			start_read(0.0)
+
+		now = 0.0
+		while events:
+			now, kind, _, read, k = pop(events)
+			if kind == _CHUNK_ARRIVAL:
+				arrived[read] = k
+				if k == chunks[read]:
+					decision_chunk_arrival[read] = now
+				else:
+					push(events, (chunk_arrival(read, k + 1), _CHUNK_ARRIVAL, seq, read, k + 1))
+					seq += 1
+				if not in_flight[read]:
+					in_flight[read] = True
+					queue.append((now, read, k))
+			elif kind == _JOB_DONE:
+				free_threads += 1
+				in_flight[read] = False
+				if k == chunks[read]:
+					decision_time[read] = now
+					#ejecting a read frees its channel early
+					if eject[read] and not ended[read]:
+						push(events, (now + eject_delay, _READ_END, seq, read, 0))
+						seq += 1
+				elif arrived[read] > k:
+					in_flight[read] = True
+					queue.append((now, read, k + 1))
+			else: #_READ_END
+				if ended[read]:
+					continue
+				ended[read] = True
+				read_end[read] = now
+				start_read(now + device.read_gap)
+
+			while free_threads > 0 and queue:
+				ready, job_read, job_k = queue.popleft()
+				free_threads -= 1
+				queueing_delay[chunk_offsets[job_read] + job_k - 1] = now - ready
+				service = chunk_time[job_read]
+				busy_time += service
+				push(events, (now + service, _JOB_DONE, seq, job_read, job_k))
+				seq += 1
+
+		self.read_start = np.array(read_start, dtype=np.float64)
+		self.read_end = np.array(read_end, dtype=np.float64)
+		self.decision_time = np.array(decision_time, dtype=np.float64)
+		self.decision_chunk_arrival = np.array(decision_chunk_arrival, dtype=np.float64)
+		self.queueing_delay = np.array(queueing_delay, dtype=np.float64)
+		self.busy_time = busy_time
+		self.end_time = now
+		return self
+
+	def outcomes(self):
+		#per read: whether it was decided, and whether its decision was dropped, late or ejected it, and the bases saved by the ejection
+		device = self.device
+		decided = ~np.isnan(self.decision_time)
+		natural_end = self.read_start + self.signal_length / device.sample_rate
+		after_end = decided & (self.decision_time >= natural_end)
+		#a read whose deciding chunk is its last one is sequenced in full before any decision, its decision is not dropped
+		last_chunk_decides = self.chunks * device.chunk_size >= self.signal_length
+		dropped = after_end & ~last_chunk_decides
+		late = decided & ~dropped & (self.decision_time - self.decision_chunk_arrival > device.deadline)
+		ejected = self.eject & decided & ~after_end
+		saved_bases = np.where(ejected, np.maximum(natural_end - self.read_end, 0) * device.bp_per_sec, 0)
+		return decided, dropped, late, ejected, saved_bases
+
+	def print_report(self, toolname):
+		device = self.device
+		n_reads = len(self.signal_length)
+		decided, dropped, late, ejected, saved_bases = self.outcomes()
+		latency = (self.decision_time - self.decision_chunk_arrival)[decided]
+		total_bases = self.signal_length.sum() / device.sample_rate * device.bp_per_sec
+
+		def distribution(values):
+			values = values * 1000 #ms
+			if len(values) == 0:
+				return "n/a"
+			percentiles = ", ".join(f"P{p}: {np.percentile(values, p):.3f}" for p in REPORTED_PERCENTILES)
+			return f"mean: {values.mean():.3f}, {percentiles}, max: {values.max():.3f}"
+
+		print(f"{toolname} Simulated time (s): {self.end_time:.2f}")
+		print(f"{toolname} Reads: {n_reads}, decisions: {int(decided.sum())}, ejected: {int(ejected.sum())}")
+		print(f"{toolname} Thread utilization: {100 * self.busy_time / max(self.end_time * device.threads, 1e-12):.2f}%")
+		print(f"{toolname} Queueing delay per chunk (ms) : " + distribution(self.queueing_delay[~np.isnan(self.queueing_delay)]))
+		print(f"{toolname} Decision latency (ms) : " + distribution(latency))
+		print(f"{toolname} Late decisions (> {device.deadline * 1000:g} ms) : {int(late.sum())} ({100 * late.sum() / max(n_reads, 1):.2f}%)")
+		print(f"{toolname} Dropped decisions (after the read ended) : {int(dropped.sum())} ({100 * dropped.sum() / max(n_reads, 1):.2f}%)")
+		print(f"{toolname} Bases saved by ejection : {saved_bases.sum():.0f} ({100 * saved_bases.sum() / max(total_bases, 1):.2f}% of {total_bases:.0f})")
+		print(f"#Done with {toolname}\n")
+
+
+def load_reads(paf_path, max_reads=None):
+	#signal length, number of chunks, mapping time and mapping status of every full record
+	blocks = []
+	for cols in iter_paf_columns(paf_path, tags=('mt', 'ci', 'sl')):
+		full = (cols['ci'] > 0) & (cols['sl'] > 0) & ~np.isnan(cols['mt'])
+		blocks.append({key: cols[key][full] for key in ('sl', 'ci', 'mt', 'mapped')})
+	reads = {key: np.concatenate([b[key] for b in blocks]) if blocks else np.empty(0) for key in ('sl', 'ci', 'mt', 'mapped')}
+	if max_reads is not None:
+		reads = {key: values[:max_reads] for key, values in reads.items()}
+	return reads
+
+
+def simulate_paf_file(paf_path, device, eject='unmapped', max_reads=None):
+	reads = load_reads(paf_path, max_reads)
+	mapped = reads['mapped'].astype(bool)
+	eject_reads = ~mapped if eject == 'unmapped' else mapped
+	replay = ReadUntilReplay(device, reads['sl'].astype(np.int64), reads['ci'].astype(np.int64), reads['mt'], eject_reads)
+	return replay.run()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Replay the mapping decisions of PAF files on a simulated Read Until device')
+	parser.add_argument('pafs', metavar='PAF', type=str, nargs='+', help='PAF files with mt, ci and sl tags')
+	parser.add_argument('--channels', type=int, default=512, help='number of channels sequencing at the same time')
+	parser.add_argument('--sample-rate', type=int, default=4000, help='samples per second and channel')
+	parser.add_argument('--chunk-size', type=int, default=None, help='samples per chunk (default: the sample rate, i.e., 1 second)')
+	parser.add_argument('-t', '--threads', type=int, default=1, help='number of mapping threads')
+	parser.add_argument('--bp-per-sec', type=float, default=450, help='bases sequenced per second and channel')
+	parser.add_argument('--deadline', type=float, default=None, help='ms after the arrival of the deciding chunk until the decision counts as late (default: one chunk)')
+	parser.add_argument('--eject', choices=['unmapped', 'mapped'], default='unmapped', help='eject unmapped reads (enrichment) or mapped reads (depletion)')
+	parser.add_argument('--eject-delay', type=float, default=0.0, help='ms until an ejection takes effect')
+	parser.add_argument('--read-gap', type=float, default=0.0, help='ms between two reads on a channel')
+	parser.add_argument('--time-scale', type=float, default=1.0, help='factor applied to the mapping times (e.g., 0.5 for twice as fast hardware)')
+	parser.add_argument('--max-reads', type=int, default=None, help='replay only the first reads of each PAF')
+	args = parser.parse_args()
+
+	device = DeviceModel(channels=args.channels, sample_rate=args.sample_rate, chunk_size=args.chunk_size,
+		threads=args.threads, bp_per_sec=args.bp_per_sec,
+		deadline=args.deadline / 1000 if args.deadline is not None else None,
+		eject_delay=args.eject_delay / 1000, read_gap=args.read_gap / 1000, time_scale=args.time_scale)
+
+	for paf in map(Path, args.pafs):
+		if not paf.is_file():
+			print("PAF file " + str(paf) + " does not exist")
+			sys.exit(1)
+
+	for paf in map(Path, args.pafs):
+		print(f"Replaying {paf}")
+		simulate_paf_file(paf, device, args.eject, args.max_reads).print_report(paf.name)
@@ -0,0 +1,214 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import itertools
+import subprocess
+from pathlib import Path
+
+#runs rawalign for every configuration of a parameter grid, as run_rawalign.sh does for a single configuration:
+#  the index is built once per indexing configuration (preset and index parameters) and shared by all mapping jobs,
+#  mapping jobs run concurrently, each pinned to its own threads_per_job cores out of the core budget,
+#  and every finished job is recorded in <outdir>/<prefix>_rawalign_sweep.done, so that a rerun of an interrupted
+#  sweep only runs the configurations that did not finish
+#the output files are named as by run_rawalign.sh, so the comparison and plotting scripts work on them unchanged
+
+MANIFEST_SUFFIX = "_rawalign_sweep.done"
+DEFAULT_BORDER_MODES = ['sparse']
+DEFAULT_FILL_MODES = ['banded']
+DEFAULT_BAND_RADIUS_FRACS = ['0.10']
+DEFAULT_MATCH_BONUSES = ['0.4']
+DEFAULT_MIN_SCORES = ['20.0']
+POLL_INTERVAL = 1.0 #s between checks for finished jobs
+
+
+def sanitize_params(params):
+	#same as run_rawalign.sh: spaces are replaced by underscores, hyphens are removed, and a leading underscore is added
+	sanitized = "_".join(params.split()).replace("-", "")
+	return "_" + sanitized if sanitized else ""
+
+
+def unique(values):
+	return list(dict.fromkeys(values))
+
+
+def expand_grid(border_modes, fill_modes, band_radius_fracs, match_bonuses, min_scores, extra_params=""):
+	#mapping parameters of each configuration, the band radius only applies to the banded fill method
+	configs = []
+	for border, fill in itertools.product(unique(border_modes), unique(fill_modes)):
+		fill_methods = [f"banded={frac}" for frac in unique(band_radius_fracs)] if fill == 'banded' else [fill]
+		for fill_method, match_bonus, min_score in itertools.product(fill_methods, unique(match_bonuses), unique(min_scores)):
+			params = (f"--dtw-evaluate-chains"
+				f" --dtw-border-constraint {border}"
+				f" --dtw-fill-method {fill_method}"
+				f" --dtw-match-bonus {match_bonus}"
+				f" --dtw-min-score {min_score}")
+			if extra_params:
+				params += " " + extra_params
+			configs.append(params)
+	return configs
+
+
+class Job:
+	def __init__(self, name, command, outputs, stdout, stderr, requires=None, copies=()):
+		self.name = name
+		self.command = command
+		self.outputs = outputs #files that have to exist for the job to count as finished
+		self.stdout = stdout
+		self.stderr = stderr
+		self.requires = requires #name of the job that has to finish first
+		self.copies = copies #(source, destination) files that are copied once the job is scheduled
+		self.process = None
+		self.start = None
+
+
+class Sweep:
+	def __init__(self, args):
+		self.args = args
+		self.outdir = Path(args.outdir)
+		self.manifest_path = self.outdir / (args.prefix + MANIFEST_SUFFIX)
+		self.done = self.load_manifest()
+
+	def load_manifest(self):
+		#names of the finished jobs, whose output files still exist
+		done = set()
+		if self.manifest_path.is_file():
+			with open(self.manifest_path) as f:
+				for line in f:
+					fields = line.rstrip('\n').split('\t')
+					if len(fields) >= 2 and all(Path(p).is_file() for p in fields[2:]):
+						done.add(fields[0])
+		return done
+
+	def record(self, job, elapsed):
+		#one line per job, appended as soon as the job finishes: name, elapsed seconds, output files
+		with open(self.manifest_path, 'a') as f:
+			f.write("\t".join([job.name, f"{elapsed:.1f}"] + [str(p) for p in job.outputs]) + "\n")
+		self.done.add(job.name)
+
+	def rawalign(self, params):
+		args = self.args
+		return [args.rawalign, "-x", args.preset, "-t", str(args.threads_per_job)] + params.split()
+
+	def timed(self, time_path, command):
+		return ["/usr/bin/time", "-vpo", str(time_path)] + command
+
+	def jobs(self, configs):
+		args = self.args
+		base = f"{args.prefix}_rawalign"
+		index_name = f"{args.preset}{sanitize_params(args.index_params)}"
+		index_path = self.outdir / f"{base}_{index_name}.ind"
+		index_time = self.outdir / f"{base}_index_{index_name}.time"
+		if args.index:
+			#an index that was built elsewhere (e.g., by an earlier sweep) is only read
+			index_path = Path(args.index)
+			index_job = None
+			jobs = []
+		else:
+			index_job = Job("index" + sanitize_params(args.index_params),
+				self.timed(index_time, self.rawalign(args.index_params) + ["-p", args.pore, "-d", str(index_path), args.ref]),
+				[index_path, index_time], self.outdir / f"{base}_index_{index_name}.out", self.outdir / f"{base}_index_{index_name}.err")
+			jobs = [index_job]
+
+		for params in configs:
+			name = f"{args.preset}{sanitize_params(params)}"
+			paf = self.outdir / f"{base}_{name}.paf"
+			map_time = self.outdir / f"{base}_map_{name}.time"
+			command = self.timed(map_time, self.rawalign(args.index_params + " " + params) + ["-o", str(paf), str(index_path), args.signals])
+			stdout = self.outdir / f"{base}_{name}.out"
+			stderr = self.outdir / f"{base}_{name}.err"
+			if index_job is None:
+				jobs.append(Job(name, command, [paf, map_time], stdout, stderr))
+				continue
+			#every configuration gets the timing of the shared index, as if it had built the index itself
+			config_index_time = self.outdir / f"{base}_index_{name}.time"
+			jobs.append(Job(name, command, [paf, map_time, config_index_time], stdout, stderr,
+				requires=index_job.name, copies=[(index_time, config_index_time)]))
+		return jobs
+
+	def core_slots(self):
+		#disjoint sets of cores, one per concurrent job
+		cores = sorted(os.sched_getaffinity(0))[:self.args.cores]
+		n_slots = max(len(cores) // self.args.threads_per_job, 1)
+		return [cores[i * self.args.threads_per_job:(i + 1) * self.args.threads_per_job] or cores for i in range(n_slots)]
+
+	def launch(self, job, cores):
+		for source, destination in job.copies:
+			shutil.copyfile(source, destination)
+		with open(job.stdout, 'w') as out, open(job.stderr, 'w') as err:
+			job.process = subprocess.Popen(job.command, stdout=out, stderr=err, preexec_fn=lambda: os.sched_setaffinity(0, cores))
+		job.start = time.time()
+
+	def run(self, jobs):
+		pending = [job for job in jobs if job.name not in self.done]
+		print(f"{len(jobs) - len(pending)} of {len(jobs)} jobs already finished")
+		if self.args.dry_run:
+			for job in pending:
+				print(" ".join(job.command))
+			return True
+
+		free_slots = self.core_slots()
+		running = {}
+		failed = set()
+		while pending or running:
+			#jobs whose index failed are given up, the others wait for it
+			for job in [job for job in pending if job.requires in failed]:
+				print(f"Skipping {job.name}, because {job.requires} failed")
+				failed.add(job.name)
+				pending.remove(job)
+			for job in [job for job in pending if job.requires is None or job.requires in self.done]:
+				if not free_slots:
+					break
+				cores = free_slots.pop()
+				print(f"Starting {job.name} on cores {','.join(map(str, cores))}")
+				self.launch(job, cores)
+				running[job.name] = (job, cores)
+				pending.remove(job)
+
+			time.sleep(POLL_INTERVAL)
+			for name, (job, cores) in list(running.items()):
+				if job.process.poll() is None:
+					continue
+				del running[name]
+				free_slots.append(cores)
+				elapsed = time.time() - job.start
+				if job.process.returncode == 0:
+					print(f"Finished {name} in {elapsed:.1f} s")
+					self.record(job, elapsed)
+				else:
+					print(f"Failed {name} with exit code {job.process.returncode}, see {job.stderr}")
+					failed.add(name)
+		return not failed
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Run rawalign for a grid of DTW parameters, resuming interrupted sweeps')
+	parser.add_argument('--outdir', type=str, required=True, help='output directory of the PAF, .time, .out and .err files')
+	parser.add_argument('--prefix', type=str, required=True, help='prefix of the output files (e.g., d2_ecoli_r94)')
+	parser.add_argument('--signals', type=str, required=True, help='directory of the FAST5 files')
+	parser.add_argument('--ref', type=str, default=None, help='reference genome')
+	parser.add_argument('--pore', type=str, default=None, help='k-mer model file')
+	parser.add_argument('--preset', type=str, default='sensitive', help='rawalign preset (e.g., viral, sensitive, fast)')
+	parser.add_argument('--index', type=str, default=None, help='existing rawalign index, no index is built and --pore and --ref are not used')
+	parser.add_argument('--index-params', type=str, default='', help='parameters that affect indexing (e.g., "-w 3"), used for both indexing and mapping')
+	parser.add_argument('--extra-params', type=str, default='', help='parameters appended to every mapping configuration (e.g., "--stop-min-anchor 2")')
+	parser.add_argument('--border-modes', type=str, nargs='+', default=DEFAULT_BORDER_MODES, choices=['global', 'sparse', 'local'], help='values of --dtw-border-constraint')
+	parser.add_argument('--fill-modes', type=str, nargs='+', default=DEFAULT_FILL_MODES, choices=['full', 'banded'], help='DTW fill methods, banded is combined with each band radius fraction')
+	parser.add_argument('--band-radius-fracs', type=str, nargs='+', default=DEFAULT_BAND_RADIUS_FRACS, help='band radius fractions of the banded fill method')
+	parser.add_argument('--match-bonuses', type=str, nargs='+', default=DEFAULT_MATCH_BONUSES, help='values of --dtw-match-bonus')
+	parser.add_argument('--min-scores', type=str, nargs='+', default=DEFAULT_MIN_SCORES, help='values of --dtw-min-score')
+	parser.add_argument('-c', '--cores', type=int, default=len(os.sched_getaffinity(0)), help='total number of cores used by the concurrent jobs')
+	parser.add_argument('-t', '--threads-per-job', type=int, default=None, help='threads (and cores) of each rawalign job (default: all cores, i.e., one job at a time)')
+	parser.add_argument('--rawalign', type=str, default='rawalign', help='rawalign binary')
+	parser.add_argument('--dry-run', action='store_true', help='only print the commands of the jobs that would run')
+	args = parser.parse_args()
+	args.threads_per_job = min(args.threads_per_job or args.cores, args.cores)
+	if args.index is None and (args.ref is None or args.pore is None):
+		parser.error("--ref and --pore are required unless an existing --index is given")
+
+	os.makedirs(args.outdir, exist_ok=True)
+	configs = expand_grid(args.border_modes, args.fill_modes, args.band_radius_fracs, args.match_bonuses, args.min_scores, args.extra_params)
+	sweep = Sweep(args)
+	if not sweep.run(sweep.jobs(configs)):
+		sys.exit(1)
@@ -0,0 +1,228 @@
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+FIXTURES = Path(__file__).parent / "fixtures"
+sys.path.insert(0, str(FIXTURES))
+
+import compare_pafs_baseline
+from annotate_pafs import TruthIndex, annotate_paf_file
+from compare_pafs import summarize_paf_file
+from paf_cache import build_cache, load_cache
+from paf_columns import read_paf_columns, iter_paf_blocks, parse_paf_block, ANNOTATION_CLASSES, MANDATORY_FIELDS, TAG_TYPES
+import paired_pafs
+import time_stats
+from paired_pafs import ReadTable, join_reads, iter_bootstrap_weights, weighted_metrics, bootstrap_metrics, stratum_ids
+
+#the columnar scripts against the per-tool functions they replaced (fixtures/compare_pafs_baseline.py)
+#and against plain Python versions of what they compute, on the small PAF files in fixtures/
+
+ANNOTATED_PAFS = [('RawAlign', 'rawalign_ann.paf'), ('RawHash', 'rawhash_ann.paf'), ('Sigmap', 'sigmap_ann.paf'), ('Uncalled', 'uncalled_ann.paf')]
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+	#a copy of the fixtures, so that caches and summaries are not written next to them
+	for path in FIXTURES.glob("*.paf"):
+		shutil.copy(path, tmp_path)
+	return tmp_path
+
+
+def report_values(report):
+	#value of each line of a report by its label, the tool name is dropped
+	values = {}
+	for line in report.splitlines():
+		label, sep, value = line.rpartition(': ')
+		if sep and not line.startswith('#'):
+			values[label.split(' ', 1)[1].strip()] = value
+	return values
+
+
+def paf_lines(path):
+	return [line.rstrip('\n').split('\t') for line in open(path)]
+
+
+def tag_value(fields, name):
+	for field in fields[12:]:
+		if field.startswith(name + ':'):
+			return field.split(':', 2)[2]
+	return None
+
+
+@pytest.mark.parametrize("paf_type, paf_name", ANNOTATED_PAFS)
+def test_report_matches_baseline(fixtures, capsys, paf_type, paf_name):
+	compare_pafs_baseline.analyze_paf_file("tool", paf_type, fixtures / paf_name)
+	expected = report_values(capsys.readouterr().out)
+	summarize_paf_file(paf_type, fixtures / paf_name, exact=True).print_report("tool")
+	actual = report_values(capsys.readouterr().out)
+
+	assert expected.keys() <= actual.keys()
+	for label, value in expected.items():
+		if label in ("TP", "FP", "FN", "TN") or value == 'inf':
+			assert actual[label] == value, label
+		else:
+			#float sums are not exact, see paf_stats.py
+			assert float(actual[label]) == pytest.approx(float(value), rel=1e-12), label
+
+
+@pytest.mark.parametrize("block_size", [64, 1000, 1 << 20])
+def test_blocks_match_whole_file(fixtures, block_size):
+	path = fixtures / "rawalign_ann.paf"
+	expected = parse_paf_block(path.read_bytes(), names=True, fields=MANDATORY_FIELDS)
+	blocks = [parse_paf_block(data, names=True, fields=MANDATORY_FIELDS) for data in iter_paf_blocks(path, block_size=block_size)]
+	assert sum(len(b['mapped']) for b in blocks) == len(expected['mapped'])
+	for name, column in expected.items():
+		np.testing.assert_array_equal(np.concatenate([b[name] for b in blocks]), column, err_msg=name)
+
+
+@pytest.mark.parametrize("paf_type, paf_name", ANNOTATED_PAFS)
+def test_columns_match_text(fixtures, paf_type, paf_name):
+	path = fixtures / paf_name
+	lines = paf_lines(path)
+	cols = read_paf_columns(path, names=True, fields=MANDATORY_FIELDS, use_cache=False)
+	assert cols['read_name'].tolist() == [f[0].encode() for f in lines]
+	assert cols['query_length'].tolist() == [int(f[1]) for f in lines]
+	assert cols['mapped'].tolist() == [f[2] != '*' for f in lines]
+	assert [ANNOTATION_CLASSES[a] for a in cols['annotation']] == [tag_value(f, 'rf') for f in lines]
+	for tag, dtype in TAG_TYPES.items():
+		values = [tag_value(f, tag) for f in lines]
+		if np.issubdtype(np.dtype(dtype), np.integer):
+			assert cols[tag].tolist() == [int(v) if v is not None else -1 for v in values], tag
+		else:
+			np.testing.assert_array_equal(cols[tag], [float(v) if v is not None else np.nan for v in values], err_msg=tag)
+
+
+@pytest.mark.parametrize("paf_type, paf_name", ANNOTATED_PAFS)
+def test_cache_matches_text(fixtures, paf_type, paf_name):
+	path = fixtures / paf_name
+	expected = read_paf_columns(path, names=True, fields=MANDATORY_FIELDS, use_cache=False)
+	build_cache(path)
+	assert load_cache(path) is not None
+	actual = read_paf_columns(path, names=True, fields=MANDATORY_FIELDS, use_cache=True)
+	assert actual.keys() == expected.keys()
+	for name, column in expected.items():
+		np.testing.assert_array_equal(actual[name], column, err_msg=name)
+
+
+def naive_annotation(paf_path, truth_path):
+	#labels of the records as described in annotate_pafs.py, one record at a time
+	truth = {}
+	for f in paf_lines(truth_path):
+		if f[2] != '*':
+			truth.setdefault(f[0], []).append((f[5], f[4], int(f[7]), int(f[8])))
+	labels = []
+	for f in paf_lines(paf_path):
+		if f[2] == '*':
+			labels.append('fn' if f[0] in truth else 'tn')
+		elif f[0] not in truth:
+			labels.append('na')
+		else:
+			start, end = int(f[7]), int(f[8])
+			overlaps = any(t == f[5] and s == f[4] and max(ts, start) <= min(te, end) for t, s, ts, te in truth[f[0]])
+			labels.append('tp' if overlaps else 'fp')
+	return labels
+
+
+def test_annotation_matches_naive(fixtures):
+	path = fixtures / "rawalign.paf"
+	annotated = fixtures / "rawalign_ann.out.paf"
+	annotate_paf_file(path, annotated, fixtures / "rawalign.throughput", TruthIndex(fixtures / "true_mappings.paf"))
+	lines = paf_lines(annotated)
+	assert [f[:-1] for f in lines] == paf_lines(path)
+	assert [f[-1] for f in lines] == ['rf:Z:' + label for label in naive_annotation(path, fixtures / "true_mappings.paf")]
+
+
+def test_throughput_matches_pafstats(fixtures):
+	#fixtures/rawalign.throughput is the summary of uncalled pafstats for rawalign.paf, derived by hand from its definitions
+	#("BP per sec" is query_end * 1000 / mt of the mapped records with a time, "BP mapped" their query_end),
+	#test_matches_uncalled_pafstats checks both against uncalled itself where it is installed
+	annotate_paf_file(fixtures / "rawalign.paf", fixtures / "rawalign_ann.out.paf", fixtures / "rawalign.out.throughput", TruthIndex(fixtures / "true_mappings.paf"))
+	assert (fixtures / "rawalign.out.throughput").read_text() == (FIXTURES / "rawalign.throughput").read_text()
+
+
+@pytest.mark.skipif(shutil.which('uncalled') is None, reason="uncalled is not installed")
+def test_matches_uncalled_pafstats(fixtures):
+	#the annotated PAF and the summary are those of uncalled pafstats --annotate, as run by the 1_generate_results.sh scripts before
+	result = subprocess.run(['uncalled', 'pafstats', '-r', str(fixtures / "true_mappings.paf"), '--annotate', str(fixtures / "rawalign.paf")],
+		capture_output=True, text=True, check=True)
+	annotate_paf_file(fixtures / "rawalign.paf", fixtures / "rawalign_ann.out.paf", fixtures / "rawalign.out.throughput", TruthIndex(fixtures / "true_mappings.paf"))
+	assert (fixtures / "rawalign_ann.out.paf").read_text() == result.stdout
+	assert (fixtures / "rawalign.out.throughput").read_text() == result.stderr
+	assert (FIXTURES / "rawalign.throughput").read_text() == result.stderr
+
+
+def test_join_matches_naive(fixtures):
+	a = ReadTable(fixtures / "rawalign_ann.paf")
+	b = ReadTable(fixtures / "rawalign.paf")
+	in_a, in_b = join_reads(a, b)
+
+	first_a, first_b = {}, {}
+	for f in paf_lines(fixtures / "rawalign_ann.paf"):
+		first_a.setdefault(f[0], float(tag_value(f, 'mt')))
+	for f in paf_lines(fixtures / "rawalign.paf"):
+		first_b.setdefault(f[0], float(tag_value(f, 'mt')))
+	expected = sorted((name, t, first_b[name]) for name, t in first_a.items() if name in first_b)
+	actual = sorted(zip([n.decode() for n in a.names[in_a].tolist()], a.time[in_a].tolist(), b.time[in_b].tolist()))
+	assert actual == expected
+
+
+def test_join_with_hash_collisions(fixtures, monkeypatch):
+	#with every name hashed to the same value, reads are still kept and joined by name
+	expected = join_reads(ReadTable(fixtures / "rawalign_ann.paf"), ReadTable(fixtures / "rawalign.paf"))
+	expected_names = ReadTable(fixtures / "rawalign_ann.paf").names[expected[0]].tolist()
+	monkeypatch.setattr(paired_pafs, 'hash_names', lambda names: np.zeros(len(names), dtype=np.uint64))
+	a = ReadTable(fixtures / "rawalign_ann.paf")
+	b = ReadTable(fixtures / "rawalign.paf")
+	assert len(b) == len(set(b.names.tolist())) == len(set(line[0] for line in paf_lines(fixtures / "rawalign.paf")))
+	in_a, in_b = join_reads(a, b)
+	assert a.names[in_a].tolist() == b.names[in_b].tolist() == expected_names
+
+
+def test_bootstrap_keeps_strata(fixtures):
+	table = ReadTable(fixtures / "rawalign_ann.paf")
+	strata = {name: f"stratum {i % 3}" for i, name in enumerate(table.names.tolist()[:30])}
+	stratum = stratum_ids(table.names, strata)
+	assert len(np.unique(stratum)) == 4 #the reads without a stratum form their own
+	for weights in iter_bootstrap_weights(stratum, 50, np.random.default_rng(0)):
+		for s in np.unique(stratum).tolist():
+			assert (weights[:, stratum == s].sum(axis=1) == np.count_nonzero(stratum == s)).all()
+
+
+def test_bootstrap_point_and_paired_difference(fixtures):
+	#one record per read: the unweighted metrics are those of the report, and a file minus itself is 0 in every resample
+	table = ReadTable(fixtures / "rawalign_ann.paf")
+	summary = summarize_paf_file('RawAlign', fixtures / "rawalign_ann.paf", exact=True)
+	precision, recall, _, mean_bp_per_sec = weighted_metrics(np.ones((1, len(table))), table.annotation, table.bp_per_sec)[:, 0].tolist()
+	assert precision == pytest.approx(summary.tp / (summary.tp + summary.fp))
+	assert recall == pytest.approx(summary.tp / (summary.tp + summary.fn))
+	assert mean_bp_per_sec == pytest.approx(summary.bp_per_sec.mean())
+	reads = (table.annotation, table.bp_per_sec)
+	a, b = bootstrap_metrics(stratum_ids(table.names), [reads, reads], 20, np.random.default_rng(0))
+	assert a.shape == (4, 20)
+	np.testing.assert_array_equal(a, b)
+
+
+@pytest.mark.parametrize("paf_type, paf_name", ANNOTATED_PAFS)
+def test_strata_add_up_to_report(fixtures, paf_type, paf_name):
+	summary = summarize_paf_file(paf_type, fixtures / paf_name, exact=True, strata={'ci': (3, 6)})
+	stratified, = summary.strata
+	assert sum(stat.n for stat in stratified.time_per_read) == summary.time_per_read.n
+	np.testing.assert_array_equal(np.sort(np.concatenate([stat.values() for stat in stratified.time_per_read if stat.n > 0])),
+		np.sort(summary.time_per_read.values()))
+	assert stratified.class_counts.sum(axis=0).tolist() == [summary.tp, summary.fp, summary.fn, summary.tn]
+
+
+def test_reads_per_cpu_second(fixtures, capsys):
+	#distinct reads of the PAF file next to the .time file of the mapping step, also without --ref
+	(fixtures / "outdir").mkdir()
+	shutil.copy(fixtures / "rawalign.paf", fixtures / "outdir" / "d1_rawalign_sensitive.paf")
+	(fixtures / "outdir" / "d1_rawalign_map_sensitive.time").write_text("\tUser time (seconds): 1.50\n\tSystem time (seconds): 0.50\n")
+	(fixtures / "comparison").mkdir()
+	time_stats.print_report(time_stats.load_time_files(fixtures / "comparison", "d1_"))
+	n_reads = len(set(f[0] for f in paf_lines(fixtures / "rawalign.paf")))
+	assert n_reads < len(paf_lines(fixtures / "rawalign.paf"))
+	assert f"rawalign_map_sensitive Reads per CPU second: {n_reads / 2:.2f}" in capsys.readouterr().out.splitlines()
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from pareto import pareto_ranks
+
+
+def naive_ranks(points):
+	#repeated removal of the non-dominated points
+	ranks = np.full(len(points), -1)
+	rank = 0
+	while (ranks < 0).any():
+		remaining = np.flatnonzero(ranks < 0)
+		front = [i for i in remaining if not any((points[j] >= points[i]).all() and (points[j] > points[i]).any() for j in remaining)]
+		ranks[front] = rank
+		rank += 1
+	return ranks
+
+
+@pytest.mark.parametrize("n, block_size", [(0, 4), (1, 4), (50, 4), (200, 16), (300, 512)])
+def test_ranks_match_repeated_removal(n, block_size):
+	#few distinct values, so that there are ties and long dominance chains
+	points = np.random.default_rng(n).integers(0, 6, size=(n, 3)).astype(np.float64)
+	np.testing.assert_array_equal(pareto_ranks(points, block_size), naive_ranks(points))
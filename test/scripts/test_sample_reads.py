@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from sample_reads import fast5_reads, write_subset
+
+h5py = pytest.importorskip("h5py")
+
+
+def write_multi_read(path, read_ids, file_version):
+	with h5py.File(path, 'w') as f:
+		f.attrs['file_version'] = np.bytes_(file_version)
+		for read_id in read_ids:
+			f.create_dataset(f"read_{read_id}/Raw/Signal", data=np.arange(10, dtype=np.int16))
+
+
+def write_single_read(path, read_id):
+	path.parent.mkdir(parents=True, exist_ok=True)
+	with h5py.File(path, 'w') as f:
+		f.create_group("Raw/Reads/Read_1").attrs['read_id'] = np.bytes_(read_id) #fixed-length, as in FAST5 files
+
+
+def test_write_subset(tmp_path):
+	signals = tmp_path / "signals"
+	signals.mkdir()
+	write_multi_read(signals / "batch_0.fast5", ["a", "b", "c"], b"2.0")
+	write_multi_read(signals / "batch_1.fast5", ["d", "e"], b"2.2")
+	#single-read files with the same name in different subdirectories
+	write_single_read(signals / "run_0" / "read.fast5", "f")
+	write_single_read(signals / "run_1" / "read.fast5", "g")
+
+	files = sorted(signals.rglob('*.fast5'))
+	reads = [(path, read_id, group) for path in files for read_id, group in fast5_reads(path, h5py)]
+	out_dir = tmp_path / "subset"
+	write_subset(reads, np.arange(len(reads)), out_dir, 4, h5py)
+
+	subset = {}
+	for path in sorted(out_dir.iterdir()):
+		with h5py.File(path, 'r') as f:
+			subset[path.name] = ([read_id for read_id, _ in fast5_reads(path, h5py)], f.attrs.get('file_version'))
+	#the reads of batch_1 are not added to the file with the root attributes of batch_0, and no single-read file is overwritten
+	assert subset == {
+		"subset_0.fast5": (["a", "b", "c"], b"2.0"),
+		"subset_1.fast5": (["d", "e"], b"2.2"),
+		"000002_read.fast5": (["f"], None),
+		"000003_read.fast5": (["g"], None),
+	}
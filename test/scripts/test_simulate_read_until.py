@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from simulate_read_until import DeviceModel, ReadUntilReplay
+
+#small replays whose timelines are worked out by hand, with 1 s chunks of 1000 samples and 100 bases per second
+
+
+def replay(channels, threads, signal_length, chunks, mapping_time, eject):
+	device = DeviceModel(channels=channels, sample_rate=1000, chunk_size=1000, threads=threads, bp_per_sec=100)
+	return ReadUntilReplay(device, np.array(signal_length), np.array(chunks), np.array(mapping_time, dtype=np.float64), np.array(eject)).run()
+
+
+def test_queueing_ejection_and_last_chunk():
+	#two channels and one thread:
+	#  t=1.0: the chunks of reads 0 and 1 arrive, read 0 is mapped until 1.5 and ejected, read 1 waits 0.5 s and is mapped until 2.5
+	#  t=1.5: read 2 starts on the channel of read 0, its first chunk arrives at 2.5 and is mapped until 2.6
+	#  t=3.0: read 2 ends (1500 samples) as its last, partial chunk arrives; the end is handled first, the chunk is still mapped until 3.1
+	res = replay(2, 1, [3000, 3000, 1500], [1, 1, 2], [500, 1000, 200], [True, False, True])
+	np.testing.assert_allclose(res.read_start, [0.0, 0.0, 1.5])
+	np.testing.assert_allclose(res.read_end, [1.5, 3.0, 3.0])
+	np.testing.assert_allclose(res.decision_chunk_arrival, [1.0, 1.0, 3.0])
+	np.testing.assert_allclose(res.decision_time, [1.5, 2.5, 3.1])
+	np.testing.assert_allclose(res.queueing_delay, [0.0, 0.5, 0.0, 0.0])
+	assert res.busy_time == pytest.approx(1.7)
+	assert res.end_time == pytest.approx(3.1)
+
+	decided, dropped, late, ejected, saved_bases = res.outcomes()
+	assert decided.tolist() == [True, True, True]
+	#read 1 is decided 1.5 s after its chunk arrived, read 2 after its end but by its last chunk
+	assert dropped.tolist() == [False, False, False]
+	assert late.tolist() == [False, True, False]
+	assert ejected.tolist() == [True, False, False]
+	np.testing.assert_allclose(saved_bases, [150, 0, 0])
+
+
+def test_dropped_decision():
+	#the chunk arrives at 1.0 and is mapped until 2.0, after the read ended at 1.5
+	res = replay(1, 1, [1500, 3000], [1, 1], [1000, 100], [True, True])
+	decided, dropped, late, ejected, saved_bases = res.outcomes()
+	assert dropped.tolist() == [True, False]
+	#a dropped decision is not late as well, and ejects nothing
+	assert late.tolist() == [False, False]
+	assert ejected.tolist() == [False, True]
+	np.testing.assert_allclose(res.read_end, [1.5, 2.6])
+	np.testing.assert_allclose(saved_bases, [0, 190])
@@ -0,0 +1,120 @@
+import os
+import argparse
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import sweep_rawalign
+from sweep_rawalign import Sweep, expand_grid
+
+RUN_RAWALIGN = Path(__file__).parent / "run_rawalign.sh"
+
+#stand-ins for /usr/bin/time (writes its -vpo file) and rawalign (writes its -d index or -o PAF, fails on $FAIL_ON)
+FAKE_TIME = '#!/bin/bash\nout=$2\nshift 2\ntouch "$out"\nexec "$@"\n'
+FAKE_RAWALIGN = '''#!/bin/bash
+while [ $# -gt 0 ]; do
+    if [ "$1" = "-d" ] || [ "$1" = "-o" ]; then
+        [ -n "$FAIL_ON" ] && [ "$1" = "$FAIL_ON" ] && exit 1
+        touch "$2"
+    fi
+    shift
+done
+'''
+
+CONFIGS = expand_grid(['sparse'], ['banded', 'full'], ['0.10'], ['0.4'], ['20.0'], "--stop-min-anchor 2")
+
+
+@pytest.fixture
+def tools(tmp_path, monkeypatch):
+	bin_dir = tmp_path / "bin"
+	bin_dir.mkdir()
+	for name, text in (("time", FAKE_TIME), ("rawalign", FAKE_RAWALIGN)):
+		(bin_dir / name).write_text(text)
+		(bin_dir / name).chmod(0o755)
+	monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+	monkeypatch.setattr(Sweep, 'timed', lambda self, time_path, command: [str(bin_dir / "time"), "-vpo", str(time_path)] + command)
+	monkeypatch.setattr(sweep_rawalign, 'POLL_INTERVAL', 0.01)
+	return bin_dir
+
+
+def sweep_args(outdir, **kwargs):
+	args = dict(outdir=str(outdir), prefix="d1", signals="fast5_files", ref="ref.fa", pore="pore.model", preset="sensitive",
+		index=None, index_params="", cores=1, threads_per_job=1, rawalign="rawalign", dry_run=False)
+	args.update(kwargs)
+	return argparse.Namespace(**args)
+
+
+def test_names_match_run_rawalign(tmp_path, tools):
+	#the files of every configuration are those that run_rawalign.sh writes for it
+	script = tmp_path / "run_rawalign.sh"
+	script.write_text(RUN_RAWALIGN.read_text().replace("/usr/bin/time", str(tools / "time")))
+	expected_dir = tmp_path / "expected"
+	expected_dir.mkdir()
+	for params in CONFIGS:
+		subprocess.run(["bash", str(script), str(expected_dir), "d1", "fast5_files", "ref.fa", "pore.model", "sensitive", "1", params], check=True)
+	expected = {path.name for path in expected_dir.iterdir() if path.suffix != '.ind'}
+
+	jobs = Sweep(sweep_args(expected_dir, dry_run=True)).jobs(CONFIGS)
+	index_job, map_jobs = jobs[0], jobs[1:]
+	assert [job.name for job in map_jobs] == [f"sensitive{sweep_rawalign.sanitize_params(params)}" for params in CONFIGS]
+	assert {Path(path).name for job in map_jobs for path in job.outputs} == expected
+	#the shared index is named as the index of run_rawalign.sh without parameters
+	assert [Path(path).name for path in index_job.outputs] == ["d1_rawalign_sensitive.ind", "d1_rawalign_index_sensitive.time"]
+	#the .out and .err files are named as by the run_rawalign_*.sh scripts
+	for job in map_jobs:
+		assert (Path(job.stdout).name, Path(job.stderr).name) == (f"d1_rawalign_{job.name}.out", f"d1_rawalign_{job.name}.err")
+
+
+def test_shared_index(tmp_path):
+	jobs = Sweep(sweep_args(tmp_path)).jobs(CONFIGS)
+	index_job = jobs[0]
+	for job in jobs[1:]:
+		assert job.requires == index_job.name
+		assert job.copies == [(index_job.outputs[1], job.outputs[2])]
+		assert str(index_job.outputs[0]) in job.command
+
+	#an existing index is only read
+	jobs = Sweep(sweep_args(tmp_path, index="other.ind")).jobs(CONFIGS)
+	assert len(jobs) == len(CONFIGS)
+	assert all(job.requires is None and not job.copies and "other.ind" in job.command for job in jobs)
+
+
+def test_resume(tmp_path, tools, capsys):
+	#the first run finishes every job, a rerun runs only the jobs whose recorded outputs are gone
+	sweep = Sweep(sweep_args(tmp_path))
+	jobs = sweep.jobs(CONFIGS)
+	assert sweep.run(jobs)
+	assert all(Path(path).is_file() for job in jobs for path in job.outputs)
+	assert Path(jobs[1].outputs[2]).is_file() #the timing of the shared index
+
+	os.remove(jobs[2].outputs[0])
+	sweep = Sweep(sweep_args(tmp_path, dry_run=True))
+	assert sweep.done == {jobs[0].name, jobs[1].name}
+	capsys.readouterr()
+	assert sweep.run(sweep.jobs(CONFIGS))
+	lines = capsys.readouterr().out.splitlines()
+	assert lines[0] == "2 of 3 jobs already finished"
+	assert lines[1:] == [" ".join(jobs[2].command)]
+
+
+def test_failed_index(tmp_path, tools, monkeypatch, capsys):
+	#the mapping jobs of an index that could not be built are skipped and not recorded
+	monkeypatch.setenv("FAIL_ON", "-d")
+	sweep = Sweep(sweep_args(tmp_path))
+	jobs = sweep.jobs(CONFIGS)
+	assert not sweep.run(jobs)
+	assert sweep.done == set()
+	out = capsys.readouterr().out
+	assert all(f"Skipping {job.name}, because {jobs[0].name} failed" in out for job in jobs[1:])
+	assert not sweep.manifest_path.exists()
+
+
+@pytest.mark.parametrize("cores, threads_per_job, slots", [
+	(8, 2, [[0, 1], [2, 3], [4, 5], [6, 7]]),
+	(7, 3, [[0, 1, 2], [3, 4, 5]]),
+	(2, 2, [[0, 1]]),
+])
+def test_core_slots(tmp_path, monkeypatch, cores, threads_per_job, slots):
+	monkeypatch.setattr(os, 'sched_getaffinity', lambda pid: set(range(16)))
+	assert Sweep(sweep_args(tmp_path, cores=cores, threads_per_job=threads_per_job)).core_slots() == slots
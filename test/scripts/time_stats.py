@@ -0,0 +1,183 @@
+import sys
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from paf_columns import read_paf_columns
+
+#parses the resource usage that /usr/bin/time -v writes to the .time files of the run_*.sh scripts
+#fields are found by their name rather than by their line number, which shifts when time reports
+#"Command exited with non-zero status" or "Command terminated by signal" before the first field
+
+#name in the .time file => (attribute, type)
+TIME_FIELDS = {
+	'Command being timed': ('command', str),
+	'User time (seconds)': ('user_time', float),
+	'System time (seconds)': ('system_time', float),
+	'Percent of CPU this job got': ('cpu_percent', int),
+	'Elapsed (wall clock) time (h:mm:ss or m:ss)': ('wall_time', 'elapsed'),
+	'Maximum resident set size (kbytes)': ('max_rss_kb', int),
+	'Average resident set size (kbytes)': ('avg_rss_kb', int),
+	'Major (requiring I/O) page faults': ('major_page_faults', int),
+	'Minor (reclaiming a frame) page faults': ('minor_page_faults', int),
+	'Voluntary context switches': ('voluntary_context_switches', int),
+	'Involuntary context switches': ('involuntary_context_switches', int),
+	'Swaps': ('swaps', int),
+	'File system inputs': ('fs_inputs', int),
+	'File system outputs': ('fs_outputs', int),
+	'Page size (bytes)': ('page_size', int),
+	'Exit status': ('exit_status', int),
+}
+
+#.time files of the indexing and the mapping steps, relative to a comparison directory (as in 2_output_results.sh)
+STEP_PATTERNS = {
+	'index': '../*/*index*.time',
+	'map': '../*/*_map*.time',
+}
+STEP_TAGS = {'index': '_index', 'map': '_map'}
+STEP_TITLES = {'index': 'Indexing', 'map': 'Mapping'}
+
+
+def parse_elapsed(value):
+	#[h:]mm:ss[.ss] => seconds
+	seconds = 0.0
+	for part in value.split(':'):
+		seconds = seconds * 60 + float(part)
+	return seconds
+
+
+class ResourceUsage:
+	def __init__(self, path):
+		self.path = Path(path)
+		for attribute, _ in TIME_FIELDS.values():
+			setattr(self, attribute, None)
+
+	@property
+	def cpu_time(self):
+		#user + system time (s)
+		if self.user_time is None or self.system_time is None:
+			return None
+		return self.user_time + self.system_time
+
+	@property
+	def max_rss_gb(self):
+		if self.max_rss_kb is None:
+			return None
+		return self.max_rss_kb / 1000000
+
+	def memory_per_reference_base(self, reference_length):
+		#bytes of peak memory per base of the reference
+		if self.max_rss_kb is None or reference_length <= 0:
+			return None
+		return self.max_rss_kb * 1024 / reference_length
+
+	def throughput_per_cpu_second(self, amount):
+		#amount (e.g., reads or bases) processed per CPU second
+		if not self.cpu_time:
+			return None
+		return amount / self.cpu_time
+
+
+def parse_time_file(path):
+	usage = ResourceUsage(path)
+	with open(path) as f:
+		for line in f:
+			#the name never contains ": ", the value (e.g., the command) might
+			name, sep, value = line.strip().partition(': ')
+			if not sep or name not in TIME_FIELDS:
+				continue
+			attribute, value_type = TIME_FIELDS[name]
+			value = value.strip()
+			try:
+				if value_type == 'elapsed':
+					value = parse_elapsed(value)
+				elif value_type is int:
+					value = int(value.rstrip('%'))
+				elif value_type is float:
+					value = float(value)
+			except ValueError:
+				continue
+			setattr(usage, attribute, value)
+	return usage
+
+
+def get_tool_name(path, prefix):
+	#file name without the shared prefix, as TOOLNAME in 2_output_results.sh
+	name = Path(path).name[:-len(".time")]
+	return name[len(prefix):] if prefix and name.startswith(prefix) else name
+
+
+def get_output_name(path, step):
+	#name of the output files of the step (e.g., <prefix>_rawalign_map_<params>.time => <prefix>_rawalign_<params>)
+	return ''.join(Path(path).name[:-len(".time")].split(STEP_TAGS[step], 1))
+
+
+def load_time_files(comparison_directory, prefix=""):
+	#resource usage of all .time files of a comparison directory: step => tool name => ResourceUsage
+	comparison_directory = Path(comparison_directory)
+	res = {}
+	for step, pattern in STEP_PATTERNS.items():
+		res[step] = {get_tool_name(path, prefix): parse_time_file(path) for path in sorted(comparison_directory.glob(pattern))}
+	return res
+
+
+def reference_length(fasta_path):
+	#number of bases of a FASTA file, from its .fai index if there is one
+	fai_path = Path(str(fasta_path) + ".fai")
+	if fai_path.is_file():
+		with open(fai_path) as f:
+			return sum(int(line.split('\t')[1]) for line in f if line.strip())
+	length = 0
+	with open(fasta_path, 'rb') as f:
+		for line in f:
+			if not line.startswith(b'>'):
+				length += len(line.strip())
+	return length
+
+
+def count_paf_reads(paf_path):
+	#number of distinct reads of a PAF file, a read can have several records (e.g., secondary mappings)
+	cols = read_paf_columns(paf_path, tags=(), names=True)
+	return len(np.unique(cols['read_name'])) if cols else 0
+
+
+def print_report(usages, reference=None):
+	#same output as the former awk blocks of 2_output_results.sh, sections are separated by an empty line
+	sections = []
+	for step in STEP_PATTERNS:
+		sections.append([f"({STEP_TITLES[step]}) Timing results:"] +
+			[f"{tool} CPU Time: {usage.cpu_time:.2f}" if usage.cpu_time is not None else f"{tool} " for tool, usage in usages[step].items()])
+		sections.append([f"({STEP_TITLES[step]}) Memory usage results:"] +
+			[f"{tool} Memory (GB): {usage.max_rss_gb:.2f}" if usage.max_rss_gb is not None else f"{tool} " for tool, usage in usages[step].items()])
+
+	if reference is not None:
+		ref_length = reference_length(reference)
+		for step in STEP_PATTERNS:
+			section = [f"({STEP_TITLES[step]}) Memory per reference base (bytes):"]
+			for tool, usage in usages[step].items():
+				value = usage.memory_per_reference_base(ref_length)
+				section.append(f"{tool} Memory per base: {value:.2f}" if value is not None else f"{tool} ")
+			sections.append(section)
+
+	section = ["(Mapping) Reads per CPU second:"]
+	for tool, usage in usages['map'].items():
+		paf_path = usage.path.with_name(get_output_name(usage.path, 'map') + ".paf")
+		value = usage.throughput_per_cpu_second(count_paf_reads(paf_path)) if paf_path.is_file() else None
+		section.append(f"{tool} Reads per CPU second: {value:.2f}" if value is not None else f"{tool} ")
+	sections.append(section)
+
+	print("\n\n".join("\n".join(section) for section in sections))
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Report the CPU time, memory usage and reads per CPU second of the .time files of a comparison directory')
+	parser.add_argument('comparison_dir', type=str, nargs='?', default='.', help='comparison directory, the .time files are in its sibling directories')
+	parser.add_argument('--prefix', type=str, default='', help='shared prefix that is removed from the tool names')
+	parser.add_argument('--ref', type=str, default=None, help='reference FASTA, also reports the memory per reference base')
+	args = parser.parse_args()
+
+	if args.ref is not None and not Path(args.ref).is_file():
+		print("Reference " + args.ref + " does not exist")
+		sys.exit(1)
+	print_report(load_time_files(args.comparison_dir, args.prefix), args.ref)
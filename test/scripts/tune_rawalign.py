@@ -0,0 +1,215 @@
+import os
+import sys
+import math
+import random
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from paf_columns import read_paf_columns, bp_per_sec
+from annotate_pafs import TruthIndex
+from compare_pafs import PafSummary
+from paf_stats import MeanStat
+from pareto import pareto_ranks
+from sweep_rawalign import Sweep, expand_grid, sanitize_params, unique, \
+	DEFAULT_BORDER_MODES, DEFAULT_FILL_MODES
+
+#searches the DTW parameters of rawalign for the accuracy/throughput/latency Pareto frontier by successive halving:
+#  all candidate configurations are mapped on a small subset of the FAST5 files (the lowest fidelity),
+#  the candidates are ranked by their Pareto rank over (F-1 score, mean throughput, mean sequenced chunks per read),
+#  and only the best 1/eta of them are promoted to the next rung, which maps eta times as many files,
+#  until the last rung maps all files
+#the subsets are nested and fixed by the seed, and every rung is a sweep_rawalign.py sweep with its own manifest,
+#so an interrupted tuning resumes where it stopped
+#the frontier of the last rung is written in the layout of 2_output_results.sh, see plot_accuracy_throughput_tradeoff.py --frontier
+
+DEFAULT_BAND_RADIUS_FRACS = ['0.05', '0.10', '0.20']
+DEFAULT_MATCH_BONUSES = ['0.2', '0.4', '0.6']
+DEFAULT_MIN_SCORES = ['10.0', '20.0', '40.0']
+DEFAULT_STOP_MIN_ANCHORS = ['0', '2', '4']
+SIGNAL_SUFFIXES = ('.fast5', '.pod5', '.slow5', '.blow5')
+FRONTIER_SUFFIX = "_rawalign_tuning.frontier"
+
+
+class Evaluation:
+	#accuracy and performance of one configuration on one rung
+	def __init__(self, params, paf_path, summary, bp_per_sec):
+		self.params = params
+		self.paf_path = paf_path
+		tp, fp, fn = summary.tp, summary.fp, summary.fn
+		#same definitions as compare_pafs.py
+		self.precision = tp / (tp + fp) if (tp + fp) > 0 else 0.0
+		self.recall = tp / (tp + fn) if (tp + fn) > 0 else 0.0
+		self.f1 = 2 * self.precision * self.recall / (self.precision + self.recall) if (self.precision + self.recall) > 0 else 0.0
+		self.mean_bp_per_sec = float(np.mean(bp_per_sec)) if len(bp_per_sec) > 0 else 0.0
+		self.median_bp_per_sec = float(np.median(bp_per_sec)) if len(bp_per_sec) > 0 else 0.0
+		self.mean_chunks = float(MeanStat().merge(summary.maplast_chunk).merge(summary.umaplast_chunk).mean())
+
+	def objectives(self):
+		#all objectives are maximized
+		return (self.f1, self.mean_bp_per_sec, -self.mean_chunks)
+
+
+def evaluate_paf_file(params, paf_path, truth_index):
+	cols = read_paf_columns(paf_path, tags=('mt', 'ci', 'cm'), names=True, fields=('strand', 'target_name', 'target_start', 'target_end', 'query_end'))
+	summary = PafSummary()
+	speeds = np.empty(0)
+	if cols:
+		cols['annotation'] = truth_index.annotate(cols)
+		summary.add_columns('RawAlign', cols)
+		speeds = bp_per_sec(cols)
+	return Evaluation(params, paf_path, summary, speeds)
+
+
+def promote(evaluations, keep):
+	#best keep evaluations by Pareto rank, ties are broken by the F-1 score
+	ranks = pareto_ranks([e.objectives() for e in evaluations])
+	order = sorted(range(len(evaluations)), key=lambda i: (ranks[i], -evaluations[i].f1))
+	return [evaluations[i] for i in order[:keep]]
+
+
+def rung_file_counts(n_files, n_candidates, eta, min_survivors):
+	#number of files of each rung: the last rung maps all files and each rung before it maps 1/eta as many
+	n_rungs = 1 + max(math.ceil(math.log(max(n_candidates / min_survivors, 1), eta)), 0)
+	return [max(math.ceil(n_files / eta ** (n_rungs - 1 - r)), 1) for r in range(n_rungs)]
+
+
+def list_signal_files(signals):
+	signals = Path(signals)
+	if signals.is_file():
+		return [signals]
+	return sorted(p for p in signals.rglob('*') if p.suffix in SIGNAL_SUFFIXES)
+
+
+def link_subset(files, directory):
+	#directory with links to the given signal files
+	directory.mkdir(parents=True, exist_ok=True)
+	for i, path in enumerate(files):
+		link = directory / f"{i:06d}_{path.name}"
+		if not link.is_symlink():
+			link.symlink_to(path.resolve())
+	return directory
+
+
+def candidate_configs(args):
+	configs = []
+	for stop_min_anchor in unique(args.stop_min_anchors):
+		extra_params = f"--stop-min-anchor {stop_min_anchor} {args.extra_params}".strip()
+		configs += expand_grid(args.border_modes, args.fill_modes, args.band_radius_fracs, args.match_bonuses, args.min_scores, extra_params)
+	configs = unique(configs)
+	if args.num_candidates is not None and args.num_candidates < len(configs):
+		configs = random.Random(args.seed).sample(configs, args.num_candidates)
+	return configs
+
+
+def sweep_args(args, outdir, signals, index=None):
+	return argparse.Namespace(outdir=str(outdir), prefix=args.prefix, signals=str(signals), ref=args.ref, pore=args.pore,
+		preset=args.preset, index=index, index_params=args.index_params, cores=args.cores, threads_per_job=args.threads_per_job,
+		rawalign=args.rawalign, dry_run=False)
+
+
+def write_frontier(out, evaluations, preset):
+	#tool names as in 2_output_results.sh, the "rawalign_tuned_" prefix keeps them apart from the tools of the comparison directory
+	for e in evaluations:
+		tool = f"rawalign_tuned_{preset}{sanitize_params(e.params)}"
+		out.write(f"{tool} BP per sec: {e.mean_bp_per_sec:.2f} {e.median_bp_per_sec:.2f}\n")
+		out.write(f"{tool} precision: {e.precision!r}\n")
+		out.write(f"{tool} recall: {e.recall!r}\n")
+		out.write(f"{tool} F-1 score: {e.f1!r}\n")
+		out.write(f"{tool} Mean # of sequenced chunks per read : {e.mean_chunks!r}\n")
+
+
+def print_rung(r, n_files, evaluations, survivors):
+	ranks = pareto_ranks([e.objectives() for e in evaluations])
+	promoted = set(id(e) for e in survivors)
+	print(f"Rung {r}: {len(evaluations)} configurations on {n_files} files")
+	for rank, e in sorted(zip(ranks.tolist(), evaluations), key=lambda x: (x[0], -x[1].f1)):
+		print(f"  rank {rank} {'*' if id(e) in promoted else ' '} F-1: {e.f1:.4f}, BP per sec: {e.mean_bp_per_sec:.2f}, "
+			f"chunks per read: {e.mean_chunks:.3f} : {e.params}")
+
+
+def tune(args):
+	outdir = Path(args.outdir)
+	outdir.mkdir(parents=True, exist_ok=True)
+	files = list_signal_files(args.signals)
+	if not files:
+		print("No signal files in " + args.signals)
+		return False
+	random.Random(args.seed).shuffle(files)
+	candidates = candidate_configs(args)
+	counts = rung_file_counts(len(files), len(candidates), args.eta, args.min_survivors)
+	print(f"{len(candidates)} configurations, {len(counts)} rungs of {', '.join(map(str, counts))} files")
+
+	#the index is built once and shared by all rungs
+	index = args.index
+	if index is None:
+		(outdir / "index").mkdir(exist_ok=True)
+		index_sweep = Sweep(sweep_args(args, outdir / "index", args.signals))
+		jobs = index_sweep.jobs([])
+		if not index_sweep.run(jobs):
+			return False
+		index = str(jobs[0].outputs[0])
+	truth_index = TruthIndex(args.truth)
+
+	evaluations = []
+	for r, n_files in enumerate(counts):
+		rung_dir = outdir / f"rung_{r}"
+		rung_dir.mkdir(exist_ok=True)
+		signals = link_subset(files[:n_files], outdir / "subsets" / f"rung_{r}")
+		sweep = Sweep(sweep_args(args, rung_dir, signals, index))
+		jobs = sweep.jobs(candidates)
+		sweep.run(jobs)
+		#configurations that failed on a rung are dropped
+		evaluations = [evaluate_paf_file(params, job.outputs[0], truth_index) for params, job in zip(candidates, jobs) if job.name in sweep.done]
+		if not evaluations:
+			print(f"No configuration finished on rung {r}")
+			return False
+		last = r == len(counts) - 1
+		survivors = evaluations if last else promote(evaluations, max(math.ceil(len(evaluations) / args.eta), args.min_survivors))
+		print_rung(r, n_files, evaluations, survivors)
+		candidates = [e.params for e in survivors]
+
+	ranks = pareto_ranks([e.objectives() for e in evaluations])
+	frontier = sorted((e for e, rank in zip(evaluations, ranks) if rank == 0), key=lambda e: e.mean_bp_per_sec)
+	frontier_path = outdir / (args.prefix + FRONTIER_SUFFIX)
+	with open(frontier_path, 'w') as out:
+		write_frontier(out, frontier, args.preset)
+	print(f"Wrote the {len(frontier)} configurations of the Pareto frontier to {frontier_path}")
+	return True
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Search the DTW parameters of rawalign for the accuracy/throughput/latency Pareto frontier by successive halving on growing subsets of the reads')
+	parser.add_argument('--outdir', type=str, required=True, help='working directory of the rungs and the frontier')
+	parser.add_argument('--prefix', type=str, required=True, help='prefix of the output files (e.g., d2_ecoli_r94)')
+	parser.add_argument('--signals', type=str, required=True, help='directory of the FAST5 files, subsets of its files are mapped in the lower rungs')
+	parser.add_argument('--truth', type=str, required=True, help='PAF file of the true mappings (e.g., true_mappings.paf)')
+	parser.add_argument('--ref', type=str, default=None, help='reference genome')
+	parser.add_argument('--pore', type=str, default=None, help='k-mer model file')
+	parser.add_argument('--index', type=str, default=None, help='existing rawalign index, otherwise it is built in <outdir>/index')
+	parser.add_argument('--preset', type=str, default='sensitive', help='rawalign preset (e.g., viral, sensitive, fast)')
+	parser.add_argument('--index-params', type=str, default='', help='parameters that affect indexing (e.g., "-w 3"), used for both indexing and mapping')
+	parser.add_argument('--extra-params', type=str, default='', help='parameters appended to every mapping configuration')
+	parser.add_argument('--border-modes', type=str, nargs='+', default=DEFAULT_BORDER_MODES, choices=['global', 'sparse', 'local'], help='values of --dtw-border-constraint')
+	parser.add_argument('--fill-modes', type=str, nargs='+', default=DEFAULT_FILL_MODES, choices=['full', 'banded'], help='DTW fill methods, banded is combined with each band radius fraction')
+	parser.add_argument('--band-radius-fracs', type=str, nargs='+', default=DEFAULT_BAND_RADIUS_FRACS, help='band radius fractions of the banded fill method')
+	parser.add_argument('--match-bonuses', type=str, nargs='+', default=DEFAULT_MATCH_BONUSES, help='values of --dtw-match-bonus')
+	parser.add_argument('--min-scores', type=str, nargs='+', default=DEFAULT_MIN_SCORES, help='values of --dtw-min-score')
+	parser.add_argument('--stop-min-anchors', type=str, nargs='+', default=DEFAULT_STOP_MIN_ANCHORS, help='values of --stop-min-anchor')
+	parser.add_argument('--num-candidates', type=int, default=None, help='random sample of this many configurations of the grid (default: the whole grid)')
+	parser.add_argument('--eta', type=float, default=3.0, help='1/eta of the configurations are promoted to the next rung, which maps eta times as many files')
+	parser.add_argument('--min-survivors', type=int, default=4, help='configurations that are promoted at least, i.e., that reach the last rung')
+	parser.add_argument('--seed', type=int, default=0, help='seed of the file subsets and of --num-candidates')
+	parser.add_argument('-c', '--cores', type=int, default=len(os.sched_getaffinity(0)), help='total number of cores used by the concurrent jobs')
+	parser.add_argument('-t', '--threads-per-job', type=int, default=None, help='threads (and cores) of each rawalign job (default: all cores, i.e., one job at a time)')
+	parser.add_argument('--rawalign', type=str, default='rawalign', help='rawalign binary')
+	args = parser.parse_args()
+	args.threads_per_job = min(args.threads_per_job or args.cores, args.cores)
+	if args.eta <= 1:
+		parser.error("--eta has to be larger than 1")
+	if args.index is None and (args.ref is None or args.pore is None):
+		parser.error("--ref and --pore are required unless an existing --index is given")
+
+	if not tune(args):
+		sys.exit(1)